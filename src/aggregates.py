@@ -0,0 +1,151 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+def _number(value: Any) -> int:
+    # 布尔值按0/1累加；类型不对的值（手工编辑的数据）不计入合计
+    return value if isinstance(value, (int, float)) else 0
+
+
+class Totals:
+    """一个分组的记录数和各数值字段的合计"""
+
+    __slots__ = ('count', 'sums')
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.count = 0
+        self.sums: Dict[str, Any] = {name: 0 for name in names}
+
+    def mean(self, name: str) -> float:
+        """字段的平均值，没有记录时为0"""
+        return self.sums[name] / self.count if self.count else 0
+
+    def copy(self) -> 'Totals':
+        totals = Totals()
+        totals.count, totals.sums = self.count, dict(self.sums)
+        return totals
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.sums, count=self.count)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Totals) and (self.count, self.sums) == (other.count, other.sums)
+
+    def __repr__(self) -> str:
+        return f"Totals(count={self.count}, sums={self.sums})"
+
+
+class Aggregates:
+    """
+    按分组持续维护的计数和合计
+
+    ``groups`` 定义分组方式：分组名 -> (来源字段, 计算分组键的函数或None)，如
+    ``{'week': ('start_date', iso_week), 'status': ('status', None)}``；``values`` 是
+    需要合计的数值字段（布尔字段即为完成数）。记录加入、移除或字段被赋值时只调整
+    受影响的分组，耗时与记录总数无关。
+
+    由 :class:`index.RecordIndex` 在维护索引的同时调用，管理器不必另外通知；
+    :meth:`verify` 全量重新计算并与维护的结果比较，只用于一致性检查。
+    """
+
+    def __init__(self, groups: Dict[str, Tuple[str, Optional[Callable[[Any], Any]]]],
+                 values: Iterable[str] = ()):
+        self._groups = dict(groups)
+        self.values = tuple(values)
+        # 来源字段 -> 依赖它的分组名
+        self._sources: Dict[str, List[str]] = {}
+        for name, (source, _) in self._groups.items():
+            self._sources.setdefault(source, []).append(name)
+        self._total = Totals(self.values)
+        # 分组名 -> 分组键 -> 合计
+        self._totals: Dict[str, Dict[Any, Totals]] = {name: {} for name in self._groups}
+
+    def _key(self, record: Any, name: str, value: Any = None, use_value: bool = False) -> Any:
+        source, func = self._groups[name]
+        if not use_value:
+            value = getattr(record, source)
+        return func(value) if func is not None else value
+
+    def _apply(self, totals: Totals, record: Any, sign: int) -> None:
+        totals.count += sign
+        for name in self.values:
+            totals.sums[name] += sign * _number(getattr(record, name))
+
+    def _adjust(self, name: str, key: Any, record: Any, sign: int) -> None:
+        groups = self._totals[name]
+        totals = groups.get(key)
+        if totals is None:
+            totals = groups[key] = Totals(self.values)
+        self._apply(totals, record, sign)
+        if not totals.count:
+            del groups[key]
+
+    def rebuild(self, records: Iterable[Any]) -> None:
+        """按给定记录重新计算全部分组"""
+        self._total = Totals(self.values)
+        for groups in self._totals.values():
+            groups.clear()
+        for record in records:
+            self.add(record)
+
+    def add(self, record: Any) -> None:
+        self._apply(self._total, record, 1)
+        for name in self._groups:
+            self._adjust(name, self._key(record, name), record, 1)
+
+    def remove(self, record: Any) -> None:
+        self._apply(self._total, record, -1)
+        for name in self._groups:
+            self._adjust(name, self._key(record, name), record, -1)
+
+    def replace(self, old: Any, record: Any) -> None:
+        self.remove(old)
+        self.add(record)
+
+    def rekey(self, old: Any, record: Any) -> None:
+        """只有存储键改变，统计不变"""
+
+    def field_changed(self, record: Any, name: str, old: Any) -> None:
+        """记录的字段已被赋值（old 为赋值前的值）"""
+        if name in self.values:
+            delta = _number(getattr(record, name)) - _number(old)
+            if delta:
+                self._total.sums[name] += delta
+                for group in self._groups:
+                    self._totals[group][self._key(record, group)].sums[name] += delta
+        for group in self._sources.get(name, ()):
+            before, after = self._key(record, group, old, True), self._key(record, group)
+            if before != after:
+                self._adjust(group, before, record, -1)
+                self._adjust(group, after, record, 1)
+
+    def totals(self) -> Totals:
+        """全部记录的合计（副本）"""
+        return self._total.copy()
+
+    def get(self, group: str, key: Any) -> Totals:
+        """分组键的合计（副本，没有记录时为全0）"""
+        totals = self._totals[group].get(key)
+        return totals.copy() if totals is not None else Totals(self.values)
+
+    def groups(self, group: str) -> Dict[Any, Totals]:
+        """分组方式下每个分组键的合计（副本，不含没有记录的分组）"""
+        return {key: totals.copy() for key, totals in self._totals[group].items()}
+
+    def verify(self, records: Iterable[Any]) -> List[str]:
+        """
+        全量重新计算并与维护的结果比较（一致性检查）
+
+        Returns:
+            不一致之处的说明，一致时为空列表
+        """
+        expected = Aggregates(self._groups, self.values)
+        expected.rebuild(records)
+        problems = []
+        if expected._total != self._total:
+            problems.append(f"总计: 应为 {expected._total}，实为 {self._total}")
+        for group, groups in expected._totals.items():
+            actual = self._totals[group]
+            for key in groups.keys() | actual.keys():
+                if groups.get(key) != actual.get(key):
+                    problems.append(f"{group}={key!r}: 应为 {groups.get(key)}，实为 {actual.get(key)}")
+        return problems
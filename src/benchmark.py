@@ -0,0 +1,302 @@
+"""
+性能基准
+
+用法::
+
+    python benchmark.py snapshot --sizes 10000 100000 1000000
+    python benchmark.py columns --sizes 100000
+    python benchmark.py filters --sizes 10000 100000 1000000
+    python benchmark.py memory --sizes 1000000
+    python benchmark.py codec --sizes 100000
+    python benchmark.py table --sizes 100000 1000000
+    python benchmark.py search --sizes 100000
+
+每个子命令对应一组对比，结果以表格形式输出；数据在临时目录中生成，运行结束后删除。
+"""
+import sys
+import json
+import time
+import logging
+import random
+import argparse
+import tempfile
+import tracemalloc
+from dataclasses import asdict, field, fields, make_dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from task import Priority, Task, TaskStatus
+from storage import JsonStorage, SnapshotStorage
+from project_manager import ProjectManager
+from columnstore import REBUILD_AFTER_READS
+from tasktable import PROJECT_FIELDS, TaskTable
+from search import SearchIndex
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+_WORDS = ["需求", "评审", "联调", "测试", "上线", "部署", "优化", "文档", "接口", "迁移",
+          "report", "review", "release", "backend", "frontend"]
+
+
+def make_project_records(count: int, seed: int = 0, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    生成与 ``Task.to_dict`` 字段一致的项目记录
+
+    Args:
+        offset: 编号起点，分批生成时各批的标题和项目编号不重复
+    """
+    rng = random.Random(seed)
+    statuses = [status.value for status in TaskStatus]
+    priorities = [priority.value for priority in Priority]
+    names = [f"项目{chr(0x4e00 + i)}{i:03d}" for i in range(200)]
+    base = date(2024, 1, 1)
+    records = []
+    for i in range(offset, offset + count):
+        start = base + timedelta(days=rng.randrange(730))
+        due = start + timedelta(days=rng.randrange(7, 120)) if rng.random() < 0.8 else None
+        updated = datetime.combine(start, datetime.min.time()) + timedelta(seconds=rng.randrange(86400 * 30))
+        records.append({
+            'title': f"{rng.choice(_WORDS)}{rng.choice(_WORDS)} {i}",
+            'description': "，".join(rng.choice(_WORDS) for _ in range(rng.randrange(0, 30))),
+            'priority': rng.choice(priorities),
+            'status': rng.choice(statuses),
+            'progress': rng.randrange(0, 101),
+            'start_date': start.isoformat(),
+            'updated_at': updated.strftime("%Y-%m-%d %H:%M:%S"),
+            'due_date': due.isoformat() if due else None,
+            'project_number': f"P{start.year}-{i:07d}",
+            'project_name': rng.choice(names) if rng.random() < 0.9 else None,
+            'uid': f"{rng.getrandbits(128):032x}",
+            'revision': 0,
+        })
+    return records
+
+
+def timed(func: Callable[[], Any]) -> Tuple[Any, float]:
+    """执行一次并返回 (结果, 耗时秒数)"""
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def _print_table(headers: List[str], rows: List[List[Any]]) -> None:
+    cells = [headers] + [[f"{cell:.3f}" if isinstance(cell, float) else str(cell) for cell in row]
+                         for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for row in cells:
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+
+
+def bench_snapshot(args: argparse.Namespace) -> None:
+    """JSON（现有格式）与二进制快照的保存、加载耗时和文件大小"""
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            records = make_project_records(size)
+            for label, storage in (("json", JsonStorage(Path(directory) / f"{size}.json")),
+                                   ("pmsb", SnapshotStorage(Path(directory) / f"{size}.pmsb"))):
+                _, save_time = timed(lambda: storage.save_all(records))
+                loaded, load_time = timed(lambda: [record for _, record in storage.iter_load()])
+                if loaded != records:
+                    raise AssertionError(f"{label} 读回的记录与写入的不一致")
+                file_size = storage.data_file.stat().st_size
+                rows.append([label, size, save_time, load_time, f"{file_size / 1024 / 1024:.1f}"])
+                storage.close()
+            del records
+    _print_table(["格式", "记录数", "保存(s)", "加载(s)", "大小(MB)"], rows)
+
+
+def bench_columns(args: argparse.Namespace) -> None:
+    """列存储与扫描项目对象的日期范围查询耗时"""
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            data_file = Path(directory) / f"{size}.json"
+            JsonStorage(data_file).save_all(make_project_records(size))
+            for label, columnar in (("objects", False), ("columns", True)):
+                manager = ProjectManager(str(data_file), columnar=columnar)
+
+                def query():
+                    return manager.get_projects_between('due_date', "2024-06-01", "2024-06-30")
+
+                # 前几次读取（含生成列存储文件）单独计时
+                _, first = timed(lambda: [query() for _ in range(REBUILD_AFTER_READS)])
+                _, between = timed(query)
+                rows.append([label, size, first, between])
+                manager.close()
+    _print_table(["方式", "记录数", "预热(s)", "日期范围(s)"], rows)
+
+
+def bench_filters(args: argparse.Namespace) -> None:
+    """索引筛选与逐个比较的耗时随项目数的变化"""
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            data_file = Path(directory) / f"{size}.json"
+            JsonStorage(data_file).save_all(make_project_records(size))
+            manager = ProjectManager(str(data_file))
+            projects = manager.projects
+            number = projects[size // 2].project_number
+            criteria = {'status': TaskStatus.IN_PROGRESS.value, 'priority': Priority.HIGH.value}
+            _, scan = timed(lambda: [t for t in projects
+                                     if t.status == criteria['status'] and t.priority == criteria['priority']])
+            _, indexed = timed(lambda: manager.query_projects(**criteria))
+            _, narrow = timed(lambda: manager.query_projects(project_number=number, **criteria))
+            _, numbers = timed(manager.get_project_numbers)
+            _, counts = timed(manager.get_status_counts)
+            rows.append([size, scan, indexed, narrow, numbers, counts])
+            manager.close()
+    _print_table(["记录数", "逐个比较(s)", "状态+优先级(s)", "加编号(s)", "编号列表(s)", "状态统计(s)"], rows)
+
+
+def bench_memory(args: argparse.Namespace) -> None:
+    """每个项目占用的内存：JSON解析出的字典、普通dataclass与带槽、字符串驻留的Task"""
+    # 与Task字段相同、但有 __dict__ 且不驻留字符串的对照类
+    plain = make_dataclass('PlainTask', [(f.name, f.type, field(default=f.default)) for f in fields(Task)])
+    models = [("dict", lambda record: record), ("dataclass", lambda record: plain(**record)),
+              ("slots", Task.from_dict)]
+    chunk = 100_000
+    rows = []
+    for size in args.sizes:
+        # 先生成JSON文本（不计入）；解析出的字符串与从数据文件读取时一样各自独立
+        texts = [json.dumps(make_project_records(min(chunk, size - offset), seed=offset, offset=offset),
+                            ensure_ascii=False)
+                 for offset in range(0, size, chunk)]
+        for label, build in models:
+            tracemalloc.start()
+            objects = []
+            for text in texts:
+                objects.extend(map(build, json.loads(text)))
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            rows.append([label, size, f"{current / 1024 / 1024:.1f}", current // size])
+            del objects
+        del texts
+    _print_table(["表示", "记录数", "内存(MB)", "字节/项目"], rows)
+
+
+def bench_codec(args: argparse.Namespace) -> None:
+    """生成的编码、解码函数与 dataclasses.asdict、构造函数的对比"""
+    rows = []
+    for size in args.sizes:
+        records = make_project_records(size)
+        tasks, from_dict = timed(lambda: [Task.from_dict(record) for record in records])
+        _, construct = timed(lambda: [Task(**record) for record in records])
+        encoded, to_dict = timed(lambda: [task.to_dict() for task in tasks])
+        expected, as_dict = timed(lambda: [asdict(task) for task in tasks])
+        if encoded != expected:
+            raise AssertionError("to_dict 与 asdict 的结果不一致")
+        rows.append([size, construct, from_dict, as_dict, to_dict])
+    _print_table(["记录数", "Task(**d)(s)", "from_dict(s)", "asdict(s)", "to_dict(s)"], rows)
+
+
+def bench_table(args: argparse.Namespace) -> None:
+    """逐个访问Task与列式TaskTable的分组统计（各状态平均进度、各优先级逾期数）"""
+    today = date(2025, 1, 1)
+    rows = []
+    for size in args.sizes:
+        tasks = [Task.from_dict(record) for record in make_project_records(size)]
+
+        def loops():
+            progress: Dict[str, List[int]] = {}
+            overdue: Dict[int, int] = {}
+            for task in tasks:
+                progress.setdefault(task.status, []).append(task.progress)
+                due = task.ordinal('due_date')
+                if due and due <= today.toordinal() and task.status != TaskStatus.COMPLETED.value:
+                    overdue[task.priority] = overdue.get(task.priority, 0) + 1
+            return {status: sum(values) / len(values) for status, values in progress.items()}, overdue
+
+        loops()
+        _, loop_time = timed(loops)
+        row = [size, loop_time]
+        for use_numpy in (True, False):
+            table = TaskTable(tasks, PROJECT_FIELDS, use_numpy=use_numpy)
+
+            def query():
+                return (table.group_by('status', 'progress', 'mean'),
+                        table.group_by('priority', mask=table.overdue(today)))
+
+            # 第一次统计包括从对象生成用到的列
+            _, first = timed(query)
+            _, again = timed(query)
+            row += [first, again] if table.numpy == use_numpy else ["-", "-"]
+        rows.append(row)
+        del tasks
+    _print_table(["记录数", "逐个访问(s)", "NumPy首次(s)", "NumPy再次(s)", "array首次(s)", "array再次(s)"], rows)
+
+
+def bench_search(args: argparse.Namespace) -> None:
+    """逐字输入查询时每次按键的耗时：全文索引与逐个匹配子串的对比，以及建立和载入索引的耗时"""
+    keystrokes = [args.query[:end] for end in range(1, len(args.query) + 1)]
+    rows = []
+    for size in args.sizes:
+        tasks = [Task.from_dict(record) for record in make_project_records(size)]
+
+        def scan(query):
+            words = query.lower().split()
+            return [task for task in tasks
+                    if all(word in task.title.lower() or word in task.description.lower() for word in words)]
+
+        scan_times = [timed(lambda: scan(query))[1] for query in keystrokes]
+        row = [size, max(scan_times)]
+        for use_numpy in (True, False):
+            index = SearchIndex(use_numpy=use_numpy)
+            index.rebuild(tasks)
+            _, build = timed(lambda: index.search(''))
+            times = [timed(lambda: index.search(query, args.limit))[1] for query in keystrokes]
+            row += [build, sum(times) / len(times), max(times)] if index.numpy == use_numpy else ["-"] * 3
+        payload = index.encode([['bench', size, 0]])
+        restored = SearchIndex()
+        restored.rebuild(tasks)
+        _, restore = timed(lambda: restored.restore(payload, [['bench', size, 0]]))
+        rows.append(row + [restore, len(payload) / 2 ** 20])
+        del tasks
+    _print_table(["记录数", "逐个匹配(s)", "NumPy建立(s)", "NumPy平均(s)", "NumPy最慢(s)",
+                  "array建立(s)", "array平均(s)", "array最慢(s)", "载入索引(s)", "索引文件(MB)"], rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="项目进度管理系统性能基准")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    snapshot_parser = commands.add_parser('snapshot', help="JSON与二进制快照的读写对比")
+    snapshot_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    snapshot_parser.set_defaults(func=bench_snapshot)
+
+    columns_parser = commands.add_parser('columns', help="列存储与对象扫描的日期范围查询对比")
+    columns_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    columns_parser.set_defaults(func=bench_columns)
+
+    filters_parser = commands.add_parser('filters', help="索引筛选耗时随项目数的变化")
+    filters_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    filters_parser.set_defaults(func=bench_filters)
+
+    memory_parser = commands.add_parser('memory', help="项目对象的内存占用对比（tracemalloc）")
+    memory_parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000])
+    memory_parser.set_defaults(func=bench_memory)
+
+    codec_parser = commands.add_parser('codec', help="记录编码、解码与asdict的对比")
+    codec_parser.add_argument('--sizes', type=int, nargs='+', default=[100_000])
+    codec_parser.set_defaults(func=bench_codec)
+
+    table_parser = commands.add_parser('table', help="TaskTable列式统计与逐个访问的对比")
+    table_parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    table_parser.set_defaults(func=bench_table)
+
+    search_parser = commands.add_parser('search', help="全文索引的逐键查询耗时")
+    search_parser.add_argument('--sizes', type=int, nargs='+', default=[100_000])
+    search_parser.add_argument('--query', default="需求评审 rel", help="逐字输入的查询")
+    search_parser.add_argument('--limit', type=int, default=500, help="每次查询返回的条数")
+    search_parser.set_defaults(func=bench_search)
+
+    args = parser.parse_args(argv)
+    # 管理器的加载、保存日志会打乱表格
+    logging.disable(logging.INFO)
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
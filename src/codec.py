@@ -0,0 +1,70 @@
+import sys
+from dataclasses import MISSING, fields
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+def _compile(name: str, cls: type, lines: Iterable[str], namespace: Dict[str, Any]) -> Callable:
+    exec(compile("\n".join(lines), f"<{cls.__name__} {name}>", 'exec'), namespace)
+    return namespace[name]
+
+
+def make_encoder(cls: type, names: Optional[Iterable[str]] = None) -> Callable[[Any], Dict[str, Any]]:
+    """
+    生成 记录对象 -> 字典 的函数
+
+    按字段列表生成一次源码并编译，每次调用只是一个字典字面量，不像
+    ``dataclasses.asdict`` 那样逐个字段递归深拷贝。字段值都是不可变的标量，无需拷贝。
+
+    Args:
+        names: 输出的字段及其顺序，默认为全部dataclass字段
+    """
+    names = list(names) if names is not None else [f.name for f in fields(cls)]
+    items = ", ".join(f"{name!r}: record.{name}" for name in names)
+    return _compile('encode', cls, ["def encode(record):", f"    return {{{items}}}"], {})
+
+
+def make_decoder(cls: type, aliases: Optional[Dict[str, str]] = None) -> Callable[[Dict[str, Any]], Any]:
+    """
+    生成 字典 -> 记录对象 的函数
+
+    ``cls`` 须是 ``slots=True`` 的dataclass。生成的函数直接写入各字段的槽，不经过
+    ``__init__`` 和修改跟踪，最后调用 ``__post_init__``，得到的对象与 ``cls(**data)``
+    相同。``_interned_fields`` 中的字符串字段同样被驻留。
+
+    未知的键被忽略（如已删除字段的旧数据）；缺少没有默认值的字段时抛出 KeyError。
+
+    Args:
+        aliases: 旧字段名 -> 现在的字段名，同时存在时以现在的字段名为准
+    """
+    interned = getattr(cls, '_interned_fields', frozenset())
+    namespace: Dict[str, Any] = {'_cls': cls, '_new': cls.__new__, '_intern': sys.intern,
+                                 '_aliases': dict(aliases or {})}
+    lines = ["def decode(data):"]
+    if aliases:
+        lines += ["    if not _aliases.keys().isdisjoint(data):",
+                  "        renamed = {_aliases[key]: value for key, value in data.items() if key in _aliases}",
+                  "        renamed.update(data)",
+                  "        data = renamed"]
+    lines += ["    record = _new(_cls)", "    get = data.get"]
+    for field in fields(cls):
+        name = field.name
+        namespace[f"_set_{name}"] = cls.__dict__[name].__set__
+        if field.default is not MISSING:
+            namespace[f"_default_{name}"] = field.default
+            value = f"get({name!r}, _default_{name})"
+        elif field.default_factory is not MISSING:
+            namespace[f"_factory_{name}"] = field.default_factory
+            value = f"data[{name!r}] if {name!r} in data else _factory_{name}()"
+        else:
+            value = f"data[{name!r}]"
+        if name in interned:
+            lines += [f"    value = {value}",
+                      "    if type(value) is str:",
+                      "        value = _intern(value)",
+                      f"    _set_{name}(record, value)"]
+        else:
+            lines.append(f"    _set_{name}(record, {value})")
+    if hasattr(cls, '__post_init__'):
+        lines.append("    record.__post_init__()")
+    lines.append("    return record")
+    return _compile('decode', cls, lines, namespace)
@@ -0,0 +1,207 @@
+import sys
+import json
+import mmap
+import struct
+import logging
+from array import array
+from operator import attrgetter
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from task import date_ordinal
+
+logger = logging.getLogger(__name__)
+
+# 列存储文件的扩展名（与数据文件放在一起）
+COLUMNS_SUFFIX = '.columns'
+MAGIC = b'PMSC'
+# 版本2起只保存日期序数列；版本1的文件另有状态码和字符串堆，读取时忽略
+FORMAT_VERSION = 2
+
+# 文件头：魔数、格式版本、描述(JSON)的字节长度
+_PREAMBLE = struct.Struct('<4sHI')
+# 各列按8字节对齐，映射后可以直接按定长类型访问
+_ALIGN = 8
+
+# 存为日期序数（date.toordinal，无值或无法解析为0）的字段
+DATE_FIELDS = ('start_date', 'due_date', 'updated_at')
+
+# 数据改动后，经过这么多次读取才重新生成列存储；改动后只读一两次时扫描对象更快
+REBUILD_AFTER_READS = 3
+
+
+def columns_file_for(data_file: Path) -> Path:
+    """数据文件对应的列存储文件"""
+    data_file = Path(data_file)
+    return data_file.with_name(data_file.name + COLUMNS_SUFFIX)
+
+
+def file_stamp(paths: Sequence[Path]) -> Optional[List[List[Any]]]:
+    """
+    数据文件的标识：(文件名, 大小, 修改时间)
+
+    列存储文件记录生成时的标识，其他进程打开同一数据文件时据此判断能否直接复用。
+    没有可以标识的文件时返回None（不复用）。
+    """
+    if not paths:
+        return None
+    stamp = []
+    for path in paths:
+        try:
+            stat = Path(path).stat()
+        except OSError:
+            continue
+        stamp.append([Path(path).name, stat.st_size, stat.st_mtime_ns])
+    return stamp or None
+
+
+def _ordinal(text: str) -> int:
+    """'YYYY-MM-DD' 或 'YYYY-MM-DD HH:MM:SS' 的日期序数，无法解析时为0"""
+    return date_ordinal(text[:10])
+
+
+def encode_columns(items: Iterable[Tuple[int, Any]], stamp: Optional[List[List[Any]]] = None) -> Optional[bytes]:
+    """
+    生成列存储文件内容
+
+    Args:
+        items: (记录键, Task或TaskRow) 序列，只读取属性，不构建记录字典
+        stamp: 生成时数据文件的标识，见 :func:`file_stamp`
+
+    Returns:
+        文件内容；存在放不进定长列的值（非整数的记录键、非字符串的日期）时返回None，
+        此时调用方应继续扫描对象
+    """
+    items = list(items)
+    keys = [key for key, _ in items]
+    tasks = [task for _, task in items]
+    if not set(map(type, keys)) <= {int}:
+        return None
+    columns: Dict[str, array] = {'key': array('q', keys)}
+    # 按列读取属性，相同的日期只解析一次
+    for name in DATE_FIELDS:
+        values = list(map(attrgetter(name), tasks))
+        if not set(map(type, values)) <= {str, type(None)}:
+            return None
+        parsed = {value: _ordinal(value) if value else 0 for value in dict.fromkeys(values)}
+        columns[name + '_ordinal'] = array('i', map(parsed.__getitem__, values))
+
+    layout: Dict[str, List[Any]] = {}
+    position = 0
+    blocks = []
+    for name, values in columns.items():
+        payload = _pack(values)
+        layout[name] = [position, values.typecode, len(values)]
+        blocks.append(payload)
+        position += _padded(len(payload))
+
+    header = {'count': len(keys), 'stamp': stamp, 'columns': layout}
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    # 数据区起点对齐，列偏移相对于数据区起点
+    data_start = _padded(_PREAMBLE.size + len(header_bytes))
+    prefix = _PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)) + header_bytes
+    parts = [prefix, b'\0' * (data_start - len(prefix))]
+    for payload in blocks:
+        parts.append(payload)
+        parts.append(b'\0' * (_padded(len(payload)) - len(payload)))
+    return b''.join(parts)
+
+
+def _padded(size: int) -> int:
+    return (size + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _pack(values: array) -> bytes:
+    if sys.byteorder != 'little' and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class ColumnStore:
+    """
+    只读的列式项目日期
+
+    记录键和开始、截止、更新日期的序数存为定长列，文件通过 ``mmap`` 只读映射，多个进程
+    打开同一文件时共享页面缓存。只用于 ``ProjectManager.get_projects_between`` 的
+    日期范围查询：直接扫描序数列，不访问Task对象。状态、编号等筛选和统计由记录索引
+    维护，不经过列存储。第 i 行对应生成时的第 i 个项目。
+    """
+
+    def __init__(self, buffer, mapping: Optional[mmap.mmap] = None):
+        self._mapping = mapping
+        self._view = memoryview(buffer)
+        self._columns: Dict[str, Any] = {}
+        if len(self._view) < _PREAMBLE.size:
+            raise ValueError("列存储文件过短")
+        magic, version, header_size = _PREAMBLE.unpack_from(self._view)
+        if magic != MAGIC or version > FORMAT_VERSION:
+            raise ValueError("列存储文件标识或版本不匹配")
+        header = json.loads(bytes(self._view[_PREAMBLE.size:_PREAMBLE.size + header_size]).decode('utf-8'))
+        self.count: int = header['count']
+        self.stamp = header['stamp']
+        data_start = _padded(_PREAMBLE.size + header_size)
+        for name, (offset, code, length) in header['columns'].items():
+            start = data_start + offset
+            size = length * array(code).itemsize
+            if start + size > len(self._view):
+                raise ValueError(f"列 {name} 超出文件范围")
+            self._columns[name] = self._column(self._view[start:start + size], code)
+        # 版本1文件中的其他列不再使用
+        self._columns = {name: column for name, column in self._columns.items()
+                         if name == 'key' or name.endswith('_ordinal')}
+        for name in ['key'] + [name + '_ordinal' for name in DATE_FIELDS]:
+            if len(self._columns[name]) != self.count:
+                raise ValueError(f"列 {name} 长度不符")
+
+    @staticmethod
+    def _column(view: memoryview, code: str):
+        if code == 'B':
+            return view
+        if sys.byteorder != 'little':
+            # 大端平台上复制并转换字节序，不再共享页面
+            values = array(code, view.tobytes())
+            values.byteswap()
+            return values
+        return view.cast(code)
+
+    @classmethod
+    def open(cls, path: Path) -> Optional['ColumnStore']:
+        """映射已有的列存储文件，文件不存在或无效时返回None"""
+        try:
+            with open(path, 'rb') as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            return cls(mapping, mapping)
+        except (ValueError, KeyError, TypeError, struct.error) as e:
+            logger.warning(f"列存储文件无效，将重新生成: {e}")
+            mapping.close()
+            return None
+
+    def close(self) -> None:
+        """释放映射；仍有外部引用的视图时交给垃圾回收"""
+        columns, self._columns = self._columns, {}
+        try:
+            for column in columns.values():
+                if isinstance(column, memoryview):
+                    column.release()
+            self._view.release()
+            if self._mapping is not None:
+                self._mapping.close()
+        except BufferError:
+            pass
+
+    def __len__(self) -> int:
+        return self.count
+
+    def keys(self) -> Sequence[int]:
+        return self._columns['key']
+
+    def rows_between(self, name: str, low: date, high: date) -> List[int]:
+        """日期字段落在 [low, high] 内的行号"""
+        column = self._columns[name + '_ordinal']
+        low, high = low.toordinal(), high.toordinal()
+        return [row for row in range(self.count) if low <= column[row] <= high]
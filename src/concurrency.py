@@ -0,0 +1,331 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from storage import Changes
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# 等待其他进程释放文件锁的最长时间(秒)
+DEFAULT_LOCK_TIMEOUT = 10.0
+# 获取锁失败后的重试间隔(秒)
+_LOCK_POLL_INTERVAL = 0.05
+
+# 旧数据没有uid时，按记录内容推导出的确定性uid所用的命名空间
+_LEGACY_NAMESPACE = uuid.UUID('5b0c1f8e-3f4a-4e8e-9d61-0c7f2a4d9b10')
+
+
+class LockTimeoutError(OSError):
+    """在限定时间内没有获得数据文件锁"""
+
+
+def lock_file_for(data_file: Path) -> Path:
+    """数据文件对应的锁文件"""
+    data_file = Path(data_file)
+    return data_file.with_name(data_file.name + ".lock")
+
+
+class FileLock:
+    """
+    跨进程的建议性文件锁
+
+    基于单独的 ``.lock`` 文件（POSIX上为 ``flock``，Windows上为 ``msvcrt.locking``），
+    只约束同样加锁的进程。同一个对象可以在同一线程内重入。
+    """
+
+    def __init__(self, path: Path, timeout: float = DEFAULT_LOCK_TIMEOUT):
+        self.path = Path(path)
+        self.timeout = timeout
+        self._fp = None
+        self._depth = 0
+        self._thread_lock = threading.RLock()
+
+    def acquire(self) -> None:
+        self._thread_lock.acquire()
+        if self._depth:
+            self._depth += 1
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fp = open(self.path, 'a+b')
+            deadline = time.monotonic() + self.timeout
+            while not self._try_lock(fp):
+                if time.monotonic() >= deadline:
+                    fp.close()
+                    raise LockTimeoutError(f"数据文件正被其他程序写入，等待超时: {self.path}")
+                time.sleep(_LOCK_POLL_INTERVAL)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._fp = fp
+        self._depth = 1
+
+    @staticmethod
+    def _try_lock(fp) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fp.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                fp.seek(0)
+                msvcrt.locking(fp.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            fp, self._fp = self._fp, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+                else:
+                    fp.seek(0)
+                    msvcrt.locking(fp.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                fp.close()
+        self._thread_lock.release()
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+def _hash_file(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class Fingerprint:
+    """
+    数据文件的状态：每个文件的 (大小, 修改时间, 内容摘要)
+
+    检查时先比较大小和修改时间，相同即认为未改动，不读取文件；不同时才计算摘要，
+    只是被触碰而内容未变的文件不会触发重新加载。
+    """
+
+    def __init__(self, entries: Dict[Path, Optional[Tuple[int, int, str]]]):
+        self.entries = entries
+
+    @classmethod
+    def capture(cls, paths: Iterable[Path], previous: Optional['Fingerprint'] = None) -> 'Fingerprint':
+        """
+        记录文件的当前状态
+
+        Args:
+            previous: 之前的状态，大小和修改时间未变的文件沿用其中的摘要，不再读取
+        """
+        entries: Dict[Path, Optional[Tuple[int, int, str]]] = {}
+        for path in paths:
+            path = Path(path)
+            stat = _stat(path)
+            if stat is None:
+                entries[path] = None
+                continue
+            old = previous.entries.get(path) if previous is not None else None
+            if old is not None and old[:2] == stat:
+                entries[path] = old
+                continue
+            try:
+                entries[path] = stat + (_hash_file(path),)
+            except OSError:
+                entries[path] = None
+        return cls(entries)
+
+    def changed(self) -> bool:
+        """文件内容自记录以来是否被改动（包括文件被创建或删除）"""
+        for path, entry in self.entries.items():
+            stat = _stat(path)
+            if stat is None or entry is None:
+                if stat is not None or entry is not None:
+                    return True
+                continue
+            if stat == entry[:2]:
+                continue
+            try:
+                digest = _hash_file(path)
+            except OSError:
+                return True
+            if digest != entry[2]:
+                return True
+            # 只是被触碰，记下新的修改时间，下次检查无需再读取
+            self.entries[path] = stat + (digest,)
+        return False
+
+
+def _stat(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class _Identified(dict):
+    """补上uid或版本号后的记录，``raw`` 为文件中的原始记录"""
+
+    __slots__ = ('raw',)
+
+
+def raw_record(item: Dict[str, Any]) -> Dict[str, Any]:
+    """:func:`with_identity` 产出的记录在补字段之前的原始内容（用于写入隔离文件）"""
+    return getattr(item, 'raw', item)
+
+
+def with_identity(items: Iterable[Tuple[Any, Dict[str, Any]]]) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+    """
+    给没有uid和版本号的旧记录补上这两个字段
+
+    uid由记录内容（以及相同内容出现的次数）推导，读取同一文件的每个进程得到相同的uid，
+    在记录被重新写入之前也能据此对应彼此的修改。与前面记录重复的uid（如手工复制的记录）
+    同样按出现次数重新推导。补过字段的记录是副本，原始记录可用 :func:`raw_record` 取回。
+    """
+    seen: Dict[str, int] = {}
+    uids = set()
+    for key, item in items:
+        uid = item.get('uid')
+        fields: Dict[str, Any] = {}
+        if not uid or uid in uids:
+            content = uid or json.dumps(item, ensure_ascii=False, sort_keys=True, default=str)
+            occurrence = seen.get(content, 0)
+            seen[content] = occurrence + 1
+            uid = fields['uid'] = uuid.uuid5(_LEGACY_NAMESPACE, f"{content}#{occurrence}").hex
+        uids.add(uid)
+        if item.get('revision') is None:
+            fields['revision'] = 0
+        if fields:
+            identified = _Identified(item, **fields)
+            identified.raw = item
+            item = identified
+        yield key, item
+
+
+class Conflict(NamedTuple):
+    """保存或重新加载时发现的冲突：本地未保存的修改与其他进程的修改无法同时保留"""
+
+    uid: str
+    title: str
+    reason: str
+    # 被放弃的本地版本与采用的他人版本（已删除时为None）
+    local: Optional[Dict[str, Any]]
+    remote: Optional[Dict[str, Any]]
+
+
+def describe_conflicts(conflicts: List[Conflict]) -> str:
+    """冲突的可读说明，每行一条"""
+    return "\n".join(f"「{conflict.title}」: {conflict.reason}" for conflict in conflicts)
+
+
+class MergeResult:
+    """合并外部修改的结果：新的记录列表、仍待写入的本地变更和发现的冲突"""
+
+    def __init__(self):
+        self.records: List[Any] = []
+        self.changes = Changes([], [], [])
+        # 仍待删除的记录键 -> (uid, 删除时的版本)
+        self.deleted_identities: Dict[Any, Tuple[str, int]] = {}
+        self.conflicts: List[Conflict] = []
+        # 采纳的外部新增、修改和删除数
+        self.applied = 0
+
+
+def merge_external(records: List[Any], disk: Iterable[Tuple[Any, Dict[str, Any]]], changes: Changes,
+                   deleted_identities: Dict[Any, Tuple[str, int]],
+                   identity: Callable[[Any], Tuple[str, int]],
+                   build: Callable[[Any, Dict[str, Any]], Any],
+                   refresh: Callable[[Any, Any, Dict[str, Any]], Any],
+                   rekey: Callable[[Any, Any], Any],
+                   unkey: Callable[[Any], None],
+                   to_record: Callable[[Any], Dict[str, Any]]) -> MergeResult:
+    """
+    把数据文件的当前内容合并到内存中的记录列表
+
+    记录按uid对应，版本号与本地读取时相同说明他人没有改动。规则：
+
+    - 本地未修改的记录采用文件中的版本；文件中新增的记录加入列表，被删除的移出列表
+    - 本地修改过而他人未改动的记录保留本地修改，继续等待写入
+    - 双方都修改过的记录采用他人的版本，本地版本记为冲突
+    - 他人删除了本地修改过的记录时，本地版本作为新记录保留并记为冲突
+    - 本地删除了他人修改过的记录时，保留他人的版本并记为冲突
+
+    Args:
+        records: 内存中的记录列表
+        disk: 文件中的 (记录键, 记录数据)，须已补全uid和版本号
+        changes: 尚未写入的本地变更，其中的记录键是读取之前的记录键
+        deleted_identities: 本地删除的记录键 -> (uid, 删除时的版本)
+        identity: 记录 -> (uid, 版本)
+        build: 根据文件中的记录创建新对象，无法创建时返回None
+        refresh: 用文件中的记录更新已有对象，返回更新后的对象
+        rekey: 设置对象的新记录键，返回对象
+        unkey: 去掉对象的记录键（将作为新记录写入）
+        to_record: 对象 -> 记录数据（用于冲突说明）
+    """
+    dirty = {id(record) for record in changes.dirty}
+    added = {id(record) for record in changes.added}
+    pending_delete = dict(deleted_identities[key] for key in changes.deleted if key in deleted_identities)
+    local = {identity(record)[0]: record for record in records}
+    result = MergeResult()
+
+    for key, item in disk:
+        uid, revision = item['uid'], item['revision']
+        record = local.pop(uid, None)
+        if record is None:
+            base = pending_delete.pop(uid, None)
+            if base is not None:
+                if base == revision:
+                    result.changes.deleted.append(key)
+                    result.deleted_identities[key] = (uid, revision)
+                    continue
+                result.conflicts.append(Conflict(uid, item.get('title', ''),
+                                                 "本地已删除，但他人修改了该记录，已保留他人的版本",
+                                                 None, item))
+            record = build(key, item)
+            if record is not None:
+                result.records.append(record)
+                result.applied += 1
+            continue
+        if revision == identity(record)[1]:
+            record = rekey(record, key)
+            result.records.append(record)
+            if id(record) in dirty:
+                result.changes.dirty.append(record)
+            continue
+        if id(record) in dirty:
+            result.conflicts.append(Conflict(uid, item.get('title', ''),
+                                             "他人同时修改了该记录，已采用他人的版本",
+                                             to_record(record), item))
+        result.records.append(refresh(record, key, item))
+        result.applied += 1
+
+    for record in local.values():
+        if id(record) in added:
+            result.records.append(record)
+            result.changes.added.append(record)
+        elif id(record) in dirty:
+            result.conflicts.append(Conflict(identity(record)[0], getattr(record, 'title', ''),
+                                             "他人删除了该记录，本地修改已作为新记录保留",
+                                             to_record(record), None))
+            unkey(record)
+            result.records.append(record)
+            result.changes.added.append(record)
+        else:
+            result.applied += 1
+    return result
@@ -0,0 +1,225 @@
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from concurrency import Conflict
+from project_manager import ProjectManager
+from saver import BackgroundSaver, SaveStatus
+from task import Task, WeeklyTask
+from weekly_task_manager import WeeklyTaskManager
+
+logger = logging.getLogger(__name__)
+
+
+class Entity:
+    """变更涉及的数据类别"""
+    PROJECT = "project"    # 项目
+    WEEKLY = "weekly"      # 每周待办事项
+
+
+class ChangeKind:
+    """变更类型"""
+    ADDED = "added"          # 新增了记录
+    UPDATED = "updated"      # 修改了记录的字段
+    REMOVED = "removed"      # 删除了记录
+    RELOADED = "reloaded"    # 合并了其他程序的修改，任何记录都可能变化（uids为空）
+
+
+class ChangeEvent(NamedTuple):
+    """数据服务发布的变更通知"""
+
+    entity: str
+    kind: str
+    # 涉及记录的内部ID
+    uids: Tuple[str, ...] = ()
+
+
+Subscriber = Callable[[ChangeEvent], None]
+
+
+def _check_fields(record: Any, changes: Dict[str, Any]) -> None:
+    """确认要修改的都是记录的数据字段；字段名写错时在修改任何字段之前抛出 ValueError"""
+    unknown = [name for name in changes if name not in record._tracked_fields]
+    if unknown:
+        raise ValueError(f"{type(record).__name__} 没有字段: {', '.join(unknown)}")
+
+
+class DataService:
+    """
+    进程内唯一的数据服务
+
+    持有项目管理器和每周待办事项管理器，界面和对话框都通过它读写数据，不再各自
+    创建管理器重新读取数据文件。经服务完成的新增、修改、删除以及合并外部修改后，
+    服务向订阅者发布 :class:`ChangeEvent`，订阅者据此只刷新受影响的部分。
+
+    默认在发布变更的线程中同步调用回调；给出 ``dispatch`` 时改为 ``dispatch(回调, 事件)``，
+    界面用它把在后台线程中发布的通知（如合并外部修改）转到Tk主线程处理。直接调用
+    管理器完成的修改不会自动通知，需要时用 :meth:`publish` 补发。
+    """
+
+    def __init__(self, project_manager: Optional[ProjectManager] = None,
+                 weekly_task_manager: Optional[WeeklyTaskManager] = None,
+                 dispatch: Optional[Callable[[Subscriber, ChangeEvent], None]] = None):
+        self.projects = project_manager if project_manager is not None else ProjectManager()
+        self.weekly = weekly_task_manager if weekly_task_manager is not None else WeeklyTaskManager()
+        self.dispatch = dispatch
+        self._subscribers: List[Tuple[Subscriber, Optional[str]]] = []
+        # 项目名称列表（供待办事项选择所属项目），项目有变更时作废；
+        # 版本号随作废递增，后台线程算完时若已作废则不缓存过时的结果
+        self._project_names: Optional[List[str]] = None
+        self._names_version = 0
+
+    # ---- 订阅 ----
+
+    def subscribe(self, callback: Subscriber, entity: Optional[str] = None) -> None:
+        """订阅变更通知；指定 ``entity`` 时只接收该类数据的变更"""
+        self._subscribers.append((callback, entity))
+
+    def unsubscribe(self, callback: Subscriber) -> None:
+        """取消订阅（未订阅时忽略）"""
+        self._subscribers = [(cb, entity) for cb, entity in self._subscribers if cb != callback]
+
+    def publish(self, event: ChangeEvent) -> None:
+        """向订阅者发布变更；某个订阅者出错不影响其他订阅者"""
+        if event.entity == Entity.PROJECT:
+            self._names_version += 1
+            self._project_names = None
+        if self.dispatch is not None:
+            self.dispatch(self._deliver, event)
+        else:
+            self._deliver(event)
+
+    def _deliver(self, event: ChangeEvent) -> None:
+        # 回调中可能增减订阅（如对话框关闭），遍历副本
+        for callback, entity in list(self._subscribers):
+            if entity is not None and entity != event.entity:
+                continue
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"处理变更通知 {event} 时出错: {e}")
+
+    def _notify(self, entity: str, kind: str, *uids: str) -> None:
+        self.publish(ChangeEvent(entity, kind, uids))
+
+    # ---- 项目 ----
+
+    def add_project(self, title: str, description: str = "", priority: int = 1,
+                    due_date: Optional[str] = None, start_date: Optional[str] = None,
+                    project_number: Optional[str] = None) -> Optional[Task]:
+        """添加项目，成功后发布新增通知"""
+        task = self.projects.add_project(title, description, priority, due_date, start_date,
+                                         project_number)
+        if task is not None:
+            self._notify(Entity.PROJECT, ChangeKind.ADDED, task.uid)
+        return task
+
+    def update_project(self, task: Task, **changes: Any) -> bool:
+        """
+        修改项目并发布修改通知（保存失败时字段也已改变，同样通知）
+
+        ``changes`` 中的字段在管理器的批量修改中一次赋值：后台线程中的查询不会看到
+        改了一半的项目，赋值出错（如项目编号重复时的 ``DuplicateKeyError``）时全部撤销
+        并抛出异常；含有项目没有的字段时不做任何修改，抛出 ``ValueError``。
+        不给出 ``changes`` 时保存调用方已经做出的修改。
+        """
+        if changes:
+            _check_fields(task, changes)
+            with self.projects.batch() as result:
+                for name, value in changes.items():
+                    setattr(task, name, value)
+            ok = result.saved
+        else:
+            ok = self.projects.update_project(task)
+        self._notify(Entity.PROJECT, ChangeKind.UPDATED, task.uid)
+        return ok
+
+    def delete_project(self, uid: str) -> bool:
+        """根据内部ID删除项目，成功后发布删除通知"""
+        ok = self.projects.delete_project_by_uid(uid)
+        if ok:
+            self._notify(Entity.PROJECT, ChangeKind.REMOVED, uid)
+        return ok
+
+    def project_names(self) -> List[str]:
+        """所有不重复的项目名称（已排序）；可在后台线程中调用"""
+        names = self._project_names
+        if names is None:
+            version = self._names_version
+            names = sorted({task.title for task in self.projects.get_all_projects() if task.title})
+            if version == self._names_version:
+                self._project_names = names
+        return list(names)
+
+    # ---- 每周待办事项 ----
+
+    def add_weekly_task(self, title: str, description: str = "", priority: int = 1,
+                        due_date: Optional[str] = None, start_date: Optional[str] = None,
+                        project_name: Optional[str] = None) -> Optional[WeeklyTask]:
+        """添加待办事项，成功后发布新增通知"""
+        task = self.weekly.add_weekly_task(title, description, priority, due_date, start_date,
+                                           project_name)
+        if task is not None:
+            self._notify(Entity.WEEKLY, ChangeKind.ADDED, task.uid)
+        return task
+
+    def update_weekly_task(self, task: WeeklyTask, **changes: Any) -> bool:
+        """修改待办事项并发布修改通知（``changes`` 的用法同 :meth:`update_project`）"""
+        if changes:
+            _check_fields(task, changes)
+            with self.weekly.batch() as result:
+                for name, value in changes.items():
+                    setattr(task, name, value)
+            ok = result.saved
+        else:
+            ok = self.weekly.update_weekly_task(task)
+        self._notify(Entity.WEEKLY, ChangeKind.UPDATED, task.uid)
+        return ok
+
+    def remove_weekly_task(self, uid: str) -> bool:
+        """根据内部ID删除待办事项，成功后发布删除通知"""
+        ok = self.weekly.remove_weekly_task(uid)
+        if ok:
+            self._notify(Entity.WEEKLY, ChangeKind.REMOVED, uid)
+        return ok
+
+    # ---- 外部修改与保存 ----
+
+    def reload_if_changed(self) -> bool:
+        """合并其他程序对数据文件的修改，合并了的数据类别发布重新加载通知"""
+        merged = False
+        for entity, manager in ((Entity.PROJECT, self.projects), (Entity.WEEKLY, self.weekly)):
+            if manager.reload_if_changed():
+                merged = True
+                self._notify(entity, ChangeKind.RELOADED)
+        return merged
+
+    def take_conflicts(self) -> List[Conflict]:
+        """
+        取出并清空两个管理器记录的冲突
+
+        有冲突的数据类别发布重新加载通知，使界面显示最终采用的版本。
+        """
+        conflicts = []
+        for entity, manager in ((Entity.PROJECT, self.projects), (Entity.WEEKLY, self.weekly)):
+            if manager.conflicts:
+                conflicts.extend(manager.conflicts)
+                manager.conflicts.clear()
+                self._notify(entity, ChangeKind.RELOADED)
+        return conflicts
+
+    def _savers(self) -> List[BackgroundSaver]:
+        return [manager.saver for manager in (self.projects, self.weekly)
+                if manager.saver is not None]
+
+    def save_statuses(self) -> Set[str]:
+        """两个管理器的后台保存状态（没有后台保存器的管理器每次修改都已直接写入）"""
+        return {saver.status for saver in self._savers()} or {SaveStatus.IDLE}
+
+    def flush(self) -> bool:
+        """立即写入两个管理器等待保存的修改"""
+        return all([saver.flush() for saver in self._savers()])
+
+    def close(self) -> bool:
+        """写入尚未保存的修改并释放两个管理器的存储资源"""
+        self._subscribers.clear()
+        return all([self.projects.close(), self.weekly.close()])
@@ -1,9 +1,10 @@
-from datetime import datetime
+from datetime import date, datetime
 from tkinter import ttk, messagebox
 from tkcalendar import DateEntry
 import tkinter as tk
 from typing import Optional, Tuple
-from project_manager import ProjectManager
+from task import date_ordinal
+from data_service import Entity
 
 # UI配置常量
 UI_CONFIG = {
@@ -160,12 +161,10 @@ class TaskDialog:
     def validate_date_format(self, date_str: str, field_name: str) -> bool:
         """验证日期格式是否正确"""
         if date_str:
-            try:
-                datetime.strptime(date_str, "%Y-%m-%d")
+            if date_ordinal(date_str):
                 return True
-            except ValueError:
-                messagebox.showwarning("警告", f"{field_name}格式错误，请使用 YYYY-MM-DD 格式")
-                return False
+            messagebox.showwarning("警告", f"{field_name}格式错误，请使用 YYYY-MM-DD 格式")
+            return False
         return True
 
     def validate_inputs(self) -> bool:
@@ -210,7 +209,7 @@ class TaskDialog:
 class WeeklyTaskDialog:
     """每周任务对话框类，用于创建和编辑每周待办事项"""
 
-    def __init__(self, parent, title, task=None, project_names = None):
+    def __init__(self, parent, title, task=None, project_names = None, service=None):
         """
         初始化每周任务对话框
         
@@ -218,9 +217,11 @@ class WeeklyTaskDialog:
             parent: 父窗口
             title: 对话框标题
             task: 可选的任务对象，用于编辑模式
-            project_name: 可选的项目名称，用于创建模式
+            project_names: 可选的项目名称列表，作为所属项目的候选
+            service: 可选的数据服务；未给出项目名称时从它取得，对话框打开期间项目有变更时更新候选
         """
         self.result = None
+        self.service = service
         self.dialog = tk.Toplevel(parent)
         self.dialog.title(title)
         self.dialog.geometry("400x350")  # 增加对话框高度以容纳描述字段
@@ -263,18 +264,18 @@ class WeeklyTaskDialog:
         ttk.Label(frame, text="所属项目:").grid(row=2, column=0, sticky=tk.W, pady=5)
         self.project_var = tk.StringVar()
         
-        # 使用传入的项目名称列表，避免从project_manager加载
+        # 使用传入的项目名称列表或数据服务中的项目，不再另建管理器读取数据文件
         if project_names is None:
-            from project_manager import ProjectManager
-            manager = ProjectManager()
-            projects = manager.get_all_projects()
-            project_names = sorted(set(project.title for project in projects if project.title))
+            project_names = self.service.project_names() if self.service is not None else []
         
         project_options = ["无"] + project_names
         
-        project_combo = ttk.Combobox(frame, textvariable=self.project_var, 
+        self.project_combo = ttk.Combobox(frame, textvariable=self.project_var, 
                                    values=project_options, width=27)
-        project_combo.grid(row=2, column=1, sticky=tk.W, pady=5, padx=5)
+        self.project_combo.grid(row=2, column=1, sticky=tk.W, pady=5, padx=5)
+        if self.service is not None:
+            self.service.subscribe(self.on_projects_changed, Entity.PROJECT)
+            self.dialog.bind("<Destroy>", self.on_destroy, add="+")
 
         # 删除以下重复代码（第268-274行）
         # 提取项目名称：假设项目名称是任务标题中特定的格式
@@ -326,8 +327,8 @@ class WeeklyTaskDialog:
                                  width=20, date_pattern='yyyy-mm-dd', locale='zh_CN')
         
         # 修复：显式设置日期值，确保在编辑模式下显示任务的原始截止日期
-        if task and task.due_date:
-            due_date_entry.set_date(datetime.strptime(task.due_date, "%Y-%m-%d"))
+        if task and task.ordinal('due_date'):
+            due_date_entry.set_date(date.fromordinal(task.ordinal('due_date')))
             
         due_date_entry.grid(row=5, column=1, sticky=tk.W, pady=5, padx=5)
 
@@ -351,12 +352,9 @@ class WeeklyTaskDialog:
 
         # 验证日期格式
         due_date = self.due_date_var.get().strip()
-        if due_date:
-            try:
-                datetime.strptime(due_date, "%Y-%m-%d")
-            except ValueError:
-                messagebox.showwarning("警告", "预期完成时间格式错误，请使用 YYYY-MM-DD 格式")
-                return
+        if due_date and not date_ordinal(due_date):
+            messagebox.showwarning("警告", "预期完成时间格式错误，请使用 YYYY-MM-DD 格式")
+            return
 
         # 获取任务描述
         description = self.desc_text.get("1.0", tk.END).strip()
@@ -373,4 +371,13 @@ class WeeklyTaskDialog:
 
     def on_cancel(self):
         """取消按钮点击事件"""
-        self.dialog.destroy()
\ No newline at end of file
+        self.dialog.destroy()
+
+    def on_projects_changed(self, event):
+        """对话框打开期间项目有变更（如合并了其他程序的修改）时更新所属项目的候选"""
+        self.project_combo['values'] = ["无"] + self.service.project_names()
+
+    def on_destroy(self, event):
+        """对话框关闭时取消订阅（子控件销毁的事件忽略）"""
+        if event.widget is self.dialog:
+            self.service.unsubscribe(self.on_projects_changed)
\ No newline at end of file
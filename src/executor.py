@@ -0,0 +1,216 @@
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 后台线程数：加载、查询和外部修改检查同时进行时也不互相等待
+DEFAULT_WORKERS = 4
+# 有请求未完成时检查结果队列的间隔(毫秒)
+DEFAULT_POLL_MS = 30
+
+
+class Request:
+    """提交到后台线程的一次调用"""
+
+    def __init__(self, key: Optional[str], on_done: Optional[Callable[[Any], None]],
+                 on_error: Optional[Callable[[BaseException], None]]):
+        self.key = key
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+        self.future = None
+
+    def cancel(self) -> None:
+        """取消请求：尚未开始的不再执行，已在执行的结果被丢弃，回调都不会被调用"""
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+
+class GuiExecutor:
+    """
+    在线程池中执行耗时调用，结果回到Tk主线程处理
+
+    ``submit()`` 立即返回；工作线程把结果放进队列，主线程用 ``root.after`` 定期取出
+    并调用回调，因此回调中可以直接操作控件。带 ``key`` 的请求会取消同一 ``key`` 下
+    尚未完成的旧请求（如被新的筛选条件取代的查询），只有最新请求的结果会被处理。
+    只在有未完成的请求时检查队列，空闲时不占用主循环。
+
+    ``on_busy(busy)`` 在开始有未完成请求和全部完成时各调用一次（主线程中），
+    可用于显示忙碌指示。
+    """
+
+    def __init__(self, root, max_workers: int = DEFAULT_WORKERS, poll_ms: int = DEFAULT_POLL_MS,
+                 on_busy: Optional[Callable[[bool], None]] = None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gui-worker")
+        self._results: 'queue.Queue' = queue.Queue()
+        self._pending: Dict[Request, None] = {}
+        self._latest: Dict[str, Request] = {}
+        self._polling = False
+        self._closed = False
+        self._tk_thread = threading.get_ident()
+
+    @property
+    def busy(self) -> int:
+        """未完成的请求数"""
+        return len(self._pending)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, key: Optional[str] = None,
+               on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None, **kwargs: Any) -> Request:
+        """
+        在后台线程中调用 ``fn(*args, **kwargs)``（须在主线程中调用）
+
+        Args:
+            key: 请求的类别，提交时取消同一类别中尚未完成的请求
+            on_done: 成功时在主线程中以返回值调用
+            on_error: 出错时在主线程中以异常调用；未给出时只记录日志
+        """
+        request = Request(key, on_done, on_error)
+        if self._closed:
+            request.cancelled = True
+            return request
+        was_idle = not self._pending
+        if key is not None:
+            stale = self._latest.get(key)
+            if stale is not None:
+                self._drop(stale)
+            self._latest[key] = request
+        self._pending[request] = None
+        request.future = self._pool.submit(self._run, request, fn, args, kwargs)
+        if was_idle:
+            self._set_busy(True)
+        self._schedule_poll()
+        return request
+
+    def cancel(self, key: str) -> None:
+        """取消某一类别中尚未完成的请求"""
+        request = self._latest.get(key)
+        if request is not None:
+            self._drop(request)
+            if not self._pending:
+                self._set_busy(False)
+
+    def call_soon(self, fn: Callable[..., Any], *args: Any) -> None:
+        """
+        让主线程尽快调用 ``fn(*args)``
+
+        可在后台请求执行期间从工作线程调用（如数据服务从工作线程发布的变更通知），
+        也可在主线程中调用。
+        """
+        self._results.put((None, fn, args))
+        if threading.get_ident() == self._tk_thread:
+            self._schedule_poll()
+
+    def shutdown(self, wait: bool = False) -> None:
+        """取消全部未完成的请求并停止线程池"""
+        self._closed = True
+        for request in list(self._pending):
+            request.cancel()
+        self._pending.clear()
+        self._latest.clear()
+        self._pool.shutdown(wait=wait)
+
+    def _drop(self, request: Request) -> None:
+        request.cancel()
+        self._finish(request)
+
+    def _finish(self, request: Request) -> None:
+        self._pending.pop(request, None)
+        if request.key is not None and self._latest.get(request.key) is request:
+            del self._latest[request.key]
+
+    def _run(self, request: Request, fn: Callable[..., Any], args, kwargs) -> None:
+        """工作线程中执行调用，结果放进队列"""
+        if request.cancelled:
+            return
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._results.put((request, False, e))
+        else:
+            self._results.put((request, True, result))
+
+    def _schedule_poll(self) -> None:
+        if not self._polling and not self._closed:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self) -> None:
+        """主线程中取出已完成的结果并调用回调"""
+        self._polling = False
+        if self._closed:
+            return
+        while True:
+            try:
+                request, ok, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self._call(ok, *value)
+                continue
+            if request.cancelled:
+                continue
+            self._finish(request)
+            if ok:
+                if request.on_done is not None:
+                    self._call(request.on_done, value)
+            elif request.on_error is not None:
+                self._call(request.on_error, value)
+            else:
+                logger.error(f"后台任务出错: {value}")
+            if not self._pending:
+                self._set_busy(False)
+        if self._pending or not self._results.empty():
+            self._schedule_poll()
+
+    @staticmethod
+    def _call(fn: Callable[..., Any], *args: Any) -> None:
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"处理后台任务结果时出错: {e}")
+
+    def _set_busy(self, busy: bool) -> None:
+        if self.on_busy is not None:
+            self._call(self.on_busy, busy)
+
+
+class InlineExecutor:
+    """
+    与 :class:`GuiExecutor` 接口相同、在调用线程中立即执行的执行器
+
+    没有Tk主循环时（脚本、测试）使用，回调在 ``submit()`` 返回前被调用。
+    """
+
+    busy = 0
+
+    def submit(self, fn: Callable[..., Any], *args: Any, key: Optional[str] = None,
+               on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None, **kwargs: Any) -> Request:
+        request = Request(key, on_done, on_error)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(e)
+        else:
+            if on_done is not None:
+                on_done(result)
+        return request
+
+    def cancel(self, key: str) -> None:
+        pass
+
+    def call_soon(self, fn: Callable[..., Any], *args: Any) -> None:
+        fn(*args)
+
+    def shutdown(self, wait: bool = False) -> None:
+        pass
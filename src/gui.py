@@ -8,8 +8,16 @@ from typing import List, Dict, Optional
 import tkinter as tk
 from dialogs import TaskDialog
 from project_manager import ProjectManager
+from task import TaskStatus
 from dialogs import WeeklyTaskDialog
 from weekly_task_manager import WeeklyTaskManager
+from data_service import DataService, Entity, ChangeKind
+from executor import GuiExecutor, InlineExecutor
+from text_filter import TextFilter
+from saver import SaveStatus
+from concurrency import describe_conflicts
+from index import DuplicateKeyError
+from virtual_tree import VirtualTreeview
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -25,22 +33,81 @@ UI_CONFIG = {
         'priority': 80,
         'completed': 80,
         'due_date': 120
-    }
+    },
+    # 关键字输入框宽度(字符)，以及停止输入多久后才筛选(毫秒)
+    'FILTER_WIDTH': 20,
+    'FILTER_DEBOUNCE_MS': 150,
+    # 搜索框宽度(字符)以及最多显示的搜索结果数
+    'SEARCH_WIDTH': 20,
+    'SEARCH_LIMIT': 500,
+    # 后台任务超过该时间(毫秒)仍未完成才显示忙碌指示，避免快速查询时闪烁
+    'BUSY_DELAY_MS': 200
 }
 
+# 后台保存配置：修改停止多久后写入(秒)，界面刷新保存状态的间隔(毫秒)，
+# 以及检查数据文件是否被其他程序修改的间隔(毫秒)
+SAVE_CONFIG = {
+    'AUTOSAVE_DELAY': 0.5,
+    'STATUS_POLL_MS': 500,
+    'EXTERNAL_CHECK_MS': 3000
+}
+
+SAVE_STATUS_TEXT = {
+    SaveStatus.IDLE: "所有修改已保存",
+    SaveStatus.PENDING: "等待保存…",
+    SaveStatus.SAVING: "正在保存…",
+    SaveStatus.FAILED: "保存失败，稍后自动重试"
+}
+
+# 修改已生效但写入数据文件失败（变更仍保留，下次保存时重试）
+SAVE_FAILED_MESSAGE = "修改未能写入数据文件，将在下次保存时重试，请检查磁盘空间和文件权限"
+
 FILTER_OPTIONS = {
     'STATUS': ["所有", "待开始", "进行中", "已完成", "已延期"],
-    'PRIORITY': ["所有", "1", "2", "3", "4", "5"]
+    'PRIORITY': ["所有", "1", "2", "3", "4", "5"],
+    'WEEKLY_STATUS': ["所有", "未完成", "已完成"],
+    'WEEKLY_PRIORITY': ["所有", "一般", "重要", "核心"]
 }
 
 
+def rank_within(ranked, tasks, limit=None):
+    """全文查询按相关程度排好的结果中同时在 tasks 里的记录（最多 limit 个）"""
+    allowed = {task.uid for task in tasks}
+    return [task for task in ranked if task.uid in allowed][:limit]
+
+
 class WeeklyTasksGUI:
     """每周待办事项图形界面（优化版）"""
 
-    def __init__(self, parent, weekly_task_manager):
+    def __init__(self, parent, service=None, executor=None):
         self.parent = parent
-        self.weekly_task_manager = weekly_task_manager
+        self.service = None
+        self.weekly_task_manager = None
+        # 查询在执行器的后台线程中进行；未给出时在主线程中直接执行
+        self.executor = executor if executor is not None else InlineExecutor()
+        # 关键字匹配任务名称、描述和所属项目
+        self.text_filter = TextFilter(('title', 'description', 'project_name'))
+        # 数据每变更一次加一，变更后不再复用上次的筛选结果
+        self._data_version = 0
+        # 每次筛选加一，后台中被取代的筛选据此提前放弃
+        self._filter_generation = 0
+        self._filter_timer = None
         self.setup_ui()
+        if service is not None:
+            self.attach(service)
+
+    def attach(self, service):
+        """数据加载完成后接入数据服务：启用操作按钮并填充列表"""
+        self.service = service
+        self.weekly_task_manager = service.weekly
+        # 待办事项有变更时只刷新当前周的列表，不重新读取数据文件
+        self.service.subscribe(self.on_data_changed, Entity.WEEKLY)
+        # 项目有变更时更新所属项目筛选的候选
+        self.service.subscribe(self.on_projects_changed, Entity.PROJECT)
+        for button in self.action_buttons:
+            button.state(['!disabled'])
+        self.on_projects_changed()
+        self.refresh_weekly_tasks()
 
     def setup_ui(self):
         """设置每周待办事项界面"""
@@ -66,14 +133,15 @@ class WeeklyTasksGUI:
         # 操作按钮
         self.setup_action_buttons(week_frame)
 
+        # 筛选栏
+        self.setup_filter_bar()
+
         # 每周任务列表
         self.setup_task_tree()
 
         # 统计信息
         self.setup_statistics()
 
-        self.refresh_weekly_tasks()
-
     def generate_week_options(self):
         """生成周选项列表"""
         week_options = []
@@ -94,9 +162,82 @@ class WeeklyTasksGUI:
             ("刷新", self.refresh_weekly_tasks, 'Primary.TButton')
         ]
 
+        # 数据加载完成前按钮不可用
+        self.action_buttons = []
         for text, command, style in buttons:
-            ttk.Button(button_frame, text=text, command=command,
-                       style=style).pack(side=tk.LEFT, padx=5)
+            button = ttk.Button(button_frame, text=text, command=command, style=style)
+            button.pack(side=tk.LEFT, padx=5)
+            button.state(['disabled'])
+            self.action_buttons.append(button)
+
+    def setup_filter_bar(self):
+        """设置筛选栏：完成状态、紧急程度、所属项目、关键字和搜索同时生效"""
+        filter_frame = ttk.Frame(self.parent)
+        filter_frame.pack(fill=tk.X, pady=(0, 10))
+
+        filters = [
+            ("状态筛选:", 'status_var', FILTER_OPTIONS['WEEKLY_STATUS']),
+            ("紧急程度筛选:", 'priority_var', FILTER_OPTIONS['WEEKLY_PRIORITY']),
+            ("所属项目筛选:", 'project_var', ["所有"])
+        ]
+        for label, var_name, options in filters:
+            ttk.Label(filter_frame, text=label).pack(side=tk.LEFT, padx=5)
+            var = tk.StringVar(value="所有")
+            setattr(self, var_name, var)
+            combo = ttk.Combobox(filter_frame, textvariable=var, values=options,
+                                 width=12, state="readonly")
+            combo.pack(side=tk.LEFT, padx=5)
+            combo.bind("<<ComboboxSelected>>", self.refresh_weekly_tasks)
+        self.project_combo = combo
+
+        # 关键字匹配任务名称、描述和所属项目，停止输入片刻后才筛选
+        ttk.Label(filter_frame, text="关键字筛选:").pack(side=tk.LEFT, padx=5)
+        self.filter_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.filter_var,
+                  width=UI_CONFIG['FILTER_WIDTH']).pack(side=tk.LEFT, padx=5)
+        self.filter_var.trace_add('write', self.on_filter_typed)
+
+        # 按标题和描述全文搜索，结果按相关程度排列
+        ttk.Label(filter_frame, text="搜索:").pack(side=tk.LEFT, padx=5)
+        self.search_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.search_var,
+                  width=UI_CONFIG['SEARCH_WIDTH']).pack(side=tk.LEFT, padx=5)
+        self.search_var.trace_add('write', self.on_filter_typed)
+
+    def on_filter_typed(self, *args):
+        """关键字和搜索输入防抖：连续输入时只在最后一次按键后筛选一次"""
+        if self._filter_timer is not None:
+            self.parent.after_cancel(self._filter_timer)
+        self._filter_timer = self.parent.after(UI_CONFIG['FILTER_DEBOUNCE_MS'],
+                                               self.refresh_weekly_tasks)
+
+    def on_projects_changed(self, event=None):
+        """在后台线程中取项目名称，更新所属项目筛选的候选"""
+        self.executor.submit(self.service.project_names, key='project-names',
+                             on_done=self.show_project_names)
+
+    def show_project_names(self, names):
+        """所属项目筛选的候选（"无"表示不属于任何项目）"""
+        self.project_combo['values'] = ["所有", "无"] + names
+
+    def get_criteria(self):
+        """当前的完成状态、紧急程度和所属项目筛选条件，None表示不限"""
+        status = self.status_var.get()
+        priority = self.priority_var.get()
+        project = self.project_var.get()
+        return {
+            'is_completed': status == "已完成" if status != "所有" else None,
+            'priority': self.convert_priority(priority) if priority != "所有" else None,
+            'project_name': project if project != "所有" else None
+        }
+
+    @staticmethod
+    def matches(task, criteria):
+        """待办事项是否满足筛选条件"""
+        return ((criteria['is_completed'] is None or task.is_completed == criteria['is_completed'])
+                and (criteria['priority'] is None or task.priority == criteria['priority'])
+                and (criteria['project_name'] is None
+                     or (task.project_name or "无") == criteria['project_name']))
 
     def setup_task_tree(self):
         """设置任务树形列表"""
@@ -105,8 +246,9 @@ class WeeklyTasksGUI:
 
         weekly_columns = ("title", "project", "priority",
                           "completed", "due_date")
-        self.weekly_tree = ttk.Treeview(weekly_frame, columns=weekly_columns,
-                                        show="headings", height=15)
+        # 只渲染可见的行，数据量大时刷新和滚动也不会卡住
+        self.weekly_tree = VirtualTreeview(weekly_frame, columns=weekly_columns,
+                                           show="headings", height=15)
 
         # 设置列标题和宽度
         columns_config = [
@@ -160,19 +302,8 @@ class WeeklyTasksGUI:
 
     def get_weekly_tasks(self, week_number):
         """获取指定周的所有任务"""
-        tasks = self.weekly_task_manager.get_all_weekly_tasks()
-        weekly_tasks = []
-
-        for task in tasks:
-            if task.start_date:
-                try:
-                    task_week = datetime.strptime(
-                        task.start_date, "%Y-%m-%d").isocalendar()[1]
-                    if task_week == week_number:
-                        weekly_tasks.append(task)
-                except ValueError:
-                    continue
-        return weekly_tasks
+        # 周选项都是今年的ISO周，按 (年, 周) 索引直接取出该周的任务
+        return self.weekly_task_manager.get_tasks_by_week(datetime.now().year, week_number)
 
     def convert_priority(self, priority_str):
         """将优先级字符串转换为数值"""
@@ -211,14 +342,9 @@ class WeeklyTasksGUI:
 
     def add_weekly_task(self):
         """添加每周待办事项任务"""
-        from project_manager import ProjectManager
-        project_manager = ProjectManager()
-        projects = project_manager.get_all_projects()
-        project_names = [
-            project.title for project in projects if project.title]
-
+        # 所属项目的候选名称由数据服务提供，对话框打开期间项目有变更时随之更新
         dialog = WeeklyTaskDialog(
-            self.parent, "添加每周任务", project_names=project_names)
+            self.parent, "添加每周任务", service=self.service)
         if dialog.result:
             title, description, project, priority_str, completed, due_date = dialog.result
 
@@ -228,7 +354,8 @@ class WeeklyTasksGUI:
             # 转换优先级和状态
             priority_num = self.convert_priority(priority_str)
 
-            self.weekly_task_manager.add_weekly_task(
+            # 列表由数据服务的新增通知刷新
+            self.service.add_weekly_task(
                 title=title,
                 description=description,
                 priority=priority_num,
@@ -237,92 +364,93 @@ class WeeklyTasksGUI:
                 project_name=project if project != "无" else None
             )
 
-            self.refresh_weekly_tasks()
             messagebox.showinfo("成功", "每周任务添加成功!")
 
     def refresh_weekly_tasks(self, event=None):
-        """刷新每周待办事项（优化版）"""
-        try:
-            # 清空现有数据
-            for item in self.weekly_tree.get_children():
-                self.weekly_tree.delete(item)
-
-            week_number = self.get_selected_week_number()
-            weekly_tasks = self.weekly_task_manager.get_all_weekly_tasks()
-
-            # 显示任务
-            for task in weekly_tasks:
-                try:
-                    # 优化：使用更明确的状态显示
-                    completed_status = "已完成" if task.is_completed else "未完成"
-                    # 将优先级数值转换为星号显示
-                    priority_stars = "★" * min(task.priority, 3) if task.priority else ""
-                    self.weekly_tree.insert("", "end", values=(
-                        task.title,
-                        task.project_name or "无",
-                        priority_stars,
-                        completed_status,  # 使用明确的状态
-                        task.due_date or "无"
-                    ))
-                except Exception as e:
-                    logger.error(f"显示任务时出错: {e}")
-                    continue
-
-            # 更新统计信息
-            self.update_statistics(weekly_tasks)
+        """刷新每周待办事项（在后台查询，新的刷新会取消尚未完成的旧查询）"""
+        self._filter_timer = None
+        if self.service is None:
+            return
+        self._filter_generation += 1
+        generation = self._filter_generation
+        self.executor.submit(self.query_weekly_tasks, self.get_selected_week_number(),
+                             self.get_criteria(), self.filter_var.get(), self.search_var.get(),
+                             lambda: generation != self._filter_generation,
+                             key='weekly-list', on_done=self.show_weekly_tasks,
+                             on_error=self.on_refresh_failed)
+
+    def query_weekly_tasks(self, week_number, criteria, text="", query="", cancelled=None):
+        """
+        所选周符合筛选条件和关键字的任务，以及该周的统计（在后台线程中执行，不访问控件）
+
+        给出搜索词时只保留全文索引匹配的任务，按相关程度排列。
+        """
+        # 周和筛选条件相同、关键字只是变长时，只在上次的结果中查找
+        scope = (week_number, tuple(criteria.items()), self._data_version)
+        weekly_tasks = self.text_filter.apply(
+            scope, lambda: [task for task in self.get_weekly_tasks(week_number)
+                            if self.matches(task, criteria)],
+            text, cancelled)
+        if query.strip():
+            weekly_tasks = rank_within(self.weekly_task_manager.search_weekly_tasks(query),
+                                       weekly_tasks, UI_CONFIG['SEARCH_LIMIT'])
+        stats = self.weekly_task_manager.get_weekly_stats(week_number, datetime.now().year)
+        return weekly_tasks, stats
+
+    def show_weekly_tasks(self, result):
+        """显示查询结果"""
+        weekly_tasks, stats = result
+        # 显示任务：以待办事项的内部ID作为行ID，编辑和删除时直接按ID查找
+        self.weekly_tree.set_items(weekly_tasks, values=self.task_row_values)
+        logger.debug(f"每周任务列表刷新: {self.weekly_tree.last_refresh}")
+
+        # 更新统计信息
+        self.update_statistics(stats)
+
+    def on_refresh_failed(self, error):
+        """后台查询出错"""
+        logger.error(f"刷新任务列表时出错: {error}")
+        messagebox.showerror("错误", "刷新任务列表失败")
+
+    def on_data_changed(self, event):
+        """数据服务发布的待办事项变更：按ID与屏幕上的行比较，只更新变化的行"""
+        self._data_version += 1
+        self.refresh_weekly_tasks()
 
-        except Exception as e:
-            logger.error(f"刷新任务列表时出错: {e}")
-            messagebox.showerror("错误", "刷新任务列表失败")
-
-    def find_matching_task(self, tasks, values):
-        """查找匹配的任务对象"""
-        for task in tasks:
-            try:
-                # 修复：将星号字符串转换回相应的数值，以正确比较优先级
-                priority_value = values[2]
-                # 如果是星号格式，转换为对应的数字
-                if isinstance(priority_value, str) and priority_value.startswith("★"):
-                    priority_num = len(priority_value)
-                else:
-                    # 保持原有逻辑，处理可能的数字值
-                    try:
-                        priority_num = int(priority_value)
-                    except ValueError:
-                        priority_num = 0
-
-                # 修改比较逻辑，使用转换后的优先级数值
-                if (str(task.title) == str(values[0]) and
-                    ((task.project_name or "无") == values[1] or 
-                     (hasattr(task, 'project_number') and (task.project_number or "无") == values[1])) and
-                    task.priority == priority_num and  # 使用转换后的数值进行比较
-                    ("已完成" if task.is_completed else "未完成") == values[3] and
-                        (task.due_date or "无") == values[4]):
-                    return task
-            except Exception as e:
-                # 处理可能的类型转换错误，继续尝试下一个任务
-                logger.error(f"匹配任务时出错: {e}")
-                continue
-        return None
-
-    def update_task_info(self, task, title, description, project, priority, completed, due_date):
-        """更新任务信息"""
+    @staticmethod
+    def task_row_values(task):
+        """待办事项在列表中的一行（只在该行被渲染时调用）"""
+        # 优化：使用更明确的状态显示
+        completed_status = "已完成" if task.is_completed else "未完成"
+        # 将优先级数值转换为星号显示
+        priority_stars = "★" * min(task.priority, 3) if task.priority else ""
+        return (
+            task.title,
+            task.project_name or "无",
+            priority_stars,
+            completed_status,  # 使用明确的状态
+            task.due_date or "无"
+        )
+
+    def task_changes(self, title, description, project, priority, completed, due_date):
+        """对话框结果对应的字段修改"""
         priority_num = self.convert_priority(priority)
         # 修复：正确处理状态转换
         is_completed = completed == "已完成"
 
-        task.title = title
-        task.description = description
-        task.project_name = project if project != "无" else None
-        task.priority = priority_num
-        task.is_completed = is_completed  # 直接设置布尔值
-        task.due_date = due_date
-        task.updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    def update_statistics(self, tasks):
-        """更新统计信息"""
-        total_tasks = len(tasks)
-        completed_tasks = sum(1 for t in tasks if t.is_completed)
+        return {
+            'title': title,
+            'description': description,
+            'project_name': project if project != "无" else None,
+            'priority': priority_num,
+            'is_completed': is_completed,  # 直接设置布尔值
+            'due_date': due_date
+        }
+
+    def update_statistics(self, stats):
+        """更新统计信息（管理器维护的每周计数，不再逐个统计）"""
+        total_tasks = stats['total_tasks']
+        completed_tasks = stats['completed_tasks']
         pending_tasks = total_tasks - completed_tasks
         completion_rate = (completed_tasks / total_tasks *
                            100) if total_tasks > 0 else 0
@@ -340,31 +468,22 @@ class WeeklyTasksGUI:
                 messagebox.showwarning("警告", "请先选择一个任务")
                 return
 
-            # 获取选中的任务信息
-            item = self.weekly_tree.item(selected[0])
-            values = item['values']
-
-            week_number = self.get_selected_week_number()
-            weekly_tasks = self.get_weekly_tasks(week_number)
-
-            # 查找对应的任务对象
-            task_to_edit = self.find_matching_task(weekly_tasks, values)
+            task_to_edit = self.weekly_task_manager.get_weekly_task(selected[0])
 
             if not task_to_edit:
                 messagebox.showwarning("警告", "无法找到匹配的任务")
                 return
 
-            dialog = WeeklyTaskDialog(self.parent, "编辑每周任务", task_to_edit)
+            dialog = WeeklyTaskDialog(self.parent, "编辑每周任务", task_to_edit,
+                                      service=self.service)
             if dialog.result:
                 title, description, project, priority, completed, due_date = dialog.result
 
-                # 更新任务信息
-                self.update_task_info(
-                    task_to_edit, title, description, project, priority, completed, due_date)
-
-                # 修复：将不存在的save_tasks()改为正确的save_data()
-                self.weekly_task_manager.save_data()
-                self.refresh_weekly_tasks()
+                # 只持久化被修改的任务，列表由修改通知刷新
+                if not self.service.update_weekly_task(task_to_edit, **self.task_changes(
+                        title, description, project, priority, completed, due_date)):
+                    messagebox.showerror("错误", SAVE_FAILED_MESSAGE)
+                    return
                 messagebox.showinfo("成功", "任务更新成功!")
         except Exception as e:
             logger.error(f"编辑任务时出错: {e}")
@@ -378,15 +497,7 @@ class WeeklyTasksGUI:
                 messagebox.showwarning("警告", "请先选择一个任务")
                 return
 
-        # 获取选中的任务信息
-            item = self.weekly_tree.item(selected[0])
-            values = item['values']
-
-            week_number = self.get_selected_week_number()
-            weekly_tasks = self.get_weekly_tasks(week_number)
-
-            # 查找对应的任务对象
-            task_to_delete = self.find_matching_task(weekly_tasks, values)
+            task_to_delete = self.weekly_task_manager.get_weekly_task(selected[0])
 
             if not task_to_delete:
                 messagebox.showwarning("警告", "无法找到匹配的任务")
@@ -394,15 +505,10 @@ class WeeklyTasksGUI:
 
             if messagebox.askyesno("确认", "确定要删除这个任务吗？"):
                 # 从管理器中删除任务
-                all_tasks = self.weekly_task_manager.get_all_weekly_tasks()
-                for i, task in enumerate(all_tasks):
-                    if task == task_to_delete:
-                        if self.weekly_task_manager.remove_task(i):
-                            self.refresh_weekly_tasks()
-                            messagebox.showinfo("成功", "任务删除成功!")
-                        else:
-                            messagebox.showerror("错误", "删除任务失败")
-                        break
+                if self.service.remove_weekly_task(task_to_delete.uid):
+                    messagebox.showinfo("成功", "任务删除成功!")
+                else:
+                    messagebox.showerror("错误", "删除任务失败")
         except Exception as e:
             logger.error(f"删除任务时出错: {e}")
             messagebox.showerror("错误", f"删除任务失败: {str(e)}")
@@ -411,10 +517,34 @@ class WeeklyTasksGUI:
 class ProjectTasksGUI:
     """项目任务管理图形界面"""
 
-    def __init__(self, parent_frame, manager):
+    def __init__(self, parent_frame, service=None, executor=None):
         self.parent = parent_frame
-        self.manager = manager
+        self.service = None
+        self.manager = None
+        # 查询在执行器的后台线程中进行；未给出时在主线程中直接执行
+        self.executor = executor if executor is not None else InlineExecutor()
+        # 关键字匹配项目名称、描述、项目编号和项目名；延迟加载时摘要不含描述，
+        # 由全文索引补充
+        self.text_filter = TextFilter(('title', 'description', 'project_number', 'project_name'),
+                                      search=self.search_uids)
+        # 数据每变更一次加一，变更后不再复用上次的筛选结果
+        self._data_version = 0
+        # 每次筛选加一，后台中被取代的筛选据此提前放弃
+        self._filter_generation = 0
+        self._filter_timer = None
         self.setup_ui()
+        if service is not None:
+            self.attach(service)
+
+    def attach(self, service):
+        """数据加载完成后接入数据服务：启用操作按钮并填充列表"""
+        self.service = service
+        self.manager = service.projects
+        # 项目有变更时按通知刷新，不重新读取数据文件
+        self.service.subscribe(self.on_data_changed, Entity.PROJECT)
+        for button in self.action_buttons:
+            button.state(['!disabled'])
+        self.refresh_task_list()
 
     def setup_ui(self):
         """设置任务管理界面"""
@@ -441,12 +571,26 @@ class ProjectTasksGUI:
         ttk.Label(filter_frame, text="项目编号筛选:").pack(side=tk.LEFT, padx=5)
         self.project_number_var = tk.StringVar()
         self.project_number_combo = ttk.Combobox(filter_frame, textvariable=self.project_number_var,
-                                                 values=["所有"] + sorted(set(project.project_number for project in self.manager.get_all_projects() if project.project_number)))
+                                                 values=["所有"])
         self.project_number_combo.set("所有")
         self.project_number_combo.pack(side=tk.LEFT, padx=5)
         self.project_number_combo.bind(
             "<<ComboboxSelected>>", self.filter_tasks)
 
+        # 关键字匹配项目名称、描述和编号，与上面的筛选条件同时生效，停止输入片刻后才筛选
+        ttk.Label(filter_frame, text="关键字筛选:").pack(side=tk.LEFT, padx=5)
+        self.filter_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.filter_var,
+                  width=UI_CONFIG['FILTER_WIDTH']).pack(side=tk.LEFT, padx=5)
+        self.filter_var.trace_add('write', self.on_filter_typed)
+
+        # 按标题和描述全文搜索，结果按相关程度排列
+        ttk.Label(filter_frame, text="搜索:").pack(side=tk.LEFT, padx=5)
+        self.search_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.search_var,
+                  width=UI_CONFIG['SEARCH_WIDTH']).pack(side=tk.LEFT, padx=5)
+        self.search_var.trace_add('write', self.on_filter_typed)
+
         # 任务列表容器框架
         tree_container = ttk.Frame(self.parent)
         tree_container.pack(fill=tk.BOTH, expand=True)
@@ -454,7 +598,8 @@ class ProjectTasksGUI:
         # 任务列表
         columns = ("project_number", "title", "progress",
                    "status", "priority", "start_date", "due_date")
-        self.tree = ttk.Treeview(
+        # 只渲染可见的行，数据量大时刷新和滚动也不会卡住
+        self.tree = VirtualTreeview(
             tree_container, columns=columns, show="headings", height=15)
 
         self.tree.heading("project_number", text="项目编号")
@@ -480,83 +625,172 @@ class ProjectTasksGUI:
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
+        # 列表中项目的汇总统计，随筛选结果更新
+        self.summary_label = ttk.Label(self.parent, text="共 0 个项目")
+        self.summary_label.pack(fill=tk.X, pady=(10, 0))
+
         # 按钮框架
         button_frame = ttk.Frame(self.parent)
         button_frame.pack(fill=tk.X, pady=(15, 0))
 
-        ttk.Button(button_frame, text="添加项目", command=self.add_task,
-                   style='Success.TButton').pack(side=tk.LEFT, padx=5)
-        ttk.Button(button_frame, text="编辑项目", command=self.edit_task,
-                   style='Primary.TButton').pack(side=tk.LEFT, padx=5)
-        ttk.Button(button_frame, text="删除项目", command=self.delete_task,
-                   style='Danger.TButton').pack(side=tk.LEFT, padx=5)
-        ttk.Button(button_frame, text="更新进度", command=self.update_progress,
-                   style='Warning.TButton').pack(side=tk.LEFT, padx=5)
-        ttk.Button(button_frame, text="刷新", command=self.refresh_task_list,
-                   style='Primary.TButton').pack(side=tk.LEFT, padx=5)
-        self.refresh_task_list()
+        buttons = [
+            ("添加项目", self.add_task, 'Success.TButton'),
+            ("编辑项目", self.edit_task, 'Primary.TButton'),
+            ("删除项目", self.delete_task, 'Danger.TButton'),
+            ("更新进度", self.update_progress, 'Warning.TButton'),
+            ("刷新", self.refresh_task_list, 'Primary.TButton')
+        ]
+        # 数据加载完成前按钮不可用，项目编号下拉框在填充列表时更新
+        self.action_buttons = []
+        for text, command, style in buttons:
+            button = ttk.Button(button_frame, text=text, command=command, style=style)
+            button.pack(side=tk.LEFT, padx=5)
+            button.state(['disabled'])
+            self.action_buttons.append(button)
 
     def refresh_task_list(self):
-        """刷新任务列表"""
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        project_numbers = sorted(set(
-            task.project_number for task in self.manager.get_all_projects() if task.project_number))
-        self.project_number_combo['values'] = ["所有"] + project_numbers
-
-        tasks = self.manager.get_all_projects()
-        for task in tasks:
-            self.tree.insert("", "end", values=(
-                task.project_number or "无",
-                task.title,
-                f"{task.progress}%",
-                task.status,
-                task.priority,
-                task.start_date,
-                task.due_date or "无"
-            ))
+        """刷新任务列表（保留当前的筛选条件、滚动位置和选择）"""
+        if self.service is None:
+            return
+        self.refresh_project_numbers()
+        self.filter_tasks()
+
+    def refresh_project_numbers(self):
+        """在后台线程中取项目编号，更新项目编号筛选的候选"""
+        self.executor.submit(self.manager.get_project_numbers, key='project-numbers',
+                             on_done=self.show_project_numbers)
+
+    def show_project_numbers(self, numbers):
+        """项目编号筛选的候选"""
+        self.project_number_combo['values'] = ["所有"] + numbers
+
+    @staticmethod
+    def task_row_values(task):
+        """项目在列表中的一行（只在该行被渲染时调用）"""
+        return (
+            task.project_number or "无",
+            task.title,
+            f"{task.progress}%",
+            task.status,
+            task.priority,
+            task.start_date,
+            task.due_date or "无"
+        )
+
+    def on_filter_typed(self, *args):
+        """关键字和搜索输入防抖：连续输入时只在最后一次按键后筛选一次"""
+        if self._filter_timer is not None:
+            self.parent.after_cancel(self._filter_timer)
+        self._filter_timer = self.parent.after(UI_CONFIG['FILTER_DEBOUNCE_MS'], self.filter_tasks)
+
+    def on_data_changed(self, event):
+        """数据服务发布的项目变更"""
+        self._data_version += 1
+        if event.kind == ChangeKind.UPDATED and not self.filters_active():
+            # 不加筛选时修改不影响列表的成员和顺序，只替换这几个项目并重画可见的行
+            self.tree.update_items(task for task in map(self.manager.get_project_by_uid, event.uids)
+                                   if task is not None)
+            self.refresh_project_numbers()
+            # 状态和进度可能变了，列表即全部项目
+            self.executor.submit(self.manager.summarize, key='project-summary', on_done=self.show_summary)
+        else:
+            # 新增、删除或在筛选下修改时重新查询，与屏幕上的行按ID比较后只更新变化的行
+            self.refresh_task_list()
 
-    def filter_tasks(self, event=None):
-        """筛选任务"""
+    def get_criteria(self):
+        """当前的状态、优先级和项目编号筛选条件，None表示不限"""
         status_filter = self.status_var.get()
         priority_filter = self.priority_var.get()
         project_number_filter = self.project_number_var.get()
 
-        tasks = self.manager.get_all_projects()
-
-        if status_filter != "所有":
-            tasks = [t for t in tasks if t.status == status_filter]
-
-        if priority_filter != "所有":
-            tasks = [t for t in tasks if t.priority == int(priority_filter)]
-
-        if project_number_filter != "所有":
-            tasks = [t for t in tasks if t.project_number ==
-                     project_number_filter]
+        return {
+            'status': status_filter if status_filter != "所有" else None,
+            'priority': int(priority_filter) if priority_filter != "所有" else None,
+            'project_number': project_number_filter if project_number_filter != "所有" else None
+        }
 
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+    def filters_active(self):
+        """是否加了筛选条件、关键字或搜索词"""
+        return (any(value is not None for value in self.get_criteria().values())
+                or bool(self.filter_var.get().strip()) or bool(self.search_var.get().strip()))
 
-        for task in tasks:
-            self.tree.insert("", "end", values=(
-                task.project_number or "无",
-                task.title,
-                f"{task.progress}%",
-                task.status,
-                task.priority,
-                task.start_date,
-                task.due_date or "无"
-            ))
+    def filter_tasks(self, event=None):
+        """筛选任务（在后台查询，新的筛选会取消尚未完成的旧查询）"""
+        self._filter_timer = None
+        if self.service is None:
+            return
+        self._filter_generation += 1
+        generation = self._filter_generation
+        self.executor.submit(self.query_view, self.get_criteria(), self.filter_var.get(),
+                             self.search_var.get(), lambda: generation != self._filter_generation,
+                             key='project-list', on_done=self.show_view,
+                             on_error=self.on_query_failed)
+
+    def query_view(self, criteria, text="", query="", cancelled=None):
+        """列表中的项目及其汇总统计（在后台线程中执行，不访问控件）"""
+        tasks = self.query_tasks(criteria, text, query, cancelled)
+        return tasks, self.manager.summarize(tasks)
+
+    def query_tasks(self, criteria, text="", query="", cancelled=None):
+        """
+        符合筛选条件和关键字的项目，保持列表顺序（在后台线程中执行，不访问控件）
+
+        给出搜索词时只保留全文索引匹配的项目，按相关程度排列。
+        """
+        if query.strip() and not text.strip() and all(value is None for value in criteria.values()):
+            # 只有搜索词时按相关程度取前面的结果，不必对全部匹配的项目排序
+            return self.manager.search_projects(query, UI_CONFIG['SEARCH_LIMIT'])
+        # 筛选条件交给管理器执行（数据库后端直接下推到SQL），关键字在其结果上筛选；
+        # 条件相同、关键字只是变长时只在上次的结果中查找
+        scope = (tuple(criteria.items()), self._data_version)
+        tasks = self.text_filter.apply(scope, lambda: self.manager.query_projects(**criteria),
+                                       text, cancelled)
+        if query.strip():
+            tasks = rank_within(self.manager.search_projects(query), tasks, UI_CONFIG['SEARCH_LIMIT'])
+        return tasks
+
+    def search_uids(self, term):
+        """全文索引中标题或描述含有该词的项目ID（索引不含描述时不必查询，以免先花时间切词）"""
+        if not self.manager.search_covers_descriptions():
+            return set()
+        return {task.uid for task in self.manager.search_projects(term)}
+
+    def show_tasks(self, tasks):
+        """显示查询结果"""
+        # 以项目的内部ID作为行ID，编号重复时也能定位到所选项目；
+        # 与屏幕上的行逐个比较，编辑一个项目后只更新这一行
+        self.tree.set_items(tasks, values=self.task_row_values)
+        logger.debug(f"项目列表刷新: {self.tree.last_refresh}")
+
+    def show_view(self, view):
+        """显示查询结果及其汇总统计"""
+        tasks, summary = view
+        self.show_tasks(tasks)
+        self.show_summary(summary)
+
+    def show_summary(self, summary):
+        """显示汇总统计：各状态的项目数、平均进度和逾期数"""
+        counts = summary['status_counts']
+        parts = [f"共 {summary['total']} 个项目"]
+        parts += [f"{status.value} {counts.get(status.value, 0)}" for status in TaskStatus]
+        parts += [f"平均进度 {summary['average_progress']}%", f"逾期 {summary['overdue']}"]
+        self.summary_label.config(text="  ·  ".join(parts))
+
+    def on_query_failed(self, error):
+        """后台查询出错"""
+        logger.error(f"筛选项目时出错: {error}")
+        messagebox.showerror("错误", "筛选项目失败")
 
     def add_task(self):
         """添加新任务"""
         dialog = TaskDialog(self.parent, "添加项目")
         if dialog.result:
             title, description, priority, due_date, start_date, project_number = dialog.result
-            self.manager.add_project(
-                title, description, priority, due_date, start_date, project_number)
-            self.refresh_task_list()
+            # 列表由数据服务的新增通知刷新
+            if self.service.add_project(
+                    title, description, priority, due_date, start_date, project_number) is None:
+                messagebox.showerror("错误", "项目添加失败，项目编号可能已存在")
+                return
             messagebox.showinfo("成功", "项目添加成功!")
 
     def edit_task(self):
@@ -566,31 +800,25 @@ class ProjectTasksGUI:
             messagebox.showwarning("警告", "请先选择一个项目")
             return
 
-        item = self.tree.item(selected[0])
-        project_number = item['values'][0]
-
-        # 确保项目编号是字符串类型
-        if project_number != "无":  # 处理"无"的情况
-            project_number = str(project_number)  # 确保转换为字符串
-        else:
-            messagebox.showwarning("警告", "无法编辑没有项目编号的任务")
-            return
-
-        task = self.manager.get_project_by_number(project_number)
+        task = self.manager.get_project_by_uid(selected[0])
 
         if task:
             dialog = TaskDialog(self.parent, "编辑项目", task)
             if dialog.result:
                 title, description, priority, due_date, start_date, project_number = dialog.result
-                task.title = title
-                task.description = description
-                task.priority = priority
-                task.due_date = due_date
-                task.start_date = start_date
-                task.project_number = project_number
-                task.updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.manager.save_data()
-                self.refresh_task_list()
+                # 字段一次全部修改，编号重复时全部撤销
+                try:
+                    saved = self.service.update_project(
+                        task, project_number=project_number, title=title,
+                        description=description, priority=priority, due_date=due_date,
+                        start_date=start_date,
+                        updated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                except DuplicateKeyError:
+                    messagebox.showerror("错误", f"项目编号 {project_number} 已存在")
+                    return
+                if not saved:
+                    messagebox.showerror("错误", SAVE_FAILED_MESSAGE)
+                    return
                 messagebox.showinfo("成功", "项目更新成功!")
 
     def update_progress(self):
@@ -600,17 +828,7 @@ class ProjectTasksGUI:
             messagebox.showwarning("警告", "请先选择一个项目")
             return
 
-        item = self.tree.item(selected[0])
-        project_number = item['values'][0]
-
-        # 确保项目编号是字符串类型
-        if project_number != "无":  # 处理"无"的情况
-            project_number = str(project_number)  # 确保转换为字符串
-        else:
-            messagebox.showwarning("警告", "无法更新没有项目编号的任务进度")
-            return
-
-        task = self.manager.get_project_by_number(project_number)
+        task = self.manager.get_project_by_uid(selected[0])
 
         if task:
             new_progress = simpledialog.askinteger("更新进度",
@@ -618,16 +836,17 @@ class ProjectTasksGUI:
                                                    initialvalue=task.progress,
                                                    minvalue=0, maxvalue=100)
             if new_progress is not None:
-                task.progress = new_progress
                 if new_progress == 100:
-                    task.status = "已完成"
+                    status = "已完成"
                 elif new_progress > 0:
-                    task.status = "进行中"
+                    status = "进行中"
                 else:
-                    task.status = "待开始"
-                task.updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.manager.save_data()
-                self.refresh_task_list()
+                    status = "待开始"
+                if not self.service.update_project(
+                        task, progress=new_progress, status=status,
+                        updated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S")):
+                    messagebox.showerror("错误", SAVE_FAILED_MESSAGE)
+                    return
                 messagebox.showinfo("成功", "进度更新成功!")
 
     def delete_task(self):
@@ -637,19 +856,8 @@ class ProjectTasksGUI:
             messagebox.showwarning("警告", "请先选择一个项目")
             return
 
-        item = self.tree.item(selected[0])
-        project_number = item['values'][0]
-
-        # 确保项目编号是字符串类型
-        if project_number != "无":  # 处理"无"的情况
-            project_number = str(project_number)  # 确保转换为字符串
-        else:
-            messagebox.showwarning("警告", "无法删除没有项目编号的任务")
-            return
-
         if messagebox.askyesno("确认", "确定要删除这个项目吗？"):
-            if self.manager.delete_project(project_number):
-                self.refresh_task_list()
+            if self.service.delete_project(selected[0]):
                 messagebox.showinfo("成功", "项目删除成功!")
             else:
                 messagebox.showerror("错误", "删除项目失败")
@@ -663,16 +871,127 @@ class ProjectManagerGUI:
         self.root.title("项目进度管理系统")
         self.root.state('zoomed')
         self.root.configure(bg='#ecf0f1')
-        # 初始化项目管理器
-        self.manager = ProjectManager()
-        # 初始化每周待办事项管理器
-        self.weekly_task_manager = WeeklyTaskManager()
+        # 数据服务在后台线程中打开，加载完成前为None
+        self.service = None
+        self.manager = None
+        self.weekly_task_manager = None
+        self.closing = False
+        # 加载、查询和外部修改检查都在后台线程中执行，结果回到主线程更新界面
+        self.executor = GuiExecutor(self.root, on_busy=self.update_busy)
         # 当前视图
         self.current_view = "split"
         # 视图字典
         self.views = {}
 
+        # 先显示界面，数据到达后再填充列表
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.executor.submit(self.open_service, on_done=self.on_data_loaded,
+                             on_error=self.on_load_failed)
+
+    def open_service(self):
+        """打开数据文件（在后台线程中执行）"""
+        # 两个管理器都由数据服务持有，各视图和对话框共用，通过变更通知刷新；
+        # 通知转到主线程处理
+        return DataService(
+            # 初始化项目管理器（变更日志模式，修改只追加写入，由后台线程合并保存；
+            # 延迟加载，列表只保留摘要，编辑时才构建完整项目；项目编号不允许重复。
+            # 不启用列存储：它只服务日期范围查询，界面不做这种查询，
+            # 启用后只会在每次保存后被丢弃重建）
+            ProjectManager(
+                journal=True, autosave_delay=SAVE_CONFIG['AUTOSAVE_DELAY'], lazy=True,
+                unique_numbers=True),
+            # 初始化每周待办事项管理器
+            WeeklyTaskManager(journal=True, autosave_delay=SAVE_CONFIG['AUTOSAVE_DELAY']),
+            dispatch=self.executor.call_soon)
+
+    def on_data_loaded(self, service):
+        """数据加载完成：各视图接入数据服务并填充列表，开始检查保存状态和外部修改"""
+        self.service = service
+        self.manager = service.projects
+        self.weekly_task_manager = service.weekly
+        self.weekly_gui.attach(service)
+        self.project_gui.attach(service)
+        self.update_save_status()
+        self.root.after(SAVE_CONFIG['EXTERNAL_CHECK_MS'], self.check_external_changes)
+
+    def on_load_failed(self, error):
+        """数据加载失败"""
+        logger.error(f"加载数据失败: {error}")
+        messagebox.showerror("错误", f"加载数据失败: {error}")
+
+    def update_busy(self, busy):
+        """后台任务开始或全部完成时更新忙碌指示（短时间内完成的不显示）"""
+        if busy:
+            self.root.after(UI_CONFIG['BUSY_DELAY_MS'], self.show_busy)
+        else:
+            self.busy_label.config(text="")
+            self.root.config(cursor="")
+
+    def show_busy(self):
+        """后台任务仍未完成时显示忙碌指示"""
+        if self.executor.busy:
+            self.busy_label.config(text="正在加载数据…" if self.service is None else "正在处理…")
+            self.root.config(cursor="watch")
+
+    def on_close(self):
+        """关闭窗口前在后台写入所有等待保存的修改，完成后再关闭"""
+        if self.service is None:
+            # 数据尚未加载完成，没有需要保存的修改
+            self.destroy()
+            return
+        self.closing = True
+        self.executor.submit(self.service.flush, key='close', on_done=self.confirm_close,
+                             on_error=lambda error: self.confirm_close(False))
+
+    def confirm_close(self, ok):
+        """保存完成后关闭；保存失败时询问是否仍然退出"""
+        if not ok and not messagebox.askyesno(
+                "保存失败", "部分修改未能保存，仍然退出吗？"):
+            self.closing = False
+            self.root.after(SAVE_CONFIG['EXTERNAL_CHECK_MS'], self.check_external_changes)
+            return
+        self.executor.submit(self.service.close, key='close', on_done=self.destroy,
+                             on_error=self.destroy)
+
+    def destroy(self, result=None):
+        """停止后台线程并关闭窗口"""
+        self.executor.shutdown()
+        self.root.destroy()
+
+    def update_save_status(self):
+        """定期刷新保存状态指示"""
+        statuses = self.service.save_statuses()
+        for status in (SaveStatus.FAILED, SaveStatus.SAVING, SaveStatus.PENDING, SaveStatus.IDLE):
+            if status in statuses:
+                break
+        self.save_status_label.config(
+            text=SAVE_STATUS_TEXT[status],
+            style='Error.Small.TLabel' if status == SaveStatus.FAILED else 'Small.TLabel')
+        self.root.after(SAVE_CONFIG['STATUS_POLL_MS'], self.update_save_status)
+
+    def check_external_changes(self):
+        """定期在后台合并其他程序对数据文件的修改"""
+        if self.closing:
+            return
+        # 合并了外部修改的数据类别发布重新加载通知，由各视图在主线程中自行刷新
+        self.executor.submit(self.service.reload_if_changed, key='external-check',
+                             on_done=self.after_external_check,
+                             on_error=self.on_external_check_failed)
+
+    def after_external_check(self, merged=False):
+        """提示冲突并安排下一次检查"""
+        # 保存时发现的冲突也在这里统一提示，取出冲突时同样通知视图显示采用的版本
+        conflicts = self.service.take_conflicts()
+        if conflicts:
+            messagebox.showwarning("修改冲突", "以下记录同时被其他程序修改：\n" +
+                                   describe_conflicts(conflicts))
+        self.root.after(SAVE_CONFIG['EXTERNAL_CHECK_MS'], self.check_external_changes)
+
+    def on_external_check_failed(self, error):
+        """合并外部修改出错，下次检查时重试"""
+        logger.error(f"合并外部修改时出错: {error}")
+        self.after_external_check()
 
     def setup_ui(self):
         """设置用户界面"""
@@ -689,6 +1008,15 @@ class ProjectManagerGUI:
                                       style='Nav.TButton')
         self.project_btn.pack(side=tk.LEFT, padx=5)
 
+        # 保存状态指示
+        self.save_status_label = ttk.Label(nav_frame, style='Small.TLabel',
+                                           text=SAVE_STATUS_TEXT[SaveStatus.IDLE])
+        self.save_status_label.pack(side=tk.RIGHT, padx=10)
+
+        # 后台任务的忙碌指示
+        self.busy_label = ttk.Label(nav_frame, style='Small.TLabel', text="")
+        self.busy_label.pack(side=tk.RIGHT, padx=10)
+
         self.select_button(self.weekly_btn)
 
         # 主容器框架
@@ -709,13 +1037,12 @@ class ProjectManagerGUI:
         """创建所有视图框架"""
         # 每周待办事项视图
         weekly_frame = ttk.Frame(self.main_container, padding="10")
-        self.weekly_gui = WeeklyTasksGUI(
-            weekly_frame, self.weekly_task_manager)
+        self.weekly_gui = WeeklyTasksGUI(weekly_frame, executor=self.executor)
         self.views["weekly"] = weekly_frame
 
         # 项目信息视图
         project_frame = ttk.Frame(self.main_container, padding="10")
-        self.project_gui = ProjectTasksGUI(project_frame, self.manager)
+        self.project_gui = ProjectTasksGUI(project_frame, executor=self.executor)
         self.views["project"] = project_frame
 
         # 初始隐藏所有视图
@@ -744,13 +1071,3 @@ class ProjectManagerGUI:
         elif view_name == "project":
             self.select_button(self.project_btn)
 
-
-def setup_weekly_tasks_ui(self, parent):
-    """设置每周待办事项界面"""
-    # 创建WeeklyTaskManager实例
-    weekly_task_manager = WeeklyTaskManager()
-
-    # 创建WeeklyTasksGUI实例，传递正确的manager
-    self.weekly_tasks_gui = WeeklyTasksGUI(parent, weekly_task_manager)
-
-    # 移除原有的UI设置代码，因为WeeklyTasksGUI会自己设置UI
\ No newline at end of file
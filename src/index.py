@@ -0,0 +1,250 @@
+from bisect import bisect_left, insort
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from aggregates import Aggregates
+
+
+class DuplicateKeyError(ValueError):
+    """违反唯一约束：uid或唯一字段的值已被其他记录使用"""
+
+
+def _empty(value: Any) -> bool:
+    # 无值和空串不参与唯一约束，也不出现在取值列表中
+    return value is None or value == ''
+
+
+class RecordIndex:
+    """
+    记录的哈希索引
+
+    ``records`` 按uid保存记录，同时是记录列表本身（按加入顺序），按uid查找、替换、
+    删除都是O(1)。``fields`` 中的每个字段另有 值 -> uid集合 的索引，按条件筛选时
+    从最小的集合开始求交集，耗时只与结果规模有关；``sorted_fields`` 中的字段另外维护
+    排好序的不同取值列表。``derived`` 定义由字段计算出的索引键，如
+    ``{'week': ('start_date', iso_week)}`` 按开始日期所在的周分组。记录挂载到带索引的
+    变更跟踪器后，字段被赋值时索引随之更新；通过 ``set_untracked`` 的修改需要调用方
+    自行 ``rebuild``。指定 ``aggregates`` 时，记录的加入、移除和字段修改同时用于更新
+    其中的分组统计；``observers`` 中的对象（如 :class:`search.SearchIndex`）以同样的
+    ``rebuild``/``add``/``remove``/``replace``/``rekey``/``field_changed`` 接口得到通知，
+    uid被修改时也会通知。
+    """
+
+    def __init__(self, fields: Iterable[str] = (), unique: Iterable[str] = (),
+                 sorted_fields: Iterable[str] = (),
+                 derived: Optional[Dict[str, Tuple[str, Callable[[Any], Any]]]] = None,
+                 aggregates: Optional[Aggregates] = None, observers: Iterable[Any] = ()):
+        self.records: Dict[str, Any] = {}
+        self.aggregates = aggregates
+        # 随记录变化而更新的附属结构，分组统计排在最前
+        self._observers = ([aggregates] if aggregates is not None else []) + list(observers)
+        # uid -> 在列表中的次序，筛选结果按它排序
+        self._order: Dict[str, int] = {}
+        self._next_order = 0
+        self.unique = frozenset(unique)
+        # 索引名 -> (来源字段, 计算索引键的函数)，普通字段的函数为None
+        self._keys: Dict[str, Tuple[str, Optional[Callable[[Any], Any]]]] = {
+            name: (name, None) for name in set(fields) | self.unique | set(sorted_fields)}
+        self._keys.update(derived or {})
+        # 来源字段 -> 依赖它的索引名
+        self._sources: Dict[str, List[str]] = {}
+        for name, (source, _) in self._keys.items():
+            self._sources.setdefault(source, []).append(name)
+        # 索引名 -> 索引键 -> {uid: None}（有序集合）
+        self._values: Dict[str, Dict[Any, Dict[str, None]]] = {name: {} for name in self._keys}
+        # 字段 -> 排好序的不同取值（不含无值和空串）
+        self._sorted: Dict[str, List[Any]] = {name: [] for name in sorted_fields}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.records.values())
+
+    def __contains__(self, uid: str) -> bool:
+        return uid in self.records
+
+    def get(self, uid: str) -> Optional[Any]:
+        return self.records.get(uid)
+
+    def rebuild(self, records: Iterable[Any]) -> int:
+        """
+        按给定顺序重建索引（加载、合并或撤销修改之后）
+
+        不检查唯一约束，已有的重复取值照常保留。
+
+        Returns:
+            违反唯一约束的记录数
+        """
+        self.records = {}
+        self._order = {}
+        for values in self._values.values():
+            values.clear()
+        duplicates = 0
+        for order, record in enumerate(records):
+            if record.uid in self.records:
+                raise DuplicateKeyError(f"重复的uid: {record.uid}")
+            self.records[record.uid] = record
+            self._order[record.uid] = order
+            for name, values in self._values.items():
+                value = self._key(record, name)
+                bucket = values.setdefault(value, {})
+                if name in self.unique and bucket and not _empty(value):
+                    duplicates += 1
+                bucket[record.uid] = None
+        self._next_order = len(self.records)
+        for name in self._sorted:
+            self._sorted[name] = sorted(value for value in self._values[name] if not _empty(value))
+        for observer in self._observers:
+            observer.rebuild(self.records.values())
+        return duplicates
+
+    def add(self, record: Any) -> None:
+        """加入新记录"""
+        if record.uid in self.records:
+            raise DuplicateKeyError(f"重复的uid: {record.uid}")
+        for name in self.unique:
+            self.check(record, name, getattr(record, name))
+        self.records[record.uid] = record
+        self._order[record.uid] = self._next_order
+        self._next_order += 1
+        for name in self._values:
+            self._link(name, self._key(record, name), record.uid)
+        for observer in self._observers:
+            observer.add(record)
+
+    def replace(self, record: Any) -> None:
+        """用同一uid的新对象替换原记录（如摘要换成完整记录），位置不变"""
+        old = self.records[record.uid]
+        self.records[record.uid] = record
+        for name in self._values:
+            before, after = self._key(old, name), self._key(record, name)
+            if before != after:
+                self._unlink(name, before, record.uid)
+                self._link(name, after, record.uid)
+        for observer in self._observers:
+            observer.replace(old, record)
+
+    def rekey(self, record: Any) -> None:
+        """
+        用同一uid、只有存储键不同的新对象替换原记录（如压缩后重新编号的摘要）
+
+        字段都相同，字段索引和分组统计不变，只有保存记录对象的观察者需要换成新对象。
+        """
+        old = self.records[record.uid]
+        self.records[record.uid] = record
+        for observer in self._observers:
+            observer.rekey(old, record)
+
+    def discard(self, uid: str) -> Optional[Any]:
+        """移除记录，返回被移除的记录"""
+        record = self.records.pop(uid, None)
+        if record is None:
+            return None
+        del self._order[uid]
+        for name in self._values:
+            self._unlink(name, self._key(record, name), uid)
+        for observer in self._observers:
+            observer.remove(record)
+        return record
+
+    def lookup(self, name: str, value: Any) -> List[Any]:
+        """字段等于 value 的记录（按加入该取值的顺序）"""
+        records = self.records
+        return [records[uid] for uid in self._values[name].get(value, ())]
+
+    def first(self, name: str, value: Any) -> Optional[Any]:
+        """字段等于 value 的第一条记录"""
+        bucket = self._values[name].get(value)
+        return self.records[next(iter(bucket))] if bucket else None
+
+    def select(self, **criteria: Any) -> List[Any]:
+        """
+        各字段等于给定值的记录（按列表顺序）
+
+        从最小的uid集合开始依次与其余集合求交集；没有条件时返回全部记录。
+        """
+        if not criteria:
+            return list(self.records.values())
+        buckets = sorted((self._values[name].get(value, {}) for name, value in criteria.items()), key=len)
+        uids = buckets[0].keys()
+        for bucket in buckets[1:]:
+            if not uids:
+                break
+            uids = uids & bucket.keys()
+        # 交集无序，字段被修改过的记录也排在集合末尾，按列表次序排列
+        records = self.records
+        return [records[uid] for uid in sorted(uids, key=self._order.__getitem__)]
+
+    def counts(self, name: str) -> Dict[Any, int]:
+        """字段每个取值的记录数"""
+        return {value: len(bucket) for value, bucket in self._values[name].items()}
+
+    def distinct(self, name: str) -> List[Any]:
+        """字段的不同取值（不含无值和空串）；``sorted_fields`` 中的字段已排序"""
+        if name in self._sorted:
+            return list(self._sorted[name])
+        return [value for value in self._values[name] if not _empty(value)]
+
+    def check(self, record: Any, name: str, value: Any) -> None:
+        """字段即将被赋值为 value，违反唯一约束时抛出 DuplicateKeyError"""
+        if name == 'uid':
+            if value != record.uid and value in self.records:
+                raise DuplicateKeyError(f"重复的uid: {value}")
+            return
+        if name not in self.unique or _empty(value):
+            return
+        bucket = self._values[name].get(value)
+        if bucket and (len(bucket) > 1 or record.uid not in bucket):
+            raise DuplicateKeyError(f"{name} 已存在: {value}")
+
+    def field_changed(self, record: Any, name: str, old: Any) -> None:
+        """记录的字段已被赋值，更新索引"""
+        if name == 'uid':
+            if self.records.get(old) is record:
+                # 保持记录在列表中的位置
+                self.records = {record.uid if uid == old else uid: item
+                                for uid, item in self.records.items()}
+                self._order[record.uid] = self._order.pop(old)
+                for values in self._values.values():
+                    for bucket in values.values():
+                        if old in bucket:
+                            bucket[record.uid] = bucket.pop(old)
+        if self.records.get(record.uid) is not record:
+            return
+        for observer in self._observers:
+            observer.field_changed(record, name, old)
+        if name == 'uid' or name not in self._sources:
+            return
+        value = getattr(record, name)
+        for index_name in self._sources[name]:
+            func = self._keys[index_name][1]
+            before, after = (func(old), func(value)) if func is not None else (old, value)
+            if before != after:
+                self._unlink(index_name, before, record.uid)
+                self._link(index_name, after, record.uid)
+
+    def _key(self, record: Any, name: str) -> Any:
+        source, func = self._keys[name]
+        value = getattr(record, source)
+        return func(value) if func is not None else value
+
+    def _link(self, name: str, value: Any, uid: str) -> None:
+        values = self._values[name]
+        bucket = values.get(value)
+        if bucket is None:
+            bucket = values[value] = {}
+            if name in self._sorted and not _empty(value):
+                insort(self._sorted[name], value)
+        bucket[uid] = None
+
+    def _unlink(self, name: str, value: Any, uid: str) -> None:
+        values = self._values[name]
+        bucket = values.get(value)
+        if bucket is None:
+            return
+        bucket.pop(uid, None)
+        if not bucket:
+            del values[value]
+            if name in self._sorted and not _empty(value):
+                ordered = self._sorted[name]
+                del ordered[bisect_left(ordered, value)]
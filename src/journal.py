@@ -0,0 +1,448 @@
+import json
+import os
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from loader import (LoadStats, RecordLocator, encode_json_array, iter_json_array,
+                    iter_json_array_spans)
+
+logger = logging.getLogger(__name__)
+
+# 日志文件超过该大小(字节)后触发后台压缩
+DEFAULT_COMPACT_THRESHOLD = 1024 * 1024
+
+
+def _digest(payload: bytes) -> str:
+    """计算快照内容的摘要，用于确认日志对应的快照版本"""
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _file_digest(path: Path) -> str:
+    """按块计算文件摘要，文件不存在时等同于空快照"""
+    hasher = hashlib.sha256()
+    if path.exists():
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ChangeJournal:
+    """
+    追加写变更日志
+
+    快照文件保持原来的JSON数组格式，每次修改只在旁边的 ``.journal`` 文件末尾
+    追加一行记录；日志超过阈值后在后台线程中把日志合并为新的快照。
+
+    日志记录其所基于的快照摘要（通常在第一行；后台压缩时新快照编码完成后才追加），
+    其余每行是一条操作::
+
+        {"op": "base", "snapshot": "<sha256>"}
+        {"op": "add", "key": 3, "data": {...}}
+        {"op": "update", "key": 1, "data": {...}}
+        {"op": "delete", "keys": [0, 2]}
+
+    记录键在快照内为其位置，新增记录依次递增；压缩时按新快照中的位置重新编号。
+
+    每条操作写入后立即fsync，写入返回即表示修改已落盘；在 ``deferred_sync()``
+    块内追加的多条操作在块结束时一起fsync一次。
+    """
+
+    def __init__(self, snapshot_file: Path, compact_threshold: int = DEFAULT_COMPACT_THRESHOLD):
+        self.snapshot_file = Path(snapshot_file)
+        self.journal_file = self.snapshot_file.with_name(self.snapshot_file.name + ".journal")
+        # 正在合并中的旧日志，压缩完成后删除
+        self.compacting_file = self.snapshot_file.with_name(self.snapshot_file.name + ".journal.compacting")
+        self.compact_threshold = compact_threshold
+        self.next_key = 0
+        self._fp = None
+        self._size = 0
+        # deferred_sync() 的嵌套层数，以及已写入但尚未fsync的操作
+        self._deferred = 0
+        self._unsynced = False
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # 后台压缩线程追加基准快照摘要时，与主线程的追加和fsync互斥
+        self._write_lock = threading.RLock()
+        # 为True时记住每条记录在快照中的位置，供 read_record 按需读回
+        self.track_spans = False
+        # 为False时压缩在调用线程中同步完成（数据文件由多个进程共享时）
+        self.background = True
+        self._locator = RecordLocator()
+        # 加载时由日志重放得到的记录（不在快照中）
+        self._replayed: Dict[int, Dict[str, Any]] = {}
+        # 后台压缩尚未写完的新快照中的记录（按新的记录键排列）
+        self._pending_records: Optional[List[Dict[str, Any]]] = None
+        self._read_fp = None
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def load(self, stats: Optional[LoadStats] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """读取快照并重放日志，返回 (记录键, 记录数据) 列表"""
+        return list(self.iter_load(stats))
+
+    def iter_load(self, stats: Optional[LoadStats] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        逐条产出快照与日志合并后的记录
+
+        先读出日志中的操作，再流式解析快照并在对应位置替换或跳过记录，
+        快照不需要整体载入内存。损坏的记录和日志操作被跳过并通过 ``stats``
+        写入隔离文件。
+        """
+        self.close()
+        self._locator.clear()
+        self._replayed = {}
+        digest = _file_digest(self.snapshot_file)
+
+        if self.compacting_file.exists():
+            base, ops = self._read_journal(self.compacting_file)
+            if base == digest:
+                yield from self._recover(ops, stats)
+                return
+            # 新快照已经写入，旧日志只是没来得及删除
+            self._remove(self.compacting_file)
+
+        ops = []
+        if self.journal_file.exists():
+            base, ops = self._read_journal(self.journal_file)
+            if base == digest:
+                self._open_journal()
+            else:
+                # 快照被外部替换过，保留旧日志以便人工检查
+                rejected = self.journal_file.with_name(self.journal_file.name + ".rejected")
+                os.replace(self.journal_file, rejected)
+                logger.warning(f"变更日志与快照不匹配，已移至: {rejected}")
+                ops = []
+        if self._fp is None:
+            self._start_journal(digest)
+
+        # 记录键 -> 日志中的最终内容，None表示已删除
+        overrides = self._collect(ops, stats)
+        self.next_key = max(overrides, default=-1) + 1
+        records = iter_json_array_spans(self.snapshot_file, stats) if self.track_spans else \
+            ((key, record, -1, 0) for key, record in iter_json_array(self.snapshot_file, stats))
+        for key, record, offset, length in records:
+            self.next_key = max(self.next_key, key + 1)
+            if key in overrides:
+                record = overrides.pop(key)
+                if record is None:
+                    continue
+                if self.track_spans:
+                    self._replayed[key] = record
+            elif self.track_spans:
+                self._locator.set(key, offset, length)
+            yield key, record
+        for key in sorted(overrides):
+            record = overrides[key]
+            if record is not None:
+                if self.track_spans:
+                    self._replayed[key] = record
+                yield key, record
+
+    def _recover(self, compacting_ops: List[Dict[str, Any]],
+                 stats: Optional[LoadStats]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """上次压缩未完成：旧快照 + 旧日志，之后的日志基于重新编号的结果"""
+        records = dict(iter_json_array(self.snapshot_file, stats))
+        self._apply(records, compacting_ops, stats)
+        records = dict(enumerate(records.values()))
+        if self.journal_file.exists():
+            _, ops = self._read_journal(self.journal_file)
+            self._apply(records, ops, stats)
+
+        # 立即把恢复出的状态写成快照，使磁盘回到一致状态
+        items = list(records.values())
+        if not self._compact_in_place(items):
+            # 写入失败时保持原有的日志链，继续追加到当前日志
+            self.next_key = max(records, default=-1) + 1
+            self._open_journal()
+            if self.track_spans:
+                self._replayed = dict(enumerate(items))
+        yield from enumerate(items)
+
+    def _read_journal(self, path: Path) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """读取日志文件，返回 (基准快照摘要, 操作列表)"""
+        base = None
+        ops = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    op = json.loads(line)
+                except json.JSONDecodeError:
+                    # 通常是写入中途崩溃留下的半行，之后不会再有有效记录
+                    logger.warning(f"变更日志第 {line_no} 行不完整，已忽略: {path}")
+                    break
+                if not isinstance(op, dict):
+                    logger.warning(f"变更日志第 {line_no} 行格式错误，已忽略: {path}")
+                    continue
+                if op.get('op') == 'base':
+                    base = op.get('snapshot')
+                else:
+                    ops.append(op)
+        return base, ops
+
+    @staticmethod
+    def _collect(ops: List[Dict[str, Any]],
+                 stats: Optional[LoadStats] = None) -> Dict[int, Optional[Dict[str, Any]]]:
+        """计算日志操作对每个记录键的最终效果"""
+        overrides: Dict[int, Optional[Dict[str, Any]]] = {}
+        for op in ops:
+            kind = op.get('op')
+            try:
+                if kind == 'add' or kind == 'update':
+                    if not isinstance(op['data'], dict):
+                        raise TypeError("记录不是对象")
+                    overrides[op['key']] = op['data']
+                elif kind == 'delete':
+                    for key in op['keys']:
+                        overrides[key] = None
+                else:
+                    logger.warning(f"未知的日志操作: {kind}")
+            except (KeyError, TypeError) as e:
+                if stats is not None:
+                    stats.reject(f"journal:{kind}", f"日志操作格式错误: {e}", record=op)
+        return overrides
+
+    @staticmethod
+    def _apply(records: Dict[int, Dict[str, Any]], ops: List[Dict[str, Any]],
+               stats: Optional[LoadStats] = None) -> None:
+        """把日志操作依次应用到记录字典上，格式错误的操作被跳过"""
+        for op in ops:
+            kind = op.get('op')
+            try:
+                if kind == 'add' or kind == 'update':
+                    if not isinstance(op['data'], dict):
+                        raise TypeError("记录不是对象")
+                    records[op['key']] = op['data']
+                elif kind == 'delete':
+                    for key in op['keys']:
+                        records.pop(key, None)
+                else:
+                    logger.warning(f"未知的日志操作: {kind}")
+            except (KeyError, TypeError) as e:
+                if stats is not None:
+                    stats.reject(f"journal:{kind}", f"日志操作格式错误: {e}", record=op)
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def log_add(self, data: Dict[str, Any]) -> int:
+        """记录新增操作，返回分配的记录键"""
+        key = self.next_key
+        self.next_key += 1
+        self._append({'op': 'add', 'key': key, 'data': data})
+        return key
+
+    def log_update(self, key: int, data: Dict[str, Any]) -> None:
+        """记录修改操作"""
+        self._append({'op': 'update', 'key': key, 'data': data})
+
+    def log_delete(self, keys: List[int]) -> None:
+        """记录删除操作"""
+        if keys:
+            self._append({'op': 'delete', 'keys': list(keys)})
+
+    def needs_compaction(self) -> bool:
+        """日志是否已超过压缩阈值"""
+        return self._size >= self.compact_threshold
+
+    def _append(self, op: Dict[str, Any]) -> None:
+        line = json.dumps(op, ensure_ascii=False) + "\n"
+        with self._write_lock:
+            if self._fp is None:
+                self._open_journal()
+            self._fp.write(line)
+            self._size += len(line.encode('utf-8'))
+            self._unsynced = True
+            if not self._deferred:
+                self.sync()
+
+    def sync(self) -> None:
+        """把已追加的操作写入磁盘（flush + fsync），断电后也不会丢失"""
+        with self._write_lock:
+            if self._fp is None or not self._unsynced:
+                return
+            self._fp.flush()
+            os.fsync(self._fp.fileno())
+            self._unsynced = False
+
+    @contextmanager
+    def deferred_sync(self) -> Iterator[None]:
+        """
+        块内追加的操作只在块正常结束时fsync一次（一次保存写入多条记录时）
+
+        块内抛出异常时不fsync，已追加的操作在下一次fsync时一并写入磁盘。
+        """
+        self._deferred += 1
+        try:
+            yield
+        finally:
+            self._deferred -= 1
+        if not self._deferred:
+            self.sync()
+
+    def _start_journal(self, digest: Optional[str]) -> None:
+        """以指定快照为基准新建日志文件（摘要为None时由后台压缩稍后追加）"""
+        if self._fp is not None:
+            self.sync()
+            self._fp.close()
+        self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+        self._fp = open(self.journal_file, 'w', encoding='utf-8')
+        self._size = 0
+        if digest is not None:
+            self._append({'op': 'base', 'snapshot': digest})
+
+    def _open_journal(self) -> None:
+        """以追加方式打开已有日志"""
+        self._fp = open(self.journal_file, 'a', encoding='utf-8')
+        self._size = self.journal_file.stat().st_size
+        self._unsynced = False
+
+    # ------------------------------------------------------------------
+    # 压缩
+    # ------------------------------------------------------------------
+    def compact(self, records: List[Dict[str, Any]], wait: bool = False) -> bool:
+        """
+        把当前状态合并为新快照
+
+        返回True时调用方需按 ``records`` 中的位置给记录重新编号；
+        上一次压缩尚未完成（且不等待）或写入失败时返回False，记录键保持不变。
+        """
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                if not wait:
+                    return False
+                self._worker.join()
+            if self.compacting_file.exists():
+                # 上次后台压缩失败，旧日志仍然需要保留，改为同步重写快照
+                return self._compact_in_place(records)
+            self._rotate_and_compact(records, wait or not self.background)
+            return True
+
+    def _compact_in_place(self, records: List[Dict[str, Any]]) -> bool:
+        """同步写入完整快照，成功后清空所有日志"""
+        payload, spans = encode_json_array(records)
+        self._close_reader()
+        try:
+            self._write_file(payload)
+        except OSError as e:
+            logger.error(f"写入快照失败: {e}")
+            return False
+        self._remove(self.compacting_file)
+        self.next_key = len(records)
+        self._start_journal(_digest(payload))
+        self._pending_records = None
+        self._reset_spans(spans)
+        return True
+
+    def _rotate_and_compact(self, records: List[Dict[str, Any]], wait: bool) -> None:
+        """
+        换用新日志并在后台写入新快照
+
+        调用方持有的锁只覆盖日志轮换；记录的编码、摘要和写入都在压缩线程中完成。
+        新快照写完之前按记录键从 ``records`` 中读回记录。
+        """
+        if self._fp is not None:
+            self.sync()
+            self._fp.close()
+            self._fp = None
+        if self.journal_file.exists():
+            os.replace(self.journal_file, self.compacting_file)
+        self.next_key = len(records)
+        self._start_journal(None)
+        self._close_reader()
+        self._replayed = {}
+        if self.track_spans:
+            self._pending_records = records
+
+        self._worker = threading.Thread(target=self._write_snapshot, args=(records,),
+                                        name="journal-compaction", daemon=True)
+        self._worker.start()
+        if wait:
+            self._worker.join()
+
+    def _write_snapshot(self, records: List[Dict[str, Any]]) -> None:
+        """
+        后台线程：编码并写入新快照，删除已合并的日志
+
+        先在新日志中追加基准摘要再替换快照：替换之前中断时旧快照与旧日志仍然匹配，
+        加载时照常恢复；替换之后新日志已能与新快照对应。
+        """
+        try:
+            payload, spans = encode_json_array(records)
+            with self._write_lock:
+                self._append({'op': 'base', 'snapshot': _digest(payload)})
+                self.sync()
+            self._write_file(payload)
+        except (OSError, TypeError, ValueError) as e:
+            # 旧快照和旧日志都还在，下次加载时仍能恢复
+            logger.error(f"合并变更日志失败: {e}")
+            return
+        if self.track_spans:
+            self._locator.reset(spans)
+        self._pending_records = None
+        self._remove(self.compacting_file)
+        logger.info(f"变更日志已合并到快照: {self.snapshot_file}")
+
+    def _write_file(self, payload: bytes) -> None:
+        """先写临时文件再替换，避免快照被截断"""
+        tmp_file = self.snapshot_file.with_name(self.snapshot_file.name + ".tmp")
+        with open(tmp_file, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.snapshot_file)
+
+    # ------------------------------------------------------------------
+    # 按需读取
+    # ------------------------------------------------------------------
+    def read_record(self, key: int) -> Optional[Dict[str, Any]]:
+        """按记录键读回一条加载或压缩时的记录（需要开启 ``track_spans``）"""
+        record = self._replayed.get(key)
+        if record is not None:
+            return record
+        records = self._pending_records
+        if records is not None:
+            # 新快照尚未写完，记录仍在内存中（返回副本，调用方可能修改）
+            return dict(records[key]) if 0 <= key < len(records) else None
+        if self._read_fp is None:
+            if not self.snapshot_file.exists():
+                return None
+            self._read_fp = open(self.snapshot_file, 'rb')
+        return self._locator.read(self._read_fp, key)
+
+    def _reset_spans(self, spans: List[Tuple[int, int]]) -> None:
+        """新快照写入后，全部记录都位于快照中"""
+        if self.track_spans:
+            self._locator.reset(spans)
+            self._replayed = {}
+
+    def _close_reader(self) -> None:
+        if self._read_fp is not None:
+            self._read_fp.close()
+            self._read_fp = None
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        """等待后台压缩结束并关闭日志文件"""
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        if self._fp is not None:
+            self.sync()
+            self._fp.close()
+            self._fp = None
+        self._close_reader()
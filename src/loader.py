@@ -0,0 +1,318 @@
+import re
+import json
+import time
+import codecs
+import shutil
+import logging
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 每次从文件读取的字节数
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# 单条记录允许的最大长度(字符)，超过后视为损坏，避免缓冲区无限增长
+DEFAULT_MAX_RECORD_SIZE = 16 * 1024 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def quarantine_file_for(data_file: Path) -> Path:
+    """数据文件对应的隔离文件（每行一条被跳过的记录）"""
+    data_file = Path(data_file)
+    return data_file.with_name(data_file.name + ".quarantine.jsonl")
+
+
+class LoadStats:
+    """
+    一次加载的统计信息
+
+    被跳过的记录通过 ``reject`` 追加写入隔离文件，原始内容不会因为保存而丢失。
+    """
+
+    def __init__(self, quarantine_file: Optional[Path] = None):
+        self.quarantine_file = Path(quarantine_file) if quarantine_file else None
+        self.loaded = 0
+        self.skipped = 0
+        self.bytes_read = 0
+        # 整个文件无法解析时保存的原文件副本
+        self.corrupt_copy: Optional[Path] = None
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def reject(self, position: Any, error: Any, record: Any = None, raw: Optional[str] = None) -> None:
+        """跳过一条记录并写入隔离文件"""
+        self.skipped += 1
+        logger.warning(f"跳过损坏的记录 (位置 {position}): {error}")
+        if self.quarantine_file is None:
+            return
+        entry: Dict[str, Any] = {'position': position, 'error': str(error),
+                                 'time': time.strftime("%Y-%m-%d %H:%M:%S")}
+        if raw is not None:
+            entry['raw'] = raw
+        else:
+            entry['record'] = record
+        try:
+            self.quarantine_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.quarantine_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            logger.error(f"写入隔离文件失败: {e}")
+
+    def finish(self) -> 'LoadStats':
+        self.elapsed = time.monotonic() - self.started
+        return self
+
+    def __repr__(self) -> str:
+        return (f"LoadStats(loaded={self.loaded}, skipped={self.skipped}, "
+                f"bytes_read={self.bytes_read}, elapsed={self.elapsed:.3f}s)")
+
+
+class _ChunkReader:
+    """按块读取UTF-8文件"""
+
+    def __init__(self, fp, chunk_size: int, stats: Optional[LoadStats]):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.stats = stats
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.eof = False
+
+    def read(self) -> str:
+        data = self.fp.read(self.chunk_size)
+        if self.stats is not None:
+            self.stats.bytes_read += len(data)
+        if not data:
+            self.eof = True
+            return self.decoder.decode(b'', final=True)
+        return self.decoder.decode(data)
+
+
+def iter_json_array(path: Path, stats: Optional[LoadStats] = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    max_record_size: int = DEFAULT_MAX_RECORD_SIZE) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    逐条读取JSON数组文件中的记录
+
+    文件按块读取，内存中只保留当前记录附近的内容。不是对象的元素和语法损坏的片段
+    会被跳过并写入隔离文件（通过 ``stats``），解析从下一行的对象开头继续；
+    最外层不是数组时整个文件被复制为 ``.corrupt`` 副本，不产生任何记录。
+
+    Args:
+        path: JSON数组文件
+        stats: 加载统计，被跳过的记录由它写入隔离文件
+
+    Yields:
+        (元素在数组中的位置, 记录字典)；被跳过的元素同样占用位置
+    """
+    for index, record, _, _ in _iter_array(path, stats, False, chunk_size, max_record_size):
+        yield index, record
+
+
+def iter_json_array_spans(path: Path, stats: Optional[LoadStats] = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE,
+                          max_record_size: int = DEFAULT_MAX_RECORD_SIZE
+                          ) -> Iterator[Tuple[int, Dict[str, Any], int, int]]:
+    """
+    同 :func:`iter_json_array`，另外给出每条记录在文件中的字节偏移和长度
+
+    之后可以用 :func:`read_json_span` 只读回单条记录。
+
+    Yields:
+        (位置, 记录字典, 字节偏移, 字节长度)
+    """
+    return _iter_array(path, stats, True, chunk_size, max_record_size)
+
+
+def _iter_array(path: Path, stats: Optional[LoadStats], track_bytes: bool,
+                chunk_size: int, max_record_size: int) -> Iterator[Tuple[int, Dict[str, Any], int, int]]:
+    path = Path(path)
+    if not path.exists():
+        return
+    decoder = json.JSONDecoder()
+    with open(path, 'rb') as fp:
+        reader = _ChunkReader(fp, chunk_size, stats)
+        buf = ""
+        pos = 0
+        # 已从缓冲区丢弃的字符数，用于报告位置
+        consumed = 0
+        # buf[mark] 在文件中的字节偏移，用于计算记录的字节位置
+        mark = 0
+        mark_bytes = 0
+
+        def fill() -> bool:
+            nonlocal buf, pos, consumed, mark, mark_bytes
+            if reader.eof:
+                return False
+            if track_bytes:
+                mark_bytes += len(buf[mark:pos].encode('utf-8'))
+                mark = 0
+            consumed += pos
+            buf = buf[pos:] + reader.read()
+            pos = 0
+            return True
+
+        # 当前记录所在行的缩进，用于在损坏后找到同一层级的下一条记录
+        indent = ""
+
+        def skip_whitespace() -> None:
+            nonlocal pos, indent
+            while True:
+                start = pos
+                pos = _WHITESPACE.match(buf, pos).end()
+                newline = buf.rfind('\n', start, pos)
+                indent = buf[newline + 1:pos] if newline >= 0 else indent + buf[start:pos]
+                if pos < len(buf) or not fill():
+                    return
+
+        skip_whitespace()
+        if pos >= len(buf):
+            # 空文件
+            return
+        if buf[pos] != '[':
+            preserve_corrupt(path, stats, "最外层不是JSON数组")
+            return
+        pos += 1
+
+        index = 0
+        while True:
+            skip_whitespace()
+            if pos >= len(buf):
+                logger.warning(f"数据文件在数组结束前中断: {path}")
+                break
+            char = buf[pos]
+            if char == ']':
+                break
+            if char == ',':
+                pos += 1
+                continue
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+                if end >= len(buf) and not reader.eof:
+                    # 记录可能恰好在块边界被截断（如数字），读入更多内容后重新解析
+                    raise json.JSONDecodeError("记录位于块末尾", buf, end)
+            except json.JSONDecodeError as e:
+                # JSON字符串中不会出现原始换行，另起一行的 { 一定是下一条记录的开头；
+                # 缓冲区里已经有下一条记录时说明当前记录本身损坏，而不是还没读完
+                boundary = _next_record_start(buf, pos, indent)
+                if boundary is None and not reader.eof and len(buf) - pos < max_record_size:
+                    fill()
+                    continue
+                end = boundary.start() if boundary else len(buf)
+                if stats is not None:
+                    stats.reject(index, f"JSON语法错误(字符 {consumed + pos}): {e.msg}",
+                                 raw=buf[pos:end])
+                pos = end
+                index += 1
+                if boundary is None and reader.eof:
+                    # 文件在记录中途结束
+                    break
+                continue
+            offset = length = -1
+            if track_bytes:
+                offset = mark_bytes + len(buf[mark:pos].encode('utf-8'))
+                length = len(buf[pos:end].encode('utf-8'))
+                mark, mark_bytes = end, offset + length
+            pos = end
+            if isinstance(record, dict):
+                yield index, record, offset, length
+            elif stats is not None:
+                stats.reject(index, f"记录不是对象: {type(record).__name__}", record=record)
+            index += 1
+        _drain(reader)
+
+
+def _next_record_start(buf: str, pos: int, indent: str):
+    """查找 buf[pos] 处记录之后、与它缩进相同的下一个对象开头（嵌套对象缩进更深）"""
+    return re.compile(r'\n' + re.escape(indent) + r'\{').search(buf, pos + 1)
+
+
+def read_json_span(fp, offset: int, length: int) -> Dict[str, Any]:
+    """从已打开的二进制文件中读回一条记录"""
+    fp.seek(offset)
+    return json.loads(fp.read(length).decode('utf-8'))
+
+
+def encode_json_array(records: Iterable[Dict[str, Any]]) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """
+    按原有格式（``json.dump(..., ensure_ascii=False, indent=2)``）序列化记录数组
+
+    Returns:
+        (文件内容, 每条记录的 (字节偏移, 字节长度))
+    """
+    parts: List[bytes] = []
+    spans: List[Tuple[int, int]] = []
+    offset = 4  # 开头的 "[\n  "
+    for record in records:
+        # 数组元素的每一行都比单独序列化时多缩进两格；JSON字符串中不会出现原始换行
+        part = json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  ').encode('utf-8')
+        spans.append((offset, len(part)))
+        parts.append(part)
+        offset += len(part) + 4  # ",\n  "
+    if not parts:
+        return b"[]", spans
+    return b"[\n  " + b",\n  ".join(parts) + b"\n]", spans
+
+
+def _drain(reader: _ChunkReader) -> None:
+    """读完剩余内容，使统计和摘要覆盖整个文件"""
+    while not reader.eof:
+        reader.read()
+
+
+def preserve_corrupt(path: Path, stats: Optional[LoadStats], reason: str) -> None:
+    """整个文件无法解析时保留原文件副本，之后的保存不会让数据丢失"""
+    target = path.with_name(path.name + ".corrupt")
+    try:
+        shutil.copy2(path, target)
+    except OSError as e:
+        logger.error(f"备份损坏的数据文件失败: {e}")
+        target = None
+    logger.error(f"数据文件无法解析({reason})，原文件已备份到: {target}")
+    if stats is not None:
+        stats.corrupt_copy = target
+        stats.skipped += 1
+
+
+class RecordLocator:
+    """
+    记录键 -> 记录在JSON数组文件中的字节位置
+
+    只适用于以数组位置作为记录键的文件（JSON文件和日志快照）。每条记录占用
+    16字节，按需用 :meth:`read` 读回单条记录，无需把全部记录保留在内存中。
+    """
+
+    def __init__(self):
+        self._offsets = array('q')
+        self._lengths = array('q')
+
+    def clear(self) -> None:
+        self._offsets = array('q')
+        self._lengths = array('q')
+
+    def set(self, key: int, offset: int, length: int) -> None:
+        missing = key + 1 - len(self._offsets)
+        if missing > 0:
+            self._offsets.extend([-1] * missing)
+            self._lengths.extend([0] * missing)
+        self._offsets[key] = offset
+        self._lengths[key] = length
+
+    def reset(self, spans: List[Tuple[int, int]]) -> None:
+        """按 :func:`encode_json_array` 返回的位置重建（记录键即数组位置）"""
+        self._offsets = array('q', (offset for offset, _ in spans))
+        self._lengths = array('q', (length for _, length in spans))
+
+    def get(self, key: Any) -> Optional[Tuple[int, int]]:
+        if isinstance(key, int) and 0 <= key < len(self._offsets) and self._offsets[key] >= 0:
+            return self._offsets[key], self._lengths[key]
+        return None
+
+    def read(self, fp, key: Any) -> Optional[Dict[str, Any]]:
+        """从以二进制方式打开的数据文件中读回一条记录"""
+        span = self.get(key)
+        if span is None:
+            return None
+        offset, length = span
+        return read_json_span(fp, offset, length)
@@ -1,60 +1,233 @@
-import json
-import os
-from typing import List, Optional, Dict, Any
-from pathlib import Path
-from task import Task
+from datetime import date
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Sequence
+from task import Task, TaskRow, date_ordinal, iso_week
+from journal import DEFAULT_COMPACT_THRESHOLD
+from storage import Storage, PROJECT_SCHEMA, write_bytes_atomic
+from loader import LoadStats
+from columnstore import ColumnStore, REBUILD_AFTER_READS, columns_file_for, encode_columns, file_stamp
+from concurrency import with_identity
+from tasktable import PROJECT_FIELDS, TaskTable
+from aggregates import Aggregates
+from record_manager import RecordManager
 import logging
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class ProjectManager:
-    """项目管理器，专门负责项目的增删改查和持久化"""
+# 维护哈希索引的字段，即 query_projects 的筛选条件
+INDEXED_FIELDS = ('status', 'priority', 'project_number')
+# 汇总统计（见 summarize）导出的列
+SUMMARY_FIELDS = ('status', 'progress', 'due_date')
+# 统计的分组方式：状态、项目名称、开始日期所在的ISO周 (年, 周)；合计进度
+STAT_GROUPS = {'status': ('status', None), 'project': ('project_name', None), 'week': ('start_date', iso_week)}
+
+class ProjectManager(RecordManager):
+    """项目管理器，专门负责项目的增删改查和持久化（存储与同步逻辑见 RecordManager）"""
+    
+    record_type = Task
+    label = "项目"
+    saver_name = "project-saver"
     
-    def __init__(self, data_file: str = "project_data.json"):
-        """初始化项目管理器"""
-        self.data_file = Path(data_file)
-        self.projects: List[Task] = []
+    def __init__(self, data_file: str = "project_data.json", journal: bool = False,
+                 compact_threshold: int = DEFAULT_COMPACT_THRESHOLD,
+                 storage: Optional[Storage] = None, autosave_delay: Optional[float] = None,
+                 lazy: bool = False, columnar: bool = False, shared: bool = True,
+                 unique_numbers: bool = False):
+        """
+        初始化项目管理器
+        
+        Args:
+            data_file: 项目数据文件，扩展名为 .db/.sqlite 时使用SQLite后端，
+                       为 .segments 时使用分段键值存储，为 .pmsb 时使用二进制快照
+            journal: 是否启用变更日志模式（修改只追加到日志，后台定期合并为快照）
+            compact_threshold: 日志模式下触发合并的日志大小(字节)
+            storage: 自定义存储后端，指定后忽略以上选项
+            autosave_delay: 设置后修改由后台线程合并写入，修改停止该秒数后才保存
+            lazy: 延迟加载模式，列表中只保留不含描述的TaskRow摘要，
+                  编辑或打开项目时才从存储读回完整记录构建Task
+            columnar: 日期范围查询使用内存映射的列存储文件（见 columnstore 模块），
+                      写入仍然经过存储后端；数据有未保存的修改时回退到扫描项目对象
+            shared: 数据文件可能被多个程序同时使用：保存时加文件锁，先合并其他程序写入的修改，
+                    冲突的修改记入 conflicts（数据库后端由SQLite自行处理并发，忽略此选项）
+            unique_numbers: 项目编号唯一：添加、导入或修改为已存在的编号时抛出 DuplicateKeyError
+                            （已有数据中的重复编号照常加载）；数据库后端因此在启动时加载全部记录
+        """
+        # 项目列表及筛选字段的索引；同时维护各状态、项目名称和周的项目数与进度合计
+        super().__init__(data_file, PROJECT_SCHEMA, journal, compact_threshold, storage,
+                         autosave_delay, shared, Aggregates(STAT_GROUPS, ('progress',)),
+                         fields=INDEXED_FIELDS,
+                         unique=('project_number',) if unique_numbers else (),
+                         sorted_fields=('project_number',))
+        self.lazy = lazy and self.storage.supports_fetch
+        if lazy and not self.lazy:
+            logger.warning("存储后端不支持按记录键读取，已关闭延迟加载")
+        if self.lazy:
+            self.storage.enable_fetch()
+        # 列存储只是读取加速，数据库后端直接用SQL筛选
+        self.columnar = columnar and not self.storage.supports_queries
+        self.columns_file = columns_file_for(self.data_file)
+        self._columns: Optional[ColumnStore] = None
+        self._columns_unusable = False
+        # 列存储失效后的读取次数
+        self._columns_misses = 0
         self.load_data()
     
-    def load_data(self) -> None:
-        """从文件加载项目数据"""
-        if not self.data_file.exists():
-            logger.info("项目数据文件不存在，创建空列表")
-            self.projects = []
-            return
+    @property
+    def projects(self) -> List[Task]:
+        """
+        项目列表（副本）；支持查询的后端在首次访问时才加载全部记录
         
-        try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.projects = [Task.from_dict(item) for item in data]
-            logger.info(f"成功加载 {len(self.projects)} 个项目")
-        except (json.JSONDecodeError, KeyError) as e:
-            logger.error(f"加载项目信息失败: {e}")
-            self.projects = []
-        except Exception as e:
-            logger.error(f"加载数据时发生未知错误: {e}")
-            self.projects = []
+        每次访问都复制整个列表，供外部调用方持有；管理器内部直接遍历索引。
+        """
+        return list(self._loaded_index())
+    
+    @projects.setter
+    def projects(self, value: List[Task]) -> None:
+        duplicates = self._set_records(value)
+        if duplicates:
+            logger.warning(f"有 {duplicates} 个项目的编号与其他项目重复")
+    
+    def _loads_on_demand(self) -> bool:
+        # 编号唯一时须加载全部记录才能检查约束
+        return self.storage.supports_queries and not self._index.unique
+    
+    def _load_all(self) -> None:
+        super()._load_all()
+        if self.columnar:
+            self._open_columns()
+    
+    def _build(self, key: Any, item: Dict[str, Any]):
+        return self._summarize(key, item) if self.lazy else self._materialize(key, item)
+    
+    def _summarize(self, key: Any, item: Dict[str, Any]):
+        """
+        延迟加载模式：已构建过的记录直接复用，否则只保留摘要
+        
+        摘要不含描述，描述交给全文索引，在加载结束时切词后丢弃。
+        """
+        task = self._by_key.get(key)
+        if task is not None:
+            return task
+        row = TaskRow.from_dict(key, item)
+        self._search.provide(row.uid, item)
+        return row
+    
+    def materialize(self, task) -> Task:
+        """
+        返回可编辑的Task
+        
+        延迟加载模式下把TaskRow摘要替换为从存储读回的完整Task，其他情况原样返回。
+        """
+        if not isinstance(task, TaskRow):
+            return task
+        with self._lock, self._files_locked():
+            if self._fingerprint is not None and self._fingerprint.changed():
+                # 记录位置随文件改写而失效，合并后按uid找到对应的新摘要
+                uid = task.uid
+                if not self._sync_external():
+                    raise KeyError(f"记录不存在: {task.key}")
+                task = self._index.get(uid)
+                if not isinstance(task, TaskRow):
+                    if task is None:
+                        raise KeyError(f"记录已被删除: {uid}")
+                    return task
+            item = self.storage.fetch(task.key)
+            if item is None:
+                raise KeyError(f"记录不存在: {task.key}")
+            # 旧数据的uid是加载时推导出的，以摘要为准
+            full = self._materialize(task.key, dict(item, uid=task.uid, revision=task.revision))
+            if self._index.get(full.uid) is task:
+                self._index.replace(full)
+        return full
     
-    def save_data(self) -> bool:
-        """保存项目数据到文件"""
+    def _record(self, task) -> Dict[str, Any]:
+        """项目的完整记录；尚未构建的摘要从存储读回（调用方须先合并外部修改）"""
+        if isinstance(task, TaskRow):
+            record = self.storage.fetch(task.key)
+            if record is not None:
+                record = dict(record, uid=task.uid, revision=task.revision)
+            return record
+        return task.to_dict()
+    
+    @staticmethod
+    def _is_summary(task) -> bool:
+        return isinstance(task, TaskRow)
+    
+    @staticmethod
+    def _key_of(task) -> Any:
+        return task.key if isinstance(task, TaskRow) else task._storage_key
+    
+    def _rekey(self, task, key: Any):
+        if isinstance(task, TaskRow):
+            return task._replace(key=key)
+        return super()._rekey(task, key)
+    
+    def _records_changed(self) -> None:
+        self._drop_columns()
+    
+    def _project_keys(self) -> Optional[List[Any]]:
+        """项目列表中每个项目的记录键；有尚未写入的项目时返回None"""
+        keys = []
+        for task in self._index:
+            key = task.key if isinstance(task, TaskRow) else task._storage_key
+            if key is None:
+                return None
+            keys.append(key)
+        return keys
+    
+    def _drop_columns(self) -> None:
+        """数据已改动，列存储不再对应项目列表，下次读取时重新生成"""
+        if self._columns is not None:
+            self._columns.close()
+        self._columns = None
+        self._columns_unusable = False
+        self._columns_misses = 0
+    
+    def _open_columns(self) -> None:
+        """加载后复用已有的列存储文件（由其他进程或上次运行生成，且数据文件未改动）"""
+        store = ColumnStore.open(self.columns_file)
+        if store is None:
+            return
+        stamp = file_stamp(self.storage.source_files())
+        if stamp is None or store.stamp != stamp or list(store.keys()) != self._project_keys():
+            store.close()
+            return
+        self._columns = store
+    
+    def _fresh_columns(self) -> Optional[ColumnStore]:
+        """与项目列表一致的列存储；有未保存的修改或数据无法放入定长列时返回None"""
+        if (not self.columnar or self._batch is not None or not self._loaded
+                or len(self._tracker) or self._columns_unusable):
+            return None
+        if self._columns is None:
+            # 刚改动过的数据可能马上又被修改，连续读取几次后才值得重新生成
+            self._columns_misses += 1
+            if self._columns_misses < REBUILD_AFTER_READS:
+                return None
+            self._columns = self._build_columns()
+            self._columns_unusable = self._columns is None
+        return self._columns
+    
+    def _build_columns(self) -> Optional[ColumnStore]:
+        """根据当前项目列表生成列存储，并写入文件供其他进程复用"""
+        keys = self._project_keys()
+        if keys is None:
+            return None
+        # 加载不完整时内存中的数据与文件不一致，不能标记为对应该文件
+        stamp = file_stamp(self.storage.source_files()) if self._load_error is None else None
+        payload = encode_columns(zip(keys, self._index), stamp)
+        if payload is None:
+            logger.info("项目数据含有无法放入列存储的值，日期范围查询将扫描项目对象")
+            return None
+        if stamp is None:
+            return ColumnStore(payload)
         try:
-            # 确保目录存在
-            self.data_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            project_data = [task.to_dict() for task in self.projects]
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(project_data, f, ensure_ascii=False, indent=2)
-            
-            logger.info(f"成功保存 {len(self.projects)} 个项目")
-            return True
-        except (IOError, PermissionError) as e:
-            logger.error(f"保存项目信息失败: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"保存数据时发生未知错误: {e}")
-            return False
+            write_bytes_atomic(self.columns_file, payload)
+        except OSError as e:
+            logger.warning(f"写入列存储文件失败，仅在内存中使用: {e}")
+            return ColumnStore(payload)
+        return ColumnStore.open(self.columns_file) or ColumnStore(payload)
     
     def add_project(self, title: str, description: str = "", priority: int = 1,
                    due_date: Optional[str] = None, start_date: Optional[str] = None,
@@ -71,38 +244,170 @@ class ProjectManager:
                 project_number=project_number
             )
             
-            self.projects.append(task)
-            if self.save_data():
-                return task
-            return None
+            return self._add(task)
         except Exception as e:
             logger.error(f"添加项目失败: {e}")
             return None
     
+    def update_project(self, task: Task) -> bool:
+        """持久化对单个项目的修改"""
+        return self._update(self.materialize(task))
+    
     def get_all_projects(self) -> List[Task]:
         """获取所有项目"""
-        return self.projects.copy()
+        return self.projects
+    
+    def iter_projects(self, stats: Optional[LoadStats] = None) -> Iterator[Task]:
+        """
+        逐个产出项目，不构建项目列表
+        
+        列表已加载时直接遍历列表；否则（数据库后端）从存储逐页读取，
+        每次只持有一页记录，尚未构建过的记录产出的是只读副本（修改不会被保存）。
+        损坏的记录被跳过并计入 ``stats``。
+        """
+        return self._iter_records(stats)
+    
+    def query_projects(self, status: Optional[str] = None, priority: Optional[int] = None,
+                       project_number: Optional[str] = None) -> List[Task]:
+        """按状态、优先级和项目编号筛选项目，条件为None表示不限"""
+        criteria = {name: value for name, value in (('status', status),
+                                                    ('priority', priority),
+                                                    ('project_number', project_number))
+                    if value is not None}
+        if self.storage.supports_queries and self._batch is None:
+            with self._lock:
+                self._save_pending()
+                return [self._materialize(key, item)
+                        for key, item in with_identity(self.storage.query(criteria))]
+        
+        # 各条件对应的ID集合求交集，耗时与结果数量有关，与项目总数无关
+        with self._lock:
+            return self._loaded_index().select(**criteria)
+    
+    def get_projects_between(self, name: str, start_date: str, end_date: str) -> List[Task]:
+        """日期字段（start_date、due_date或updated_at）在 [start_date, end_date] 内的项目（YYYY-MM-DD）"""
+        if name not in ('start_date', 'due_date', 'updated_at'):
+            raise ValueError(f"不支持按 {name} 查询日期范围")
+        if self.storage.supports_queries and self._batch is None:
+            with self._lock:
+                self._save_pending()
+                # updated_at 带有时间，上限取当天最后一刻
+                records = self.storage.query(between=(name, start_date, end_date + " 23:59:59"))
+                return [self._materialize(key, item) for key, item in with_identity(records)]
+        
+        low, high = date_ordinal(start_date), date_ordinal(end_date)
+        if not low or not high:
+            raise ValueError(f"日期格式错误: {start_date} ~ {end_date}")
+        with self._lock:
+            store = self._fresh_columns()
+            if store is not None:
+                # 列存储的行号与索引中的次序一致
+                rows = set(store.rows_between(name, date.fromordinal(low), date.fromordinal(high)))
+                return [task for row, task in enumerate(self._index) if row in rows]
+            # updated_at 带有时间，只取日期部分；相同日期只解析一次
+            return [task for task in self._loaded_index()
+                    if isinstance(getattr(task, name), str) and low <= date_ordinal(getattr(task, name)[:10]) <= high]
+    
+    def search_projects(self, query: str, limit: Optional[int] = None) -> List[Task]:
+        """
+        按标题和描述全文查询项目
+        
+        汉字按相邻两字匹配，字母数字按词匹配，末尾的词按前缀匹配；查询中的每个词都须出现。
+        延迟加载模式下摘要的描述在加载时已切词，同样可以按描述查询。
+        
+        Args:
+            query: 查询文本
+            limit: 最多返回的项目数，默认全部
+        
+        Returns:
+            匹配的项目，按相关程度从高到低排列
+        """
+        return self._search_records(query, limit)
+    
+    def search_covers_descriptions(self) -> bool:
+        """
+        全文索引是否已建立且包含全部项目的描述
+        
+        延迟加载时在加载过程中建立（或载入保存的）索引，因此加载后总是成立；
+        成立时按描述查找可以直接查询索引，不必先切词。
+        """
+        with self._lock:
+            return self._search.built and self._search.complete
+    
+    def get_project_numbers(self) -> List[str]:
+        """所有不重复的项目编号（已排序，由索引维护）"""
+        with self._lock:
+            return self._loaded_index().distinct('project_number')
+    
+    def get_status_counts(self) -> Dict[str, int]:
+        """各状态的项目数"""
+        with self._lock:
+            return self._loaded_index().counts('status')
+    
+    def to_table(self, fields: Sequence[str] = PROJECT_FIELDS) -> TaskTable:
+        """导出全部项目的列式视图，用于批量筛选和分组统计（导出后的修改不会反映到表中）"""
+        with self._lock:
+            return TaskTable(self._loaded_index(), fields)
+    
+    def summarize(self, tasks: Optional[Iterable[Task]] = None) -> Dict[str, Any]:
+        """
+        项目的汇总统计：总数、各状态的项目数、平均进度和逾期数
+        
+        经由 :class:`tasktable.TaskTable` 整列计算。逾期与当天日期有关，无法随修改维护，
+        因此与筛选结果一样每次重新统计。
+        
+        Args:
+            tasks: 被统计的项目（如筛选结果），默认全部项目
+        """
+        table = self.to_table(SUMMARY_FIELDS) if tasks is None else TaskTable(tasks, SUMMARY_FIELDS)
+        total = len(table)
+        progress = sum(table.group_by('status', 'progress', 'sum').values())
+        return {
+            'total': total,
+            'status_counts': table.group_by('status'),
+            'average_progress': round(progress / total, 2) if total else 0,
+            'overdue': table.overdue().count(),
+        }
     
     def get_project_by_number(self, project_number: str) -> Optional[Task]:
         """根据项目编号获取项目"""
-        return next((p for p in self.projects if p.project_number == project_number), None)
+        if self.storage.supports_queries and not self._loaded:
+            return next(iter(self.query_projects(project_number=project_number)), None)
+        with self._lock:
+            task = self._index.first('project_number', project_number)
+            # 按编号取出的项目通常用于编辑，延迟加载模式下构建完整Task
+            return self.materialize(task) if task is not None else None
+    
+    def get_project_by_uid(self, uid: str) -> Optional[Task]:
+        """根据内部ID获取项目（项目编号可能重复时用它定位）"""
+        task = self._get_by_uid(uid)
+        return self.materialize(task) if task is not None else None
     
     def delete_project(self, project_number: str) -> bool:
-        """删除项目"""
-        initial_count = len(self.projects)
-        
-        # 添加调试信息
-        logger.info(f"尝试删除项目编号: {project_number}")
-        logger.info(f"当前项目列表中的编号: {[p.project_number for p in self.projects]}")
+        """删除项目（编号相同的项目一并删除）"""
+        with self._lock:
+            removed = self._loaded_index().lookup('project_number', project_number)
+            for task in removed:
+                self._remove(task)
         
-        self.projects = [p for p in self.projects if p.project_number != project_number]
+        if removed:
+            logger.info(f"已删除项目编号为 {project_number} 的 {len(removed)} 个项目，开始保存数据")
+            return self._persist()
+        logger.warning(f"未找到项目编号为 {project_number} 的项目")
+        return False
+    
+    def delete_project_by_uid(self, uid: str) -> bool:
+        """根据内部ID删除单个项目"""
+        with self._lock:
+            task = self._loaded_index().get(uid)
+            if task is not None:
+                self._remove(task)
         
-        if len(self.projects) < initial_count:
-            logger.info(f"成功找到并删除项目，开始保存数据")
-            return self.save_data()
-        else:
-            logger.warning(f"未找到项目编号为 {project_number} 的项目")
-            return False
+        if task is not None:
+            logger.info(f"已删除项目「{task.title}」，开始保存数据")
+            return self._persist()
+        logger.warning(f"未找到ID为 {uid} 的项目")
+        return False
     
     def add_task(self, title: str, description: str = "", priority: int = 1,
                  due_date: Optional[str] = None, start_date: Optional[str] = None,
@@ -118,4 +423,4 @@ class ProjectManager:
         )
         self.tasks.append(task)
         self.save_tasks()
-        return task
\ No newline at end of file
+        return task
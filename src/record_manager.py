@@ -0,0 +1,762 @@
+import json
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+from journal import DEFAULT_COMPACT_THRESHOLD
+from storage import (Storage, ChangeTracker, Changes, BatchResult, TableSchema, create_storage,
+                     write_bytes_atomic)
+from saver import BackgroundSaver
+from loader import LoadStats, quarantine_file_for
+from columnstore import file_stamp
+from concurrency import (Conflict, FileLock, Fingerprint, LockTimeoutError, lock_file_for,
+                         merge_external, raw_record, with_identity)
+from index import DuplicateKeyError, RecordIndex
+from aggregates import Aggregates, Totals
+from search import SearchIndex, search_file_for
+from task import TrackedRecord, new_uid
+
+logger = logging.getLogger(__name__)
+
+# 构建记录时表示记录损坏的异常，这样的记录被跳过并写入隔离文件
+RECORD_ERRORS = (TypeError, ValueError, KeyError, AttributeError)
+# 写入存储后端失败的异常
+WRITE_ERRORS = (IOError, PermissionError, sqlite3.Error)
+# 按页读取记录时每页的条数
+PAGE_SIZE = 256
+
+
+class RecordManager:
+    """
+    记录管理器基类：项目管理器和每周待办事项管理器共用的存储与同步逻辑
+
+    负责存储后端的加载和保存（增量后端只写入变更）、修改跟踪、批量修改、后台保存、
+    与其他程序的修改合并、全文索引文件以及JSON导入导出。记录按uid保存在
+    :class:`index.RecordIndex` 中（同时就是记录列表），索引的分组统计和全文索引随记录
+    变化而更新。
+
+    子类设置 ``record_type`` 等类属性，并可覆盖以下方法处理特殊的记录：
+    ``_build``（加载时构建记录）、``_record``（写入的字段）、``_is_summary`` 与
+    ``_key_of``（不可修改的摘要）、``_rekey``（记录键改变）以及 ``_records_changed``
+    （记录变化后丢弃派生的缓存）。
+    """
+
+    # 记录的类型，须有 from_dict 与 to_dict
+    record_type: Type[TrackedRecord] = TrackedRecord
+    # 日志中的记录名称
+    label = "记录"
+    # 后台保存线程的名称
+    saver_name = "record-saver"
+    # 延迟加载模式：列表中保留记录的摘要，由子类开启
+    lazy = False
+
+    def __init__(self, data_file: str, schema: TableSchema, journal: bool = False,
+                 compact_threshold: int = DEFAULT_COMPACT_THRESHOLD,
+                 storage: Optional[Storage] = None, autosave_delay: Optional[float] = None,
+                 shared: bool = True, aggregates: Optional[Aggregates] = None,
+                 **index_options: Any):
+        """
+        Args:
+            data_file: 数据文件，扩展名为 .db/.sqlite 时使用SQLite后端，
+                       为 .segments 时使用分段键值存储，为 .pmsb 时使用二进制快照
+            schema: SQLite后端的表结构
+            journal: 是否启用变更日志模式（修改只追加到日志，后台定期合并为快照）
+            compact_threshold: 日志模式下触发合并的日志大小(字节)
+            storage: 自定义存储后端，指定后忽略以上选项
+            autosave_delay: 设置后修改由后台线程合并写入，修改停止该秒数后才保存
+            shared: 数据文件可能被多个程序同时使用：保存时加文件锁，先合并其他程序写入的修改，
+                    冲突的修改记入 conflicts（数据库后端由SQLite自行处理并发，忽略此选项）
+            aggregates: 随记录维护的分组统计
+            index_options: 传给 :class:`index.RecordIndex` 的索引字段等选项
+
+        子类完成自己的初始化后调用 :meth:`load_data`。
+        """
+        self.data_file = Path(data_file)
+        self.storage = storage or create_storage(self.data_file, schema, journal, compact_threshold)
+        self._stats = aggregates
+        # 标题和描述的全文索引，第一次查询时才建立（或载入保存的索引文件）
+        self._search = SearchIndex()
+        self.search_file = search_file_for(self.data_file)
+        # uid -> 记录（同时就是记录列表）以及字段索引，字段被赋值时随之更新
+        self._index = RecordIndex(aggregates=aggregates, observers=(self._search,), **index_options)
+        # 数据库后端在首次访问记录列表时才加载全部记录
+        self._loaded = True
+        # 记录键 -> 已构建的记录对象，保证同一条记录只对应一个对象
+        self._by_key: Dict[Any, TrackedRecord] = {}
+        # 记录被修改过、尚未写入的记录
+        self._tracker = ChangeTracker(self._index)
+        # 后台保存线程与界面线程共用存储后端，所有存储访问都在锁内进行
+        self._lock = threading.RLock()
+        # 进行中的批量修改，见 batch()
+        self._batch: Optional[BatchResult] = None
+        # 最近一次加载的统计；加载失败时记录原因并禁止整体重写
+        self.load_stats: Optional[LoadStats] = None
+        self._load_error: Optional[str] = None
+        # 共享数据文件：跨进程文件锁、上次读写时的文件状态、本地删除的记录标识
+        self._file_lock: Optional[FileLock] = None
+        self._fingerprint: Optional[Fingerprint] = None
+        self._deleted_identities: Dict[Any, Tuple[str, int]] = {}
+        # 合并外部修改时发现的冲突，由界面取走并提示
+        self.conflicts: List[Conflict] = []
+        # 合并过外部修改的次数，界面据此判断是否需要刷新
+        self.sync_count = 0
+        if shared and not self.storage.supports_queries and self.storage.source_files():
+            self._file_lock = FileLock(lock_file_for(self.data_file))
+            self.storage.share()
+        self.saver = BackgroundSaver(self.save_data, autosave_delay, name=self.saver_name) \
+            if autosave_delay is not None else None
+
+    # ---- 由子类覆盖 ----
+
+    def _build(self, key: Any, item: Dict[str, Any]) -> Any:
+        """加载或合并时根据记录构建列表中的对象"""
+        return self._materialize(key, item)
+
+    def _record(self, record: Any) -> Dict[str, Any]:
+        """写入存储的完整记录"""
+        return record.to_dict()
+
+    @staticmethod
+    def _is_summary(record: Any) -> bool:
+        """是否为不可修改的摘要（延迟加载模式），摘要不挂载到变更跟踪器"""
+        return False
+
+    @staticmethod
+    def _key_of(record: Any) -> Any:
+        """记录在存储中的键，尚未写入时为None"""
+        return record._storage_key
+
+    def _rekey(self, record: Any, key: Any) -> Any:
+        """记录的存储键已改变，返回更新后的对象（摘要不可修改，返回新的摘要）"""
+        record._storage_key = key
+        self._by_key[key] = record
+        return record
+
+    def _records_changed(self) -> None:
+        """记录或其存储键已改变，丢弃据此生成的缓存"""
+
+    # ---- 加载 ----
+
+    def _set_records(self, records: List[Any]) -> int:
+        """用给定记录重建列表和索引，返回违反唯一约束的记录数"""
+        duplicates = self._index.rebuild(records)
+        self._loaded = True
+        self._records_changed()
+        return duplicates
+
+    def _loaded_index(self) -> RecordIndex:
+        """记录索引，尚未加载时先加载全部记录"""
+        if not self._loaded:
+            self._load_all()
+        return self._index
+
+    def _loads_on_demand(self) -> bool:
+        """是否在首次访问记录列表时才加载全部记录（数据库后端按需查询）"""
+        return self.storage.supports_queries
+
+    def load_data(self) -> None:
+        """从文件加载数据"""
+        with self._lock:
+            self._by_key = {}
+            self._tracker = ChangeTracker(self._index)
+            self._records_changed()
+            if self._loads_on_demand():
+                # 数据库后端按需查询，启动时不构建全部对象
+                self._index.rebuild(())
+                self._loaded = False
+                return
+            try:
+                with self._files_locked():
+                    self._load_all()
+                    self._capture_fingerprint()
+            except LockTimeoutError as e:
+                # 其他程序长时间占用数据文件时照常读取，只是可能读到写入中途的日志
+                logger.warning(f"{e}，不加锁读取")
+                self._load_all()
+
+    def _load_all(self) -> None:
+        """
+        从存储后端逐条读取全部记录
+
+        无法构建的记录被跳过并写入隔离文件，其余记录照常加载；
+        读取中途出错时保留已读出的部分，并禁止整体重写，避免覆盖原有数据。
+        """
+        if not self.storage.exists():
+            logger.info(f"{self.label}数据文件不存在，创建空列表")
+
+        stats = LoadStats(quarantine_file_for(self.data_file))
+        records: List[Any] = []
+        self._load_error = None
+        try:
+            with self._lock:
+                if self.storage.supports_queries:
+                    self._save_pending()
+                for key, item in with_identity(self.storage.iter_load(stats)):
+                    try:
+                        records.append(self._build(key, item))
+                    except RECORD_ERRORS as e:
+                        stats.reject(key, e, record=raw_record(item))
+        except Exception as e:
+            logger.error(f"加载{self.label}失败: {e}")
+            self._load_error = str(e)
+        duplicates = self._set_records(records)
+        if duplicates:
+            logger.warning(f"有 {duplicates} 个{self.label}违反唯一约束（已有数据照常加载）")
+        stats.loaded = len(records)
+        self.load_stats = stats.finish()
+        if stats.skipped:
+            logger.warning(f"跳过 {stats.skipped} 条损坏的{self.label}记录，已保存到: {stats.quarantine_file}")
+        logger.info(f"成功加载 {len(records)} 个{self.label}")
+        self._open_search()
+
+    def _materialize(self, key: Any, item: Dict[str, Any]) -> Any:
+        """根据记录构建对象，已构建过的记录直接复用"""
+        record = self._by_key.get(key)
+        if record is None:
+            record = self.record_type.from_dict(item)
+            record._storage_key = key
+            self._by_key[key] = record
+            self._tracker.attach(record)
+        return record
+
+    def _assign_keys(self, keys: Optional[List[Any]]) -> None:
+        """后端重新编号后更新每条记录的存储键"""
+        if keys is None:
+            return
+        self._records_changed()
+        self._by_key = {}
+        # 替换同一uid的记录不改变索引的大小和次序，可以边遍历边替换；
+        # 只有存储键改变，字段索引和统计都不必更新
+        for key, record in zip(keys, self._index):
+            rekeyed = self._rekey(record, key)
+            if rekeyed is not record:
+                self._index.rekey(rekeyed)
+
+    # ---- 保存 ----
+
+    def _written(self, record: Any) -> Dict[str, Any]:
+        """写入用的记录：版本号加一（写入成功后再更新对象上的版本号）"""
+        written = self._record(record)
+        written['revision'] = record.revision + 1
+        return written
+
+    @staticmethod
+    def _set_revision(record: Any, revision: int) -> None:
+        # 不经过修改跟踪，版本号变化本身不是需要保存的修改
+        record.set_untracked('revision', revision)
+
+    def save_data(self) -> bool:
+        """保存数据到文件（增量后端只写入新增、修改和删除的记录）"""
+        with self._lock:
+            if self._batch is not None:
+                # 批量修改提交时统一保存
+                return True
+            try:
+                with self._files_locked():
+                    if not self._sync_if_changed():
+                        return False
+                    ok = self._save_changes() if self.storage.incremental else self._save_all()
+                    if ok:
+                        self._capture_fingerprint()
+                    return ok
+            except LockTimeoutError as e:
+                logger.error(f"保存{self.label}失败: {e}")
+                return False
+
+    def _save_pending(self) -> None:
+        """先写入尚未保存的变更，保证存储中的查询结果包含它们（须持有锁）"""
+        if len(self._tracker):
+            self._save_changes()
+
+    def _save_changes(self) -> bool:
+        """只把变更写入存储后端"""
+        changes = self._tracker.take()
+        if not changes:
+            return True
+        # 支持事务的后端写入失败时整体回滚，需要放回全部变更
+        taken = Changes(list(changes.added), list(changes.dirty), list(changes.deleted))
+        # 已写入的记录的原版本号，事务回滚时恢复
+        bumped: List[Tuple[Any, int]] = []
+        try:
+            with self.storage.transaction():
+                if changes.deleted:
+                    self.storage.delete(changes.deleted)
+                    for key in changes.deleted:
+                        self._deleted_identities.pop(key, None)
+                    changes.deleted = []
+                while changes.added:
+                    record = changes.added[0]
+                    written = self._written(record)
+                    record._storage_key = self.storage.insert(written)
+                    bumped.append((record, record.revision))
+                    self._set_revision(record, written['revision'])
+                    self._by_key[record._storage_key] = record
+                    changes.added.pop(0)
+                if changes.dirty:
+                    items = [(record._storage_key, self._written(record)) for record in changes.dirty]
+                    self.storage.update_many(items)
+                    for record, (_, written) in zip(changes.dirty, items):
+                        bumped.append((record, record.revision))
+                        self._set_revision(record, written['revision'])
+                    changes.dirty = []
+        except WRITE_ERRORS as e:
+            if self.storage.transactional:
+                # 已分配的记录键和版本号随事务作废
+                for record in taken.added:
+                    self._by_key.pop(record._storage_key, None)
+                    record._storage_key = None
+                for record, revision in bumped:
+                    self._set_revision(record, revision)
+                changes = taken
+            # 否则只放回尚未写入的部分
+            self._tracker.restore(changes)
+            logger.error(f"保存{self.label}失败: {e}")
+            return False
+        self._records_changed()
+        try:
+            self._after_write()
+        except WRITE_ERRORS as e:
+            # 变更已经写入，只是整理失败，下次写入后会再次尝试
+            logger.error(f"整理{self.label}数据失败: {e}")
+        logger.info(f"成功保存{self.label}变更")
+        return True
+
+    def _save_all(self) -> bool:
+        """整体重写全部记录"""
+        if self._load_error is not None:
+            logger.error(f"数据文件加载失败({self._load_error})，为避免覆盖原有数据已取消保存")
+            return False
+        try:
+            changes = self._tracker.take()
+            changed = {id(record) for record in changes.added + changes.dirty}
+            data = [self._written(record) if id(record) in changed else self._record(record)
+                    for record in self._index]
+            self._assign_keys(self.storage.save_all(data))
+            for record in changes.added + changes.dirty:
+                self._set_revision(record, record.revision + 1)
+            self._deleted_identities = {}
+            self._records_changed()
+
+            logger.info(f"成功保存 {len(data)} 个{self.label}")
+            return True
+        except WRITE_ERRORS as e:
+            self._tracker.restore(changes)
+            logger.error(f"保存{self.label}失败: {e}")
+            return False
+        except Exception as e:
+            self._tracker.restore(changes)
+            logger.error(f"保存数据时发生未知错误: {e}")
+            return False
+
+    def _persist(self) -> bool:
+        """持久化已登记的变更：启用后台保存时只登记请求，否则立即写入"""
+        if self._batch is not None:
+            return True
+        if self.saver is not None:
+            self.saver.schedule()
+            return True
+        return self.save_data()
+
+    def _after_write(self) -> None:
+        """增量写入后的维护（如变更日志合并）"""
+        if self._load_error is not None:
+            return
+        self._assign_keys(self.storage.maybe_compact(
+            lambda: [self._record(record) for record in self._index]))
+
+    def compact(self, wait: bool = False) -> bool:
+        """把存储整理为紧凑形式（日志模式下即合并为新快照）"""
+        with self._lock:
+            try:
+                with self._files_locked():
+                    if not self._sync_if_changed():
+                        return False
+                    if self.storage.incremental and not self._save_changes():
+                        return False
+                    try:
+                        keys = self.storage.compact(
+                            [self._record(record) for record in self._loaded_index()], wait=wait)
+                    except WRITE_ERRORS as e:
+                        logger.error(f"整理{self.label}数据失败: {e}")
+                        return False
+                    self._assign_keys(keys)
+                    self._capture_fingerprint()
+                    return keys is not None
+            except LockTimeoutError as e:
+                logger.error(f"整理{self.label}数据失败: {e}")
+                return False
+
+    def close(self) -> bool:
+        """写入尚未保存的修改，等待后台写入完成并释放存储资源"""
+        ok = self.saver.close() if self.saver is not None else True
+        with self._lock:
+            self._records_changed()
+            self._save_search()
+            self.storage.close()
+        return ok
+
+    # ---- 与其他程序共用数据文件 ----
+
+    def _files_locked(self):
+        """共享数据文件时在跨进程文件锁内执行"""
+        return self._file_lock if self._file_lock is not None else nullcontext()
+
+    def _capture_fingerprint(self) -> None:
+        if self._file_lock is not None:
+            self._fingerprint = Fingerprint.capture(self.storage.source_files(), self._fingerprint)
+
+    def _sync_if_changed(self) -> bool:
+        """数据文件被其他程序改动过时先合并其修改，合并失败返回False"""
+        if self._fingerprint is None or not self._fingerprint.changed():
+            return True
+        return self._sync_external()
+
+    def reload_if_changed(self) -> bool:
+        """
+        合并其他程序写入数据文件的修改
+
+        未改动时只比较文件大小和修改时间。本地尚未保存的修改会保留，
+        与他人修改冲突的记入 conflicts。
+
+        Returns:
+            是否合并了外部修改
+        """
+        if self._fingerprint is None or self._batch is not None:
+            return False
+        with self._lock:
+            if self._batch is not None or not self._fingerprint.changed():
+                return False
+            count = self.sync_count
+            try:
+                with self._files_locked():
+                    self._sync_external()
+            except LockTimeoutError as e:
+                # 对方正在写入，下次检查时再合并
+                logger.info(f"{e}，稍后再合并外部修改")
+                return False
+            return self.sync_count > count
+
+    def _sync_external(self) -> bool:
+        """重新读取数据文件，与内存中的记录和未保存的修改合并（须持有文件锁）"""
+        records = list(self._index) if self._loaded else []
+        changes = self._tracker.take()
+        by_key = self._by_key
+        self._by_key = {}
+        stats = LoadStats(quarantine_file_for(self.data_file))
+
+        def build(key, item):
+            try:
+                return self._build(key, item)
+            except RECORD_ERRORS as e:
+                stats.reject(key, e, record=raw_record(item))
+                return None
+
+        def refresh(record, key, item):
+            if self._is_summary(record):
+                return build(key, item)
+            try:
+                fresh = self.record_type.from_dict(item)
+            except RECORD_ERRORS as e:
+                stats.reject(key, e, record=raw_record(item))
+                return None
+            # 原对象可能被界面持有，原地更新字段，不登记为本地修改
+            for name in record._tracked_fields:
+                record.set_untracked(name, getattr(fresh, name))
+            return self._rekey(record, key)
+
+        def unkey(record):
+            record._storage_key = None
+
+        try:
+            result = merge_external(
+                records, with_identity(self.storage.iter_load(stats)), changes,
+                self._deleted_identities, lambda record: (record.uid, record.revision),
+                build, refresh, self._rekey, unkey, self._record)
+        except Exception as e:
+            self._by_key = by_key
+            self._tracker.restore(changes)
+            self._load_error = str(e)
+            logger.error(f"合并外部修改失败: {e}")
+            return False
+        self._set_records([record for record in result.records if record is not None])
+        self._tracker.restore(result.changes)
+        self._deleted_identities = result.deleted_identities
+        self._load_error = None
+        self._open_search()
+        self.load_stats = stats.finish()
+        self.sync_count += 1
+        if result.conflicts:
+            self.conflicts.extend(result.conflicts)
+            for conflict in result.conflicts:
+                logger.warning(f"{self.label}「{conflict.title}」与其他程序的修改冲突: {conflict.reason}")
+        logger.info(f"已合并其他程序的修改: {result.applied} 处，冲突 {len(result.conflicts)} 处")
+        self._capture_fingerprint()
+        return True
+
+    # ---- 全文索引 ----
+
+    def _open_search(self) -> None:
+        """
+        加载后载入已保存的全文索引（数据文件未改动时），第一次查询不必重新切词
+
+        延迟加载模式下未能载入时立即建立索引，摘要的描述不在内存中保留到第一次查询。
+        """
+        if not self._restore_search() and self.lazy:
+            self._search.build()
+
+    def _restore_search(self) -> bool:
+        stamp = file_stamp(self.storage.source_files()) if self._load_error is None else None
+        if stamp is None:
+            return False
+        try:
+            payload = self.search_file.read_bytes()
+        except OSError:
+            return False
+        if not self._search.restore(payload, stamp):
+            return False
+        logger.info(f"已载入全文索引: {self.search_file}")
+        return True
+
+    def _save_search(self) -> None:
+        """保存已建立的全文索引（须持有锁）；数据有未写入的修改或已被其他程序改动时不保存"""
+        if (not self._search.built or not self._search.complete or self._load_error is not None
+                or len(self._tracker)):
+            return
+        if self._fingerprint is not None and self._fingerprint.changed():
+            return
+        stamp = file_stamp(self.storage.source_files())
+        if stamp is None or stamp == self._search.stamp:
+            return
+        try:
+            write_bytes_atomic(self.search_file, self._search.encode(stamp))
+        except OSError as e:
+            logger.warning(f"写入全文索引文件失败: {e}")
+
+    def _search_records(self, query: str, limit: Optional[int] = None) -> List[Any]:
+        """全文查询，结果按相关程度从高到低排列"""
+        with self._lock:
+            index = self._loaded_index()
+            return [index.get(uid) for uid, _ in self._search.search(query, limit)]
+
+    # ---- 修改 ----
+
+    @contextmanager
+    def batch(self) -> Iterator[BatchResult]:
+        """
+        批量修改
+
+        块内的新增、修改和删除只登记，不逐条保存，也不触发存储整理；正常退出时
+        一次提交（SQLite后端为单个事务）。块内抛出异常时撤销对记录列表和记录字段的
+        全部修改并重新抛出异常。批量修改期间持有管理器锁，嵌套调用并入最外层。
+
+        用法::
+
+            with manager.batch() as result:
+                for task in manager.get_all_projects():
+                    task.priority = 1
+            print(result.changed, result.saved)
+        """
+        with self._lock:
+            if self._batch is not None:
+                yield self._batch
+                return
+            # 批量修改期间的查询在内存中完成，未提交的修改不会提前写入数据库
+            records = list(self._loaded_index())
+            by_key = dict(self._by_key)
+            result = BatchResult()
+            self._tracker.begin()
+            self._batch = result
+            try:
+                yield result
+            except BaseException:
+                self._tracker.rollback()
+                for record in records:
+                    if not self._is_summary(record):
+                        self._tracker.attach(record)
+                # 撤销的字段值直接写回对象，索引需要重建
+                self._index.rebuild(records)
+                self._by_key = by_key
+                self._batch = None
+                logger.warning(f"批量修改{self.label}失败，已撤销全部修改")
+                raise
+            self._tracker.commit(result)
+            self._batch = None
+            result.saved = self._persist() if result.changed else True
+        logger.info(f"批量修改{self.label}完成: 新增 {result.added} 个，修改 {result.updated} 个，"
+                    f"删除 {result.deleted} 个")
+
+    def _add(self, record: Any) -> Optional[Any]:
+        """加入新记录并保存，保存失败时返回None"""
+        with self._lock:
+            if self._loaded:
+                self._index.add(record)
+            self._tracker.mark_added(record)
+        return record if self._persist() else None
+
+    def _update(self, record: Any) -> bool:
+        """持久化对单条记录的修改"""
+        self._tracker.mark_dirty(record)
+        return self._persist()
+
+    def _remove(self, record: Any) -> None:
+        """从记录列表中移除并登记删除（须持有锁）"""
+        self._index.discard(record.uid)
+        key = self._key_of(record)
+        if key is not None:
+            self._deleted_identities[key] = (record.uid, record.revision)
+        if self._is_summary(record):
+            self._tracker.mark_deleted_key(key)
+        else:
+            self._tracker.mark_deleted(record)
+            self._by_key.pop(key, None)
+        self._records_changed()
+
+    # ---- 读取 ----
+
+    def _iter_records(self, stats: Optional[LoadStats] = None) -> Iterator[Any]:
+        """
+        逐条产出记录，不构建记录列表
+
+        列表已加载时直接遍历列表；否则（数据库后端）从存储逐页读取，
+        每次只持有一页记录，尚未构建过的记录产出的是只读副本（修改不会被保存）。
+        损坏的记录被跳过并计入 ``stats``。
+        """
+        if self._loaded:
+            yield from list(self._index)
+            return
+        stats = stats or LoadStats()
+        with self._lock:
+            # 先写入尚未保存的变更，保证扫描结果包含它们
+            self._save_pending()
+        records = with_identity(self.storage.iter_load(stats))
+        while True:
+            page = []
+            with self._lock:
+                chunk = list(islice(records, PAGE_SIZE))
+                for key, item in chunk:
+                    try:
+                        page.append(self._by_key.get(key) or self.record_type.from_dict(item))
+                    except RECORD_ERRORS as e:
+                        stats.reject(key, e, record=raw_record(item))
+            if not chunk:
+                break
+            stats.loaded += len(page)
+            yield from page
+        stats.finish()
+
+    def _get_by_uid(self, uid: str) -> Optional[Any]:
+        """根据内部ID获取记录"""
+        if self.storage.supports_queries and not self._loaded:
+            with self._lock:
+                self._save_pending()
+                found = [self._materialize(key, item)
+                         for key, item in with_identity(self.storage.query({'uid': uid}))]
+            if found:
+                return found[0]
+            # 旧数据的uid在写入前只存在于内存中，需要加载全部记录
+        with self._lock:
+            return self._loaded_index().get(uid)
+
+    def get_stats(self, group: str) -> Dict[Any, Totals]:
+        """
+        分组统计：每组的记录数与合计（``Totals.count``、``Totals.sums``）
+
+        Args:
+            group: 分组方式，见各管理器模块的 ``STAT_GROUPS``
+        """
+        with self._lock:
+            self._loaded_index()
+            return self._stats.groups(group)
+
+    def get_totals(self) -> Totals:
+        """全部记录的记录数与合计"""
+        with self._lock:
+            self._loaded_index()
+            return self._stats.totals()
+
+    def verify_stats(self) -> List[str]:
+        """全量重新计算统计并与维护的结果比较（一致性检查），返回不一致之处"""
+        with self._lock:
+            problems = self._stats.verify(self._loaded_index())
+        for problem in problems:
+            logger.warning(f"{self.label}统计不一致: {problem}")
+        return problems
+
+    # ---- 导入导出 ----
+
+    def export_json(self, json_file: str) -> bool:
+        """把全部记录导出为原有JSON格式"""
+        try:
+            with self._lock, self._files_locked():
+                self._sync_if_changed()
+                records = [self._record(record) for record in self._loaded_index()]
+            with open(json_file, 'w', encoding='utf-8') as f:
+                json.dump(records, f, ensure_ascii=False, indent=2)
+            return True
+        except (IOError, PermissionError) as e:
+            logger.error(f"导出{self.label}失败: {e}")
+            return False
+
+    def import_json(self, json_file: str, replace: bool = False) -> int:
+        """
+        从原有JSON格式导入记录
+
+        Args:
+            json_file: JSON数据文件
+            replace: 为True时替换现有全部记录，否则追加
+
+        Returns:
+            导入的数量，失败时为-1
+        """
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                records = [self.record_type.from_dict(item)
+                           for _, item in with_identity(enumerate(json.load(f)))]
+        except (IOError, json.JSONDecodeError, KeyError, TypeError) as e:
+            logger.error(f"导入{self.label}失败: {e}")
+            return -1
+
+        with self._lock:
+            try:
+                with self._files_locked():
+                    # 替换全部数据时不需要先合并他人的修改
+                    if not replace and not self._sync_if_changed():
+                        return -1
+                    if replace:
+                        self._set_records(records)
+                        # 替换全部数据后不再需要保护加载失败的原文件
+                        self._load_error = None
+                    elif not self._append_imported(records):
+                        return -1
+                    for record in records:
+                        self._tracker.mark_added(record)
+                    if not self._save_all():
+                        return -1
+                    self._capture_fingerprint()
+            except LockTimeoutError as e:
+                logger.error(f"导入{self.label}失败: {e}")
+                return -1
+        return len(records)
+
+    def _append_imported(self, records: List[Any]) -> bool:
+        """把导入的记录加入索引；违反唯一约束时全部撤回"""
+        index = self._loaded_index()
+        added = []
+        try:
+            for record in records:
+                if record.uid in index:
+                    # 导入的是本文件导出的数据时uid会重复，作为新记录处理
+                    record.uid = new_uid()
+                index.add(record)
+                added.append(record)
+        except DuplicateKeyError as e:
+            for record in added:
+                index.discard(record.uid)
+            logger.error(f"导入{self.label}失败: {e}")
+            return False
+        self._records_changed()
+        return True
@@ -0,0 +1,137 @@
+import time
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 最后一次修改后等待多久再写入(秒)，期间的修改合并为一次写入
+DEFAULT_SAVE_DELAY = 0.5
+# 写入失败后的重试间隔(秒)
+DEFAULT_RETRY_DELAY = 5.0
+
+
+class SaveStatus:
+    """后台保存状态"""
+    IDLE = "idle"          # 所有修改均已写入
+    PENDING = "pending"    # 有修改等待写入
+    SAVING = "saving"      # 正在写入
+    FAILED = "failed"      # 最近一次写入失败，等待重试
+
+
+class BackgroundSaver:
+    """
+    合并写入的后台保存器
+
+    ``schedule()`` 只登记一次保存请求并立即返回；工作线程在最后一次请求后
+    等待 ``delay`` 秒没有新请求时才调用 ``save_fn``，因此连续的修改只写一次，
+    写入也不会阻塞Tk主循环。``save_fn`` 返回False或抛出异常视为写入失败，
+    会在 ``retry_delay`` 秒后重试。
+    """
+
+    def __init__(self, save_fn: Callable[[], bool], delay: float = DEFAULT_SAVE_DELAY,
+                 retry_delay: float = DEFAULT_RETRY_DELAY, name: str = "background-saver"):
+        self.save_fn = save_fn
+        self.delay = delay
+        self.retry_delay = retry_delay
+        self.last_error: Optional[str] = None
+        self._cond = threading.Condition()
+        self._pending = False
+        self._saving = False
+        self._failed = False
+        self._flush_requested = False
+        self._closing = False
+        self._due = 0.0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def status(self) -> str:
+        """当前保存状态，见 :class:`SaveStatus`"""
+        with self._cond:
+            if self._saving:
+                return SaveStatus.SAVING
+            if self._failed:
+                return SaveStatus.FAILED
+            if self._pending:
+                return SaveStatus.PENDING
+            return SaveStatus.IDLE
+
+    def schedule(self) -> None:
+        """登记一次保存请求（重新开始计时）"""
+        with self._cond:
+            self._pending = True
+            self._due = time.monotonic() + self.delay
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        立即写入所有等待中的修改并等待完成
+
+        Returns:
+            最后一次写入是否成功（超时也返回False）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._failed:
+                # 失败后不再等待重试间隔，立即再试一次
+                self._pending = True
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._pending or self._saving:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._flush_requested = False
+                    return False
+                self._cond.wait(remaining)
+            self._flush_requested = False
+            if self._failed:
+                # 继续在后台按间隔重试
+                self._pending = True
+                self._due = time.monotonic() + self.retry_delay
+                self._cond.notify_all()
+                return False
+            return True
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """写入剩余修改并停止工作线程"""
+        ok = self.flush(timeout)
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        return ok
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closing:
+                    if self._pending:
+                        remaining = self._due - time.monotonic()
+                        if self._flush_requested or remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._closing:
+                    return
+                self._pending = False
+                self._saving = True
+
+            ok = False
+            try:
+                ok = bool(self.save_fn())
+                error = None if ok else "保存失败"
+            except Exception as e:
+                logger.error(f"后台保存时发生错误: {e}")
+                error = str(e)
+
+            with self._cond:
+                self._saving = False
+                self._failed = not ok
+                self.last_error = error
+                if not ok and not self._pending:
+                    # 稍后重试；flush时立即重试由flush负责
+                    self._pending = not self._flush_requested
+                    self._due = time.monotonic() + self.retry_delay
+                self._cond.notify_all()
@@ -0,0 +1,548 @@
+import re
+import sys
+import json
+import math
+import struct
+import logging
+from array import array
+from bisect import bisect_left, insort
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # 没有NumPy时在Python中逐个文档计分
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# 全文索引文件的扩展名（与数据文件放在一起）
+SEARCH_SUFFIX = '.search'
+MAGIC = b'PMSS'
+FORMAT_VERSION = 1
+
+# 文件头：魔数、格式版本、描述(JSON)的字节长度
+_PREAMBLE = struct.Struct('<4sHI')
+
+# 被索引的字段及其权重：标题中的词比描述中的词更重要
+DEFAULT_WEIGHTS = {'title': 3, 'description': 1}
+_MAX_WEIGHT = 0xFFFF
+_MISSING = object()
+
+# 已删除或已被替换的文档数超过有效文档数（且不少于此数）时整理倒排表
+COMPACT_MIN_DEAD = 1024
+
+# 汉字（含扩展A和兼容汉字）、假名、谚文按字处理，其余按由字母和数字组成的词处理
+_CJK = '぀-ヿ㐀-䶿一-鿿가-힯豈-﫿'
+_TOKEN = re.compile(f'[{_CJK}]+|[^\\W_]+')
+_CJK_CHAR = re.compile(f'[{_CJK}]')
+
+
+def search_file_for(data_file: Path) -> Path:
+    """数据文件对应的全文索引文件"""
+    data_file = Path(data_file)
+    return data_file.with_name(data_file.name + SEARCH_SUFFIX)
+
+
+def _is_cjk(run: str) -> bool:
+    return _CJK_CHAR.match(run) is not None
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    把文本切分为词
+
+    汉字等连续的字切分为相邻两字（"项目管理" -> 项目、目管、管理），只有一个字时保留单字；
+    字母和数字按词切分并转为小写。
+    """
+    if not text:
+        return []
+    tokens = []
+    for run in _TOKEN.findall(text.lower()):
+        if len(run) > 1 and _is_cjk(run):
+            tokens.extend([run[i:i + 2] for i in range(len(run) - 1)])
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def _query_groups(query: str) -> List[Tuple[str, str]]:
+    """
+    查询中的词：(词, 匹配方式) 列表
+
+    匹配方式为 exact（完全相同）、prefix（以该词开头，查询末尾正在输入的字母数字词）
+    或 char（包含该字，单独的一个汉字）。
+    """
+    text = query.lower()
+    runs = list(_TOKEN.finditer(text))
+    groups = []
+    for position, match in enumerate(runs):
+        run = match.group()
+        if _is_cjk(run):
+            if len(run) == 1:
+                groups.append((run, 'char'))
+            else:
+                groups.extend((run[i:i + 2], 'exact') for i in range(len(run) - 1))
+        elif position == len(runs) - 1 and match.end() == len(text):
+            groups.append((run, 'prefix'))
+        else:
+            groups.append((run, 'exact'))
+    return list(dict.fromkeys(groups))
+
+
+class SearchIndex:
+    """
+    标题和描述的倒排索引
+
+    每条记录是一个文档，按加入顺序编号；每个词对应两个等长数组：包含该词的文档编号
+    （递增）和权重（出现次数乘字段权重）。文档被移除或重新索引时只把编号标记为无效，
+    不需要原来的文本，也不修改倒排表；无效编号过多时整理一次。
+
+    查询的每个词都须出现（汉字按两字匹配，末尾正在输入的词按前缀匹配，单独的汉字匹配
+    包含它的词），结果按 TF-IDF 得分从高到低排列，得分相同时按加入顺序。
+
+    与 :class:`aggregates.Aggregates` 一样由 :class:`index.RecordIndex` 在记录加入、
+    移除和字段被赋值时调用。``rebuild`` 只记下记录，第一次查询时才切词建立索引；
+    在此之前可以用 :meth:`restore` 载入保存的索引文件，启动时不必重新切词。
+
+    记录本身没有的被索引字段（延迟加载的摘要不含描述）由加载时读到的完整记录经
+    :meth:`provide` 提供，文本只保留到该记录被切词为止；此后重建时（如撤销批量修改、
+    合并外部修改）没有重新提供描述的摘要保留原来的文档，或取同一记录完整对象的描述。
+    """
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None, use_numpy: Optional[bool] = None):
+        """
+        Args:
+            weights: 被索引的字段 -> 权重，默认为 ``DEFAULT_WEIGHTS``
+            use_numpy: 查询时是否用NumPy计分，默认在可用时使用
+        """
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.numpy = np is not None if use_numpy is None else (use_numpy and np is not None)
+        self._reset()
+        # 尚未建立索引的记录：uid -> 记录；None 表示索引已建立
+        self._pending: Optional[Dict[str, Any]] = {}
+        # 索引对应的数据文件标识：从索引文件载入或生成索引文件后设置，索引改动后为None
+        self.stamp: Optional[List[List[Any]]] = None
+        # 记录没有的被索引字段的文本：uid -> {字段: 文本}，切词后丢弃
+        self._texts: Dict[str, Dict[str, Any]] = {}
+        # 每条记录的全部被索引字段都已切词（没有提供描述的摘要除外）
+        self.complete = True
+
+    def _reset(self) -> None:
+        # 文档编号 -> uid，无效的文档为None
+        self._uids: List[Optional[str]] = []
+        # 已切词的文档来自的对象：uid -> 记录
+        self._sources: Dict[str, Any] = {}
+        # 文档编号 -> 是否有效（1/0）
+        self._live = bytearray()
+        self._doc_of: Dict[str, int] = {}
+        self._dead = 0
+        # 词 -> 文档编号数组、权重数组
+        self._docs: Dict[str, array] = {}
+        self._weights: Dict[str, array] = {}
+        # 排好序的字母数字词（前缀查询用）；一次加入大量文档时为None，加入后再排序
+        self._words: Optional[List[str]] = []
+        # 字 -> 包含它的汉字词（单字查询用）
+        self._chars: Dict[str, Dict[str, None]] = {}
+
+    def __len__(self) -> int:
+        if self._pending is not None:
+            return len(self._pending)
+        return len(self._doc_of)
+
+    @property
+    def built(self) -> bool:
+        """索引是否已建立（或已从文件载入）"""
+        return self._pending is None
+
+    # ---- 由 RecordIndex 调用 ----
+
+    def rebuild(self, records: Iterable[Any]) -> None:
+        """
+        丢弃现有索引，记下新的记录，第一次查询时再建立
+
+        索引已建立时，没有重新提供描述的摘要取同一记录已切词的完整对象的描述（如撤销
+        批量修改后的Task），或者在标题未变时保留原来的文档（描述已不在内存中），
+        此时立即对其余记录重新切词。
+        """
+        records = {record.uid: record for record in records}
+        kept = {}
+        if self._pending is None:
+            for uid, record in records.items():
+                source = self._sources.get(uid)
+                if source is None or uid in self._texts or not self._partial(record):
+                    continue
+                if not self._partial(source):
+                    self.provide(uid, {name: getattr(source, name) for name in self.weights})
+                elif self._same(source, record):
+                    kept[uid] = record
+        self._texts = {uid: texts for uid, texts in self._texts.items() if uid in records}
+        self.stamp = None
+        self.complete = True
+        if kept:
+            self._sources.update(kept)
+            for uid in list(self._doc_of):
+                if uid not in kept:
+                    self._forget(uid)
+            for uid, record in records.items():
+                if uid not in kept:
+                    self._index(record)
+            return
+        self._reset()
+        self._pending = records
+
+    def provide(self, uid: str, texts: Dict[str, Any]) -> None:
+        """在记录加入之前提供它本身没有的被索引字段的文本（如摘要的描述）"""
+        self._texts[uid] = {name: texts.get(name) for name in self.weights}
+
+    def build(self) -> None:
+        """立即建立索引（切词后丢弃 :meth:`provide` 提供的文本）"""
+        self._ensure()
+
+    def add(self, record: Any) -> None:
+        self.stamp = None
+        if self._pending is not None:
+            self._pending[record.uid] = record
+            return
+        self._index(record)
+
+    def remove(self, record: Any) -> None:
+        self.stamp = None
+        self._texts.pop(record.uid, None)
+        if self._pending is not None:
+            self._pending.pop(record.uid, None)
+            return
+        self._forget(record.uid)
+
+    def replace(self, old: Any, record: Any) -> None:
+        """
+        同一uid的记录换成新对象（摘要换成完整记录或记录键改变）
+
+        两者都有的被索引字段相同时保留已有的文档，摘要不含的描述不必重新提供。
+        """
+        if not self._same(old, record):
+            self.remove(old)
+            self.add(record)
+        elif self._pending is not None:
+            self._pending[record.uid] = record
+        elif self._partial(record) <= self._partial(self._sources.get(record.uid, record)):
+            # 保留描述更完整的对象：摘要换成完整记录后，撤销修改时据此取回描述
+            self._sources[record.uid] = record
+
+    def rekey(self, old: Any, record: Any) -> None:
+        """同一记录换成只有存储键不同的新对象：文档不变，只更新保存的对象"""
+        if self._pending is not None:
+            if self._pending.get(record.uid) is old:
+                self._pending[record.uid] = record
+        elif self._sources.get(record.uid) is old:
+            self._sources[record.uid] = record
+
+    def field_changed(self, record: Any, name: str, old: Any) -> None:
+        """记录的字段已被赋值：文本字段改变时重新索引该记录，uid改变时更新对应关系"""
+        if name == 'uid':
+            self.stamp = None
+            if self._pending is not None:
+                if self._pending.get(old) is record:
+                    del self._pending[old]
+                    self._pending[record.uid] = record
+                    if old in self._texts:
+                        self._texts[record.uid] = self._texts.pop(old)
+                return
+            doc = self._doc_of.pop(old, None)
+            if doc is not None:
+                self._doc_of[record.uid] = doc
+                self._uids[doc] = record.uid
+                self._sources[record.uid] = self._sources.pop(old, record)
+            return
+        if name not in self.weights or self._pending is not None:
+            return
+        self.stamp = None
+        self._forget(record.uid)
+        self._index(record)
+
+    # ---- 建立和维护 ----
+
+    def _ensure(self) -> None:
+        if self._pending is None:
+            return
+        records, self._pending = self._pending, None
+        self._words = None
+        for record in records.values():
+            self._index(record)
+        self._texts = {}
+        self._vocabulary()
+
+    def _index(self, record: Any) -> None:
+        counts: Dict[str, int] = {}
+        texts = self._texts.pop(record.uid, None)
+        for name, weight in self.weights.items():
+            # 延迟加载的摘要没有描述，使用加载时提供的文本
+            text = getattr(record, name, _MISSING)
+            if text is _MISSING and texts is not None:
+                text = texts.get(name)
+            if text is _MISSING:
+                self.complete = False
+            if not isinstance(text, str):
+                continue
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + weight
+        doc = len(self._uids)
+        self._uids.append(record.uid)
+        self._live.append(1)
+        self._doc_of[record.uid] = doc
+        self._sources[record.uid] = record
+        for token, weight in counts.items():
+            docs = self._docs.get(token)
+            if docs is None:
+                docs = self._docs[token] = array('i')
+                self._weights[token] = array('H')
+                self._new_term(token)
+            docs.append(doc)
+            self._weights[token].append(min(weight, _MAX_WEIGHT))
+
+    def _new_term(self, token: str) -> None:
+        if self._words is None:
+            return
+        if _is_cjk(token):
+            for char in token:
+                self._chars.setdefault(char, {})[token] = None
+        else:
+            insort(self._words, token)
+
+    def _partial(self, record: Any) -> bool:
+        return any(getattr(record, name, _MISSING) is _MISSING for name in self.weights)
+
+    def _same(self, old: Any, record: Any) -> bool:
+        """两个对象是同一记录且两者都有的被索引字段相同"""
+        return old.uid == record.uid and all(
+            getattr(old, name, _MISSING) is _MISSING or getattr(record, name, _MISSING) is _MISSING
+            or getattr(old, name) == getattr(record, name) for name in self.weights)
+
+    def _forget(self, uid: str) -> None:
+        self._sources.pop(uid, None)
+        doc = self._doc_of.pop(uid, None)
+        if doc is None:
+            return
+        self._uids[doc] = None
+        self._live[doc] = 0
+        self._dead += 1
+        if self._dead >= COMPACT_MIN_DEAD and self._dead > len(self._doc_of):
+            self.compact()
+
+    def compact(self) -> None:
+        """去掉倒排表中的无效文档并重新编号（不需要重新切词）"""
+        self._ensure()
+        if not self._dead:
+            return
+        renumber = {}
+        uids = []
+        for doc, uid in enumerate(self._uids):
+            if uid is not None:
+                renumber[doc] = len(uids)
+                uids.append(uid)
+        docs_of, weights_of = {}, {}
+        for token, docs in self._docs.items():
+            weights = self._weights[token]
+            kept = [(renumber[doc], weight) for doc, weight in zip(docs, weights) if doc in renumber]
+            if kept:
+                docs_of[token] = array('i', [doc for doc, _ in kept])
+                weights_of[token] = array('H', [weight for _, weight in kept])
+        self._uids = uids
+        self._live = bytearray([1]) * len(uids)
+        self._doc_of = {uid: doc for doc, uid in enumerate(uids)}
+        self._dead = 0
+        self._docs, self._weights = docs_of, weights_of
+        self._vocabulary()
+
+    def _vocabulary(self) -> None:
+        """根据倒排表重新生成前缀查询和单字查询用的词表"""
+        self._words = sorted(term for term in self._docs if not _is_cjk(term))
+        self._chars = {}
+        for term in self._docs:
+            if _is_cjk(term):
+                for char in term:
+                    self._chars.setdefault(char, {})[term] = None
+
+    # ---- 查询 ----
+
+    def _terms(self, token: str, how: str) -> List[str]:
+        if how == 'exact':
+            return [token] if token in self._docs else []
+        if how == 'char':
+            return list(self._chars.get(token, ()))
+        words = self._words
+        start = bisect_left(words, token)
+        end = start
+        while end < len(words) and words[end].startswith(token):
+            end += 1
+        return words[start:end]
+
+    def _matches(self, terms: List[str]) -> Dict[int, int]:
+        """包含任一词的文档 -> 权重"""
+        if len(terms) == 1:
+            return dict(zip(self._docs[terms[0]], self._weights[terms[0]]))
+        matches: Dict[int, int] = {}
+        for term in terms:
+            for doc, weight in zip(self._docs[term], self._weights[term]):
+                if weight > matches.get(doc, 0):
+                    matches[doc] = weight
+        return matches
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        查询标题和描述
+
+        Args:
+            query: 查询文本，空白和标点分隔多个词
+            limit: 最多返回的条数，默认全部
+
+        Returns:
+            (uid, 得分) 列表，按得分从高到低；查询中没有可以匹配的词时为空列表
+        """
+        self._ensure()
+        groups = []
+        for token, how in _query_groups(query):
+            terms = self._terms(token, how)
+            if not terms:
+                return []
+            groups.append(terms)
+        if not groups:
+            return []
+        scored = self._score_numpy(groups, limit) if self.numpy else self._score_python(groups, limit)
+        uids = self._uids
+        return [(uids[doc], score) for doc, score in scored]
+
+    def _idf(self, matched: int) -> float:
+        return math.log(1 + max(len(self._doc_of), 1) / matched)
+
+    def _score_python(self, groups: List[List[str]], limit: Optional[int]) -> List[Tuple[int, float]]:
+        # 从估计最小的词开始，其余的词只在已匹配的文档中计分
+        groups = sorted(groups, key=lambda terms: sum(len(self._docs[term]) for term in terms))
+        live = self._live
+        scores: Dict[int, float] = {}
+        for position, terms in enumerate(groups):
+            matches = self._matches(terms)
+            idf = self._idf(len(matches))
+            if position == 0:
+                scores = {doc: weight * idf for doc, weight in matches.items() if live[doc]}
+            else:
+                scores = {doc: score + matches[doc] * idf for doc, score in scores.items()
+                          if doc in matches}
+            if not scores:
+                return []
+        # 得分相同时按文档编号（加入顺序）
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def _score_numpy(self, groups: List[List[str]], limit: Optional[int]) -> List[Tuple[int, float]]:
+        # 每个词展开为全部文档长度的权重向量，逐个向量运算，耗时与匹配的文档数基本无关
+        count = len(self._uids)
+        matched = np.frombuffer(self._live, dtype=np.uint8).astype(bool)
+        scores = np.zeros(count)
+        for terms in groups:
+            weights = np.zeros(count, dtype=np.uint16)
+            if len(terms) == 1:
+                weights[np.frombuffer(self._docs[terms[0]], dtype=np.int32)] = \
+                    np.frombuffer(self._weights[terms[0]], dtype=np.uint16)
+            else:
+                # 前缀或单字展开的多个词先拼接，同一文档取最大的权重
+                docs, values = array('i'), array('H')
+                for term in terms:
+                    docs.extend(self._docs[term])
+                    values.extend(self._weights[term])
+                np.maximum.at(weights, np.frombuffer(docs, dtype=np.int32),
+                              np.frombuffer(values, dtype=np.uint16))
+            present = weights > 0
+            matched &= present
+            scores += weights * self._idf(int(np.count_nonzero(present)))
+        docs = np.flatnonzero(matched)
+        # 稳定排序，得分相同时按文档编号
+        order = docs[np.argsort(-scores[docs], kind='stable')[:limit]]
+        return list(zip(order.tolist(), scores[order].tolist()))
+
+    # ---- 持久化 ----
+
+    def encode(self, stamp: Optional[List[List[Any]]]) -> bytes:
+        """
+        生成索引文件内容（先整理掉无效文档）
+
+        Args:
+            stamp: 数据文件的标识，见 :func:`columnstore.file_stamp`
+        """
+        self.compact()
+        terms = list(self._docs)
+        counts = array('I', map(len, self._docs.values()))
+        docs = array('i')
+        weights = array('H')
+        for term in terms:
+            docs.extend(self._docs[term])
+            weights.extend(self._weights[term])
+        header = {'stamp': stamp, 'weights': self.weights, 'uids': self._uids, 'terms': terms}
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        self.stamp = stamp
+        return b''.join([_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)), header_bytes,
+                         _pack(counts), _pack(docs), _pack(weights)])
+
+    def restore(self, payload: bytes, stamp: Optional[List[List[Any]]]) -> bool:
+        """
+        载入索引文件代替首次查询时的切词
+
+        只在尚未建立索引、文件与 ``stamp`` 对应、字段权重相同且文档正好是当前记录时载入。
+
+        Returns:
+            是否已载入
+        """
+        if self._pending is None or stamp is None:
+            return False
+        try:
+            magic, version, header_size = _PREAMBLE.unpack_from(payload)
+            if magic != MAGIC or version > FORMAT_VERSION:
+                raise ValueError("全文索引文件标识或版本不匹配")
+            start = _PREAMBLE.size + header_size
+            header = json.loads(payload[_PREAMBLE.size:start].decode('utf-8'))
+            if header['stamp'] != stamp or header['weights'] != self.weights:
+                return False
+            uids, terms = header['uids'], header['terms']
+            if len(uids) != len(self._pending) or not self._pending.keys() >= set(uids):
+                return False
+            counts = _unpack('I', payload, start, len(terms))
+            start += counts.itemsize * len(counts)
+            docs = _unpack('i', payload, start, sum(counts))
+            start += docs.itemsize * len(docs)
+            weights = _unpack('H', payload, start, len(docs))
+        except (ValueError, KeyError, TypeError, struct.error) as e:
+            logger.warning(f"全文索引文件无效，将重新建立: {e}")
+            return False
+        self._reset()
+        self._sources, self._pending = self._pending, None
+        self._texts = {}
+        self._uids = uids
+        self._live = bytearray([1]) * len(uids)
+        self._doc_of = {uid: doc for doc, uid in enumerate(uids)}
+        position = 0
+        for term, count in zip(terms, counts):
+            end = position + count
+            self._docs[term] = docs[position:end]
+            self._weights[term] = weights[position:end]
+            position = end
+        self._vocabulary()
+        self.stamp = stamp
+        self.complete = True
+        return True
+
+
+def _pack(values: array) -> bytes:
+    if sys.byteorder != 'little' and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack(code: str, payload: bytes, start: int, count: int) -> array:
+    values = array(code)
+    end = start + count * values.itemsize
+    if end > len(payload):
+        raise ValueError("全文索引文件过短")
+    values.frombytes(payload[start:end])
+    if sys.byteorder != 'little' and values.itemsize > 1:
+        values.byteswap()
+    return values
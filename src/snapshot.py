@@ -0,0 +1,437 @@
+import sys
+import json
+import logging
+import argparse
+import struct
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 二进制快照文件的扩展名
+SNAPSHOT_SUFFIX = '.pmsb'
+MAGIC = b'PMSB'
+# 格式版本，读取时拒绝更高的版本
+FORMAT_VERSION = 1
+
+# 文件头：魔数、格式版本、模式描述(JSON)的字节长度
+_PREAMBLE = struct.Struct('<4sHI')
+
+# 列类型
+INT = 'int'      # 按取值范围选择最窄的定长整数
+BOOL = 'bool'    # 每条记录一个字节
+TABLE = 'table'  # 字符串表中的序号，重复出现的字符串只存一份
+TEXT = 'text'    # 偏移数组 + UTF-8 正文
+JSON = 'json'    # 未知字段，只以例外值保存
+
+# 已知字段的列类型，其余字段按JSON保存
+FIELD_TYPES = {
+    'title': TEXT,
+    'description': TEXT,
+    'project_number': TEXT,
+    'uid': TEXT,
+    'priority': INT,
+    'progress': INT,
+    'week_number': INT,
+    'revision': INT,
+    'is_completed': BOOL,
+    'status': TABLE,
+    'project_name': TABLE,
+    'start_date': TABLE,
+    'due_date': TABLE,
+    'updated_at': TABLE,
+}
+
+# 定长整数的候选类型码（有符号），按宽度从窄到宽
+_INT_CODES = [(code, array(code).itemsize) for code in ('b', 'h', 'i', 'q')]
+# 无符号类型码，用于字符串序号和偏移
+_UINT_CODES = [(code, array(code).itemsize) for code in ('B', 'H', 'I', 'Q')]
+
+_ABSENT = object()
+
+
+class SnapshotError(ValueError):
+    """快照文件格式错误或版本不受支持"""
+
+
+def _int_code(low: int, high: int) -> str:
+    for code, size in _INT_CODES:
+        limit = 1 << (size * 8 - 1)
+        if -limit <= low and high < limit:
+            return code
+    raise OverflowError
+
+
+def _uint_code(high: int) -> str:
+    for code, size in _UINT_CODES:
+        if high < 1 << (size * 8):
+            return code
+    raise OverflowError
+
+
+def _pack(values: array) -> bytes:
+    """数组统一按小端序存储"""
+    if sys.byteorder != 'little' and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack(code: str, payload) -> array:
+    values = array(code)
+    values.frombytes(payload)
+    if sys.byteorder != 'little' and values.itemsize > 1:
+        values.byteswap()
+    return values
+
+
+def _pack_strings(strings: Sequence[str]) -> Tuple[str, bytes, bytes]:
+    """字符串序列 -> (偏移类型码, 偏移数组, UTF-8正文)"""
+    blob = bytearray()
+    offsets = [0]
+    for text in strings:
+        blob += text.encode('utf-8')
+        offsets.append(len(blob))
+    code = _uint_code(len(blob))
+    return code, _pack(array(code, offsets)), bytes(blob)
+
+
+class _Column:
+    """编码中的一列：定长数据 + 放不进该类型的例外值"""
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.format = ''
+        self.data = b''
+        # 行号 -> 原值；absent 记录缺少该字段的行
+        self.values: Dict[int, Any] = {}
+        self.absent: List[int] = []
+
+    def encode(self, column: List[Any], strings: Dict[str, int]) -> None:
+        kind = self.kind
+        if kind == INT:
+            ints = []
+            for row, value in enumerate(column):
+                if type(value) is int:
+                    ints.append(value)
+                else:
+                    ints.append(0)
+                    self._except(row, value)
+            try:
+                self.format = _int_code(min(ints, default=0), max(ints, default=0))
+            except OverflowError:
+                # 超出64位的整数整列按JSON保存
+                self.kind, self.format = JSON, ''
+                self.values, self.absent = {}, []
+                for row, value in enumerate(column):
+                    self._except(row, value)
+                return
+            self.data = _pack(array(self.format, ints))
+        elif kind == BOOL:
+            flags = bytearray(len(column))
+            for row, value in enumerate(column):
+                if value is True:
+                    flags[row] = 1
+                elif value is not False:
+                    self._except(row, value)
+            self.format = 'B'
+            self.data = bytes(flags)
+        elif kind == TABLE:
+            # 序号0表示None
+            indexes = []
+            for row, value in enumerate(column):
+                if type(value) is str:
+                    index = strings.get(value)
+                    if index is None:
+                        index = strings[value] = len(strings)
+                    indexes.append(index + 1)
+                else:
+                    indexes.append(0)
+                    if value is not None:
+                        self._except(row, value)
+            self.format = _uint_code(len(strings))
+            self.data = _pack(array(self.format, indexes))
+        elif kind == TEXT:
+            texts = []
+            for row, value in enumerate(column):
+                if type(value) is str:
+                    texts.append(value)
+                else:
+                    texts.append('')
+                    self._except(row, value)
+            self.format, offsets, blob = _pack_strings(texts)
+            self.data = offsets + blob
+        else:
+            for row, value in enumerate(column):
+                self._except(row, value)
+
+    def _except(self, row: int, value: Any) -> None:
+        if value is _ABSENT:
+            self.absent.append(row)
+        else:
+            self.values[row] = value
+
+    def extra(self) -> bytes:
+        if not self.values and not self.absent:
+            return b''
+        return json.dumps({'values': list(self.values.items()), 'absent': self.absent},
+                          ensure_ascii=False).encode('utf-8')
+
+
+def encode_snapshot(records: List[Dict[str, Any]]) -> bytes:
+    """
+    把记录字典编码为二进制快照
+
+    布局::
+
+        魔数 | 格式版本 | 模式描述长度 | 模式描述(JSON) | 字符串表 | 各列数据
+
+    模式描述记录每一列的字段名、类型、定长类型码和字节长度。数据按列存放：
+    整数按取值范围选用最窄的定长类型（优先级、进度通常只占一个字节），
+    状态、项目名称和日期存为字符串表中的序号，标题、描述等存为偏移数组加正文。
+    与列类型不符的值（None、类型错误的值、缺少的字段）作为例外值原样保存，
+    因此任何 ``to_dict`` 产生的记录都能无损还原。
+    """
+    names: Dict[str, None] = {}
+    for record in records:
+        for name in record:
+            if name not in names:
+                names[name] = None
+    strings: Dict[str, int] = {}
+    columns = []
+    for name in names:
+        column = _Column(name, FIELD_TYPES.get(name, JSON))
+        column.encode([record.get(name, _ABSENT) for record in records], strings)
+        columns.append(column)
+
+    string_code, string_offsets, string_blob = _pack_strings(list(strings))
+    body = [string_offsets, string_blob]
+    descriptions = []
+    for column in columns:
+        extra = column.extra()
+        descriptions.append({'name': column.name, 'type': column.kind, 'format': column.format,
+                             'size': len(column.data), 'extra': len(extra)})
+        body.append(column.data)
+        body.append(extra)
+    header = json.dumps({
+        'count': len(records),
+        'strings': {'count': len(strings), 'format': string_code, 'size': len(string_blob)},
+        'columns': descriptions,
+    }, ensure_ascii=False).encode('utf-8')
+    return _PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)) + header + b''.join(body)
+
+
+class SnapshotReader:
+    """
+    读取二进制快照
+
+    打开时只把各列转换为定长数组，记录字典在整体解码（:meth:`records`）
+    或按行号单独读取（:meth:`record`）时才构建。
+    """
+
+    def __init__(self, payload: bytes):
+        self.payload = payload
+        view = memoryview(payload)
+        if len(payload) < _PREAMBLE.size:
+            raise SnapshotError("文件过短，不是有效的快照")
+        magic, version, header_size = _PREAMBLE.unpack_from(payload)
+        if magic != MAGIC:
+            raise SnapshotError("文件标识不匹配，不是有效的快照")
+        if version > FORMAT_VERSION:
+            raise SnapshotError(f"不支持的快照版本: {version}")
+        position = _PREAMBLE.size
+        try:
+            header = json.loads(bytes(view[position:position + header_size]).decode('utf-8'))
+            position += header_size
+            self.version = version
+            self.count: int = header['count']
+
+            table = header['strings']
+            offsets_size = (table['count'] + 1) * array(table['format']).itemsize
+            offsets = _unpack(table['format'], view[position:position + offsets_size])
+            position += offsets_size
+            blob = bytes(view[position:position + table['size']])
+            position += table['size']
+            self.strings: List[Optional[str]] = [None] + [
+                blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(table['count'])]
+
+            self.columns: List[Dict[str, Any]] = []
+            for column in header['columns']:
+                column = dict(column)
+                column['data'] = view[position:position + column['size']]
+                position += column['size']
+                extra = bytes(view[position:position + column['extra']])
+                position += column['extra']
+                exceptions = json.loads(extra.decode('utf-8')) if extra else {}
+                column['values'] = {row: value for row, value in exceptions.get('values', [])}
+                column['absent'] = set(exceptions.get('absent', []))
+                self._prepare(column)
+                self.columns.append(column)
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            raise SnapshotError(f"快照内容损坏: {e}") from e
+        if position != len(payload):
+            raise SnapshotError("快照长度与文件头不符")
+
+    def _prepare(self, column: Dict[str, Any]) -> None:
+        """把列数据转换为定长数组；文本列拆分出偏移数组和正文"""
+        kind, data, count = column['type'], column['data'], self.count
+        if kind == TEXT:
+            offsets_size = (count + 1) * array(column['format']).itemsize
+            column['offsets'] = _unpack(column['format'], data[:offsets_size])
+            column['blob'] = bytes(data[offsets_size:])
+            if len(column['offsets']) != count + 1:
+                raise ValueError(f"列 {column['name']} 长度不符")
+        elif kind in (INT, BOOL, TABLE):
+            column['array'] = _unpack(column['format'], data)
+            if len(column['array']) != count:
+                raise ValueError(f"列 {column['name']} 长度不符")
+        elif kind != JSON:
+            raise ValueError(f"未知的列类型: {kind}")
+
+    @property
+    def field_names(self) -> List[str]:
+        return [column['name'] for column in self.columns]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _column_values(self, column: Dict[str, Any]) -> List[Any]:
+        kind = column['type']
+        if kind == INT:
+            values = column['array'].tolist()
+        elif kind == BOOL:
+            values = [flag == 1 for flag in column['array']]
+        elif kind == TABLE:
+            strings = self.strings
+            values = [strings[index] for index in column['array']]
+        elif kind == TEXT:
+            offsets, blob = column['offsets'], column['blob']
+            values = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(self.count)]
+        else:
+            values = [None] * self.count
+        for row, value in column['values'].items():
+            values[row] = value
+        return values
+
+    def records(self) -> List[Dict[str, Any]]:
+        """解码全部记录"""
+        names = self.field_names
+        records = [dict(zip(names, row))
+                   for row in zip(*(self._column_values(column) for column in self.columns))]
+        if not names:
+            records = [{} for _ in range(self.count)]
+        for column in self.columns:
+            for row in column['absent']:
+                del records[row][column['name']]
+        return records
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """解码第 row 条记录"""
+        if not 0 <= row < self.count:
+            raise IndexError(row)
+        record: Dict[str, Any] = {}
+        for column in self.columns:
+            if row in column['absent']:
+                continue
+            if row in column['values']:
+                record[column['name']] = column['values'][row]
+                continue
+            kind = column['type']
+            if kind == INT:
+                value = column['array'][row]
+            elif kind == BOOL:
+                value = column['array'][row] == 1
+            elif kind == TABLE:
+                value = self.strings[column['array'][row]]
+            elif kind == TEXT:
+                offsets = column['offsets']
+                value = column['blob'][offsets[row]:offsets[row + 1]].decode('utf-8')
+            else:
+                value = None
+            record[column['name']] = value
+        return record
+
+
+def decode_snapshot(payload: bytes) -> List[Dict[str, Any]]:
+    """把二进制快照解码为记录字典列表"""
+    return SnapshotReader(payload).records()
+
+
+def read_snapshot(path: Path) -> List[Dict[str, Any]]:
+    """读取快照文件，文件不存在时返回空列表"""
+    path = Path(path)
+    if not path.exists():
+        return []
+    return decode_snapshot(path.read_bytes())
+
+
+def _read_any(path: Path) -> List[Dict[str, Any]]:
+    if path.suffix.lower() == SNAPSHOT_SUFFIX:
+        return read_snapshot(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise SnapshotError(f"{path} 不是JSON数组")
+    return data
+
+
+def convert(source: Path, target: Path) -> int:
+    """
+    在JSON数据文件和二进制快照之间转换，方向由目标文件扩展名决定
+
+    Returns:
+        转换的记录数
+    """
+    # 延迟导入，避免与storage模块循环导入
+    from loader import encode_json_array
+    from storage import write_bytes_atomic
+
+    source, target = Path(source), Path(target)
+    records = _read_any(source)
+    if target.suffix.lower() == SNAPSHOT_SUFFIX:
+        payload = encode_snapshot(records)
+        # 写入前确认能无损读回
+        if decode_snapshot(payload) != records:
+            raise SnapshotError("快照校验失败，未写入目标文件")
+    else:
+        payload, _ = encode_json_array(records)
+    write_bytes_atomic(target, payload)
+    return len(records)
+
+
+def describe(path: Path) -> str:
+    """快照文件头的可读描述"""
+    reader = SnapshotReader(Path(path).read_bytes())
+    lines = [f"版本 {reader.version}，{reader.count} 条记录，字符串表 {len(reader.strings) - 1} 项"]
+    for column in reader.columns:
+        lines.append(f"  {column['name']:<16} {column['type']:<6} {column['format'] or '-':<2} "
+                     f"{column['size']:>10} 字节  例外值 {len(column['values']) + len(column['absent'])}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="项目数据二进制快照工具")
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert_parser = commands.add_parser('convert', help=f"在JSON与{SNAPSHOT_SUFFIX}快照之间转换")
+    convert_parser.add_argument('source', type=Path)
+    convert_parser.add_argument('target', type=Path)
+    info_parser = commands.add_parser('info', help="显示快照的模式描述")
+    info_parser.add_argument('path', type=Path)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'convert':
+            count = convert(args.source, args.target)
+            print(f"已转换 {count} 条记录: {args.source} -> {args.target}")
+        else:
+            print(describe(args.path))
+    except (OSError, ValueError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
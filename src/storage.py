@@ -0,0 +1,859 @@
+import json
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from journal import ChangeJournal, DEFAULT_COMPACT_THRESHOLD
+from snapshot import SNAPSHOT_SUFFIX, SnapshotError, SnapshotReader, encode_snapshot
+from loader import (LoadStats, RecordLocator, encode_json_array, iter_json_array,
+                    iter_json_array_spans, preserve_corrupt)
+
+logger = logging.getLogger(__name__)
+
+# 按扩展名选择SQLite后端
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+# SQLite后端逐条读取时每次查询的行数
+SQLITE_PAGE_SIZE = 500
+# 分段存储使用的目录扩展名
+SEGMENTED_SUFFIX = '.segments'
+# 分段存储中每个分段文件容纳的记录数
+DEFAULT_SEGMENT_SIZE = 256
+
+
+class ChangeTracker:
+    """
+    变更跟踪器
+
+    管理器把自己的记录挂载到跟踪器上，记录的字段被赋值时会登记到这里；
+    新增和删除的记录也在这里登记。保存时一次取出全部变更写入存储后端。
+    跟踪器可能同时被界面线程和后台保存线程访问，内部加锁。
+
+    ``begin()`` 之后进入批量修改：跟踪器额外记录每个记录第一次被修改前的字段值，
+    ``rollback()`` 可以把记录和待写入的变更恢复到 ``begin()`` 时的状态。
+
+    指定 ``index`` 时，字段赋值前检查索引的唯一约束，赋值后更新索引。
+    """
+
+    def __init__(self, index=None):
+        self.index = index
+        self._lock = threading.Lock()
+        # 记录对象不可哈希（dataclass），按id登记
+        self._dirty: Dict[int, Any] = {}
+        self._added: Dict[int, Any] = {}
+        self._deleted: List[Any] = []
+        self._batch: Optional[_BatchLog] = None
+
+    def attach(self, record: Any) -> None:
+        """开始跟踪记录"""
+        record._tracker = self
+
+    def before_change(self, record: Any, name: Optional[str] = None, value: Any = None) -> None:
+        """记录字段即将被赋值（批量修改期间保存修改前的值）"""
+        if self.index is not None and name is not None:
+            self.index.check(record, name, value)
+        batch = self._batch
+        if batch is not None and id(record) not in batch.undo:
+            batch.undo[id(record)] = (record, {name: getattr(record, name) for name in record._tracked_fields},
+                                      record.version)
+
+    def changed(self, record: Any, name: str, old: Any) -> None:
+        """记录的字段已被赋值"""
+        if self.index is not None:
+            self.index.field_changed(record, name, old)
+        self.mark_dirty(record)
+
+    def mark_dirty(self, record: Any) -> None:
+        with self._lock:
+            # 尚未写入的新记录在插入时会写入最新内容
+            if id(record) not in self._added:
+                self._dirty[id(record)] = record
+            if self._batch is not None and id(record) not in self._batch.added:
+                self._batch.dirty.add(id(record))
+
+    def mark_added(self, record: Any) -> None:
+        """登记新增记录（尚未分配记录键）"""
+        self.attach(record)
+        with self._lock:
+            self._added[id(record)] = record
+            if self._batch is not None:
+                self._batch.added[id(record)] = record
+
+    def mark_deleted_key(self, key: Any) -> None:
+        """登记删除一条没有构建为对象的记录"""
+        with self._lock:
+            self._deleted.append(key)
+            if self._batch is not None:
+                self._batch.deleted += 1
+
+    def mark_deleted(self, record: Any) -> None:
+        """登记删除记录，并停止跟踪它"""
+        record._tracker = None
+        with self._lock:
+            self._dirty.pop(id(record), None)
+            if self._batch is not None:
+                self._batch.dirty.discard(id(record))
+                if self._batch.added.pop(id(record), None) is None:
+                    self._batch.deleted += 1
+            if self._added.pop(id(record), None) is None:
+                key = record._storage_key
+                if key is not None:
+                    self._deleted.append(key)
+
+    def take(self) -> 'Changes':
+        """取出并清空全部待写入的变更"""
+        with self._lock:
+            changes = Changes(list(self._added.values()), list(self._dirty.values()),
+                              self._deleted)
+            self._added = {}
+            self._dirty = {}
+            self._deleted = []
+        return changes
+
+    def restore(self, changes: 'Changes') -> None:
+        """写入失败时把尚未写入的变更放回"""
+        with self._lock:
+            for record in changes.added:
+                self._added.setdefault(id(record), record)
+            for record in changes.dirty:
+                if id(record) not in self._added:
+                    self._dirty.setdefault(id(record), record)
+            self._deleted = changes.deleted + self._deleted
+
+    def begin(self) -> None:
+        """开始批量修改，记录当前待写入的变更作为回滚点"""
+        with self._lock:
+            self._batch = _BatchLog(dict(self._added), dict(self._dirty), list(self._deleted))
+
+    def commit(self, result: 'BatchResult') -> None:
+        """结束批量修改，把期间新增、修改和删除的记录数填入 ``result``"""
+        with self._lock:
+            batch, self._batch = self._batch, None
+        result.added = len(batch.added)
+        result.updated = len(batch.dirty)
+        result.deleted = batch.deleted
+
+    def rollback(self) -> None:
+        """撤销批量修改期间的全部字段修改和登记的变更"""
+        with self._lock:
+            batch, self._batch = self._batch, None
+            self._added, self._dirty, self._deleted = batch.checkpoint
+        # 直接写回字段，不触发修改跟踪
+        for record, values, version in batch.undo.values():
+            for name, value in values.items():
+                record.set_untracked(name, value)
+            record._version = version
+        for record in batch.added.values():
+            record._tracker = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._added) + len(self._dirty) + len(self._deleted)
+
+
+class _BatchLog:
+    """批量修改期间的回滚点和统计"""
+
+    def __init__(self, added: Dict[int, Any], dirty: Dict[int, Any], deleted: List[Any]):
+        self.checkpoint = (added, dirty, deleted)
+        # id(记录) -> (记录, 修改前的字段值, 修改前的版本号)
+        self.undo: Dict[int, Tuple[Any, Dict[str, Any], int]] = {}
+        self.added: Dict[int, Any] = {}
+        self.dirty: set = set()
+        self.deleted = 0
+
+
+class BatchResult:
+    """一次批量修改的结果"""
+
+    def __init__(self, added: int = 0, updated: int = 0, deleted: int = 0):
+        self.added = added
+        self.updated = updated
+        self.deleted = deleted
+        # 提交后的保存结果；启用后台保存时表示已登记保存请求
+        self.saved = False
+
+    @property
+    def changed(self) -> int:
+        """被新增、修改或删除的记录总数"""
+        return self.added + self.updated + self.deleted
+
+    def __repr__(self) -> str:
+        return (f"BatchResult(added={self.added}, updated={self.updated}, "
+                f"deleted={self.deleted}, saved={self.saved})")
+
+
+class Changes:
+    """一次取出的变更：新增记录、修改记录和被删除的记录键"""
+
+    def __init__(self, added: List[Any], dirty: List[Any], deleted: List[Any]):
+        self.added = added
+        self.dirty = dirty
+        self.deleted = deleted
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.dirty) + len(self.deleted)
+
+
+def write_bytes_atomic(path: Path, payload: bytes) -> None:
+    """
+    原子写入文件
+
+    先写同目录下的临时文件并fsync，再用 ``os.replace`` 替换目标文件，
+    写入中途崩溃时原文件保持完整。
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp_file, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+    except BaseException:
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path: Path, data: Any, indent: Optional[int] = None) -> None:
+    """原子写入JSON文件"""
+    write_bytes_atomic(path, json.dumps(data, ensure_ascii=False, indent=indent).encode('utf-8'))
+
+
+class TableSchema:
+    """SQLite表结构：列名、列类型、需要建立索引的列以及取值唯一的列（同样建立索引）"""
+
+    def __init__(self, table: str, columns: List[Tuple[str, str]], indexes: List[str],
+                 unique: Tuple[str, ...] = ()):
+        self.table = table
+        self.columns = columns
+        self.indexes = indexes
+        self.unique = unique
+        self.column_names = [name for name, _ in columns]
+        # BOOLEAN列在SQLite中存为整数，读取时需要转换回bool
+        self.bool_columns = {name for name, sql_type in columns if sql_type == 'BOOLEAN'}
+
+
+PROJECT_SCHEMA = TableSchema(
+    'projects',
+    [
+        ('title', 'TEXT'),
+        ('description', 'TEXT'),
+        ('priority', 'INTEGER'),
+        ('status', 'TEXT'),
+        ('progress', 'INTEGER'),
+        ('start_date', 'TEXT'),
+        ('updated_at', 'TEXT'),
+        ('due_date', 'TEXT'),
+        ('project_number', 'TEXT'),
+        ('project_name', 'TEXT'),
+        ('uid', 'TEXT'),
+        ('revision', 'INTEGER'),
+    ],
+    ['project_number', 'status', 'priority', 'due_date', 'start_date', 'project_name'],
+    # 按uid查找和修改单条记录，不扫描全表
+    unique=('uid',),
+)
+
+WEEKLY_SCHEMA = TableSchema(
+    'weekly_tasks',
+    [
+        ('title', 'TEXT'),
+        ('description', 'TEXT'),
+        ('priority', 'INTEGER'),
+        ('due_date', 'TEXT'),
+        ('start_date', 'TEXT'),
+        ('is_completed', 'BOOLEAN'),
+        ('project_name', 'TEXT'),
+        ('uid', 'TEXT'),
+        ('revision', 'INTEGER'),
+    ],
+    ['start_date', 'due_date', 'project_name', 'priority'],
+    unique=('uid',),
+)
+
+
+class Storage:
+    """
+    存储后端基类
+
+    后端只处理记录字典，每条记录由后端分配的记录键标识。
+    ``incremental`` 为False的后端只支持整体重写（``save_all``）；
+    ``supports_queries`` 为True的后端可以直接执行 ``query``，管理器无需加载全部记录。
+    ``transactional`` 为True的后端在 ``transaction()`` 内的写入要么全部生效，要么全部撤销。
+    ``supports_fetch`` 为True的后端可以用 ``fetch`` 按记录键单独读回记录，
+    管理器因此可以只在内存中保留记录的摘要（延迟加载模式）。
+    """
+
+    incremental = False
+    supports_queries = False
+    transactional = False
+    supports_fetch = False
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """把块内的多次写入合并为一个事务；不支持事务的后端逐条生效"""
+        yield
+
+    def exists(self) -> bool:
+        """数据是否已存在"""
+        raise NotImplementedError
+
+    def load(self) -> List[Tuple[Any, Dict[str, Any]]]:
+        """读取全部记录，返回 (记录键, 记录数据) 列表"""
+        return list(self.iter_load())
+
+    def iter_load(self, stats: Optional[LoadStats] = None) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        """
+        逐条读取记录，产出 (记录键, 记录数据)
+
+        损坏的记录被跳过，并通过 ``stats`` 写入隔离文件。
+        """
+        raise NotImplementedError
+
+    def save_all(self, records: List[Dict[str, Any]]) -> List[Any]:
+        """用给定记录整体替换已有数据，返回新的记录键"""
+        raise NotImplementedError
+
+    def insert(self, record: Dict[str, Any]) -> Any:
+        """新增一条记录，返回记录键"""
+        raise NotImplementedError
+
+    def update(self, key: Any, record: Dict[str, Any]) -> None:
+        """修改一条记录"""
+        raise NotImplementedError
+
+    def delete(self, keys: List[Any]) -> None:
+        """删除多条记录"""
+        raise NotImplementedError
+
+    def update_many(self, items: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        """修改多条记录，后端可以合并为一次写入"""
+        for key, record in items:
+            self.update(key, record)
+
+    def query(self, equals: Optional[Dict[str, Any]] = None,
+              between: Optional[Tuple[str, str, str]] = None) -> List[Tuple[Any, Dict[str, Any]]]:
+        """
+        按条件查询记录
+
+        Args:
+            equals: 字段等值条件
+            between: (字段, 下限, 上限) 闭区间条件
+        """
+        raise NotImplementedError
+
+    def enable_fetch(self) -> None:
+        """在下次加载前调用，使后端记住每条记录的位置以支持 ``fetch``"""
+
+    def fetch(self, key: Any) -> Optional[Dict[str, Any]]:
+        """
+        按记录键读回一条记录
+
+        只保证返回最近一次加载或整体重写时的内容；之后被修改的记录由管理器持有。
+        """
+        raise NotImplementedError
+
+    def maybe_compact(self, records_fn: Callable[[], List[Dict[str, Any]]]) -> Optional[List[Any]]:
+        """写入后的维护工作；如果记录被重新编号则返回新的记录键"""
+        return None
+
+    def compact(self, records: List[Dict[str, Any]], wait: bool = False) -> Optional[List[Any]]:
+        """把数据整理为紧凑形式，默认即整体重写"""
+        return self.save_all(records)
+
+    def source_files(self) -> List[Path]:
+        """决定记录内容的文件，用于判断数据是否被改动；无法判断时为空"""
+        return []
+
+    def share(self) -> None:
+        """数据文件由多个进程共享：写入后的整理须在调用方持有文件锁期间完成"""
+
+    def close(self) -> None:
+        """释放后端占用的资源"""
+
+
+class JsonStorage(Storage):
+    """JSON文件后端（原有格式），每次保存整体重写文件"""
+
+    supports_fetch = True
+
+    def __init__(self, data_file: Path):
+        self.data_file = Path(data_file)
+        self._locator: Optional[RecordLocator] = None
+        self._read_fp = None
+
+    def exists(self) -> bool:
+        return self.data_file.exists()
+
+    def source_files(self) -> List[Path]:
+        return [self.data_file]
+
+    def enable_fetch(self) -> None:
+        if self._locator is None:
+            self._locator = RecordLocator()
+
+    def iter_load(self, stats: Optional[LoadStats] = None) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        self._close_reader()
+        locator = self._locator
+        if locator is None:
+            yield from iter_json_array(self.data_file, stats)
+            return
+        locator.clear()
+        for key, record, offset, length in iter_json_array_spans(self.data_file, stats):
+            locator.set(key, offset, length)
+            yield key, record
+
+    def save_all(self, records: List[Dict[str, Any]]) -> List[Any]:
+        payload, spans = encode_json_array(records)
+        self._close_reader()
+        write_bytes_atomic(self.data_file, payload)
+        if self._locator is not None:
+            self._locator.reset(spans)
+        return list(range(len(records)))
+
+    def fetch(self, key: Any) -> Optional[Dict[str, Any]]:
+        if self._locator is None:
+            raise RuntimeError("需要在加载前调用 enable_fetch()")
+        if self._read_fp is None:
+            if not self.data_file.exists():
+                return None
+            self._read_fp = open(self.data_file, 'rb')
+        return self._locator.read(self._read_fp, key)
+
+    def _close_reader(self) -> None:
+        if self._read_fp is not None:
+            self._read_fp.close()
+            self._read_fp = None
+
+    def close(self) -> None:
+        self._close_reader()
+
+
+class SnapshotStorage(Storage):
+    """
+    二进制快照后端（见 :mod:`snapshot`），与JSON后端一样每次保存整体重写文件
+
+    加载后保留已读入的快照内容，``fetch`` 直接从中解码单条记录。
+    """
+
+    supports_fetch = True
+
+    def __init__(self, data_file: Path):
+        self.data_file = Path(data_file)
+        self._reader: Optional[SnapshotReader] = None
+        self._keep_reader = False
+
+    def exists(self) -> bool:
+        return self.data_file.exists()
+
+    def source_files(self) -> List[Path]:
+        return [self.data_file]
+
+    def enable_fetch(self) -> None:
+        self._keep_reader = True
+
+    def iter_load(self, stats: Optional[LoadStats] = None) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        self._reader = None
+        if not self.data_file.exists():
+            return
+        payload = self.data_file.read_bytes()
+        if stats is not None:
+            stats.bytes_read += len(payload)
+        try:
+            reader = SnapshotReader(payload)
+        except SnapshotError as e:
+            preserve_corrupt(self.data_file, stats, str(e))
+            return
+        if self._keep_reader:
+            self._reader = reader
+        yield from enumerate(reader.records())
+
+    def save_all(self, records: List[Dict[str, Any]]) -> List[Any]:
+        payload = encode_snapshot(records)
+        write_bytes_atomic(self.data_file, payload)
+        if self._keep_reader:
+            self._reader = SnapshotReader(payload)
+        return list(range(len(records)))
+
+    def fetch(self, key: Any) -> Optional[Dict[str, Any]]:
+        if not self._keep_reader:
+            raise RuntimeError("需要在加载前调用 enable_fetch()")
+        if self._reader is None or not isinstance(key, int) or not 0 <= key < len(self._reader):
+            return None
+        return self._reader.record(key)
+
+    def close(self) -> None:
+        self._reader = None
+
+
+class JournalStorage(Storage):
+    """JSON快照 + 追加写变更日志后端"""
+
+    incremental = True
+
+    def transaction(self):
+        """一次保存的全部日志操作在结束时一起fsync"""
+        return self.journal.deferred_sync()
+
+    def __init__(self, data_file: Path, compact_threshold: int = DEFAULT_COMPACT_THRESHOLD):
+        self.journal = ChangeJournal(Path(data_file), compact_threshold)
+
+    def exists(self) -> bool:
+        return self.journal.snapshot_file.exists() or self.journal.journal_file.exists()
+
+    def source_files(self) -> List[Path]:
+        return [self.journal.snapshot_file, self.journal.journal_file]
+
+    def share(self) -> None:
+        # 后台压缩会在释放文件锁之后才写入快照
+        self.journal.background = False
+
+    supports_fetch = True
+
+    def enable_fetch(self) -> None:
+        self.journal.track_spans = True
+
+    def iter_load(self, stats: Optional[LoadStats] = None) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        return self.journal.iter_load(stats)
+
+    def fetch(self, key: Any) -> Optional[Dict[str, Any]]:
+        return self.journal.read_record(key)
+
+    def save_all(self, records: List[Dict[str, Any]]) -> List[Any]:
+        if not self.journal.compact(records, wait=True):
+            raise IOError(f"写入快照失败: {self.journal.snapshot_file}")
+        return list(range(len(records)))
+
+    def insert(self, record: Dict[str, Any]) -> Any:
+        return self.journal.log_add(record)
+
+    def update(self, key: Any, record: Dict[str, Any]) -> None:
+        self.journal.log_update(key, record)
+
+    def delete(self, keys: List[Any]) -> None:
+        self.journal.log_delete(keys)
+
+    def maybe_compact(self, records_fn: Callable[[], List[Dict[str, Any]]]) -> Optional[List[Any]]:
+        """日志超过阈值时在后台合并"""
+        if not self.journal.needs_compaction():
+            return None
+        records = records_fn()
+        if self.journal.compact(records):
+            return list(range(len(records)))
+        return None
+
+    def compact(self, records: List[Dict[str, Any]], wait: bool = False) -> Optional[List[Any]]:
+        """立即合并日志，成功时返回新的记录键"""
+        if self.journal.compact(records, wait=wait):
+            return list(range(len(records)))
+        return None
+
+    def close(self) -> None:
+        self.journal.close()
+
+
+class SqliteStorage(Storage):
+    """
+    SQLite后端
+
+    每个字段一列，常用筛选字段建立索引，单条修改只更新一行，
+    筛选和按日期范围查询直接在SQL中完成。
+    """
+
+    incremental = True
+    supports_queries = True
+    transactional = True
+    supports_fetch = True
+
+    def __init__(self, db_file: Path, schema: TableSchema):
+        self.db_file = Path(db_file)
+        self.schema = schema
+        self._conn: Optional[sqlite3.Connection] = None
+        self._in_transaction = False
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_file.parent.mkdir(parents=True, exist_ok=True)
+            # 后台保存线程也会使用连接，调用方（管理器）负责串行化访问
+            self._conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+            self._create_schema()
+        return self._conn
+
+    def _create_schema(self) -> None:
+        table = self.schema.table
+        columns = ", ".join(f"{name} {sql_type}" for name, sql_type in self.schema.columns)
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, {columns})")
+            # 旧版本创建的表缺少后来增加的列
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            for name, sql_type in self.schema.columns:
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+            for column in self.schema.indexes:
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+        # 旧数据的uid可能为空（加载时才推导），SQLite的唯一索引允许多个NULL
+        for column in self.schema.unique:
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        f"CREATE UNIQUE INDEX IF NOT EXISTS uidx_{table}_{column} ON {table} ({column})")
+            except sqlite3.IntegrityError:
+                # 已有重复的取值（手工编辑过的数据库），退回普通索引，查找同样不扫描全表
+                logger.warning(f"{table}.{column} 存在重复值，改建普通索引")
+                with self._conn:
+                    self._conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+
+    def exists(self) -> bool:
+        return self.db_file.exists()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        if self._in_transaction:
+            yield
+            return
+        self._in_transaction = True
+        try:
+            with self.conn:
+                yield
+        finally:
+            self._in_transaction = False
+
+    def _writing(self):
+        """单条写入自成事务；在 ``transaction()`` 内则并入外层事务"""
+        return nullcontext() if self._in_transaction else self.conn
+
+    def _row_to_record(self, row: Tuple) -> Tuple[Any, Dict[str, Any]]:
+        record = dict(zip(self.schema.column_names, row[1:]))
+        for name in self.schema.bool_columns:
+            if record[name] is not None:
+                record[name] = bool(record[name])
+        return row[0], record
+
+    def _values(self, record: Dict[str, Any]) -> List[Any]:
+        return [record.get(name) for name in self.schema.column_names]
+
+    def _select(self) -> str:
+        return f"SELECT id, {', '.join(self.schema.column_names)} FROM {self.schema.table}"
+
+    def iter_load(self, stats: Optional[LoadStats] = None) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        # 按主键分页读取，不在连接上保持打开的游标
+        last_id = -1
+        while True:
+            rows = self.conn.execute(self._select() + " WHERE id > ? ORDER BY id LIMIT ?",
+                                     (last_id, SQLITE_PAGE_SIZE)).fetchall()
+            for row in rows:
+                yield self._row_to_record(row)
+            if len(rows) < SQLITE_PAGE_SIZE:
+                return
+            last_id = rows[-1][0]
+
+    def save_all(self, records: List[Dict[str, Any]]) -> List[Any]:
+        insert_sql = self._insert_sql()
+        keys = []
+        with self._writing():
+            self.conn.execute(f"DELETE FROM {self.schema.table}")
+            for record in records:
+                keys.append(self.conn.execute(insert_sql, self._values(record)).lastrowid)
+        return keys
+
+    def _insert_sql(self) -> str:
+        names = self.schema.column_names
+        return (f"INSERT INTO {self.schema.table} ({', '.join(names)}) "
+                f"VALUES ({', '.join('?' for _ in names)})")
+
+    def insert(self, record: Dict[str, Any]) -> Any:
+        with self._writing():
+            return self.conn.execute(self._insert_sql(), self._values(record)).lastrowid
+
+    def update(self, key: Any, record: Dict[str, Any]) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in self.schema.column_names)
+        with self._writing():
+            self.conn.execute(f"UPDATE {self.schema.table} SET {assignments} WHERE id = ?",
+                              self._values(record) + [key])
+
+    def delete(self, keys: List[Any]) -> None:
+        with self._writing():
+            self.conn.executemany(f"DELETE FROM {self.schema.table} WHERE id = ?",
+                                  [(key,) for key in keys])
+
+    def update_many(self, items: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in self.schema.column_names)
+        with self._writing():
+            self.conn.executemany(f"UPDATE {self.schema.table} SET {assignments} WHERE id = ?",
+                                  [self._values(record) + [key] for key, record in items])
+
+    def query(self, equals: Optional[Dict[str, Any]] = None,
+              between: Optional[Tuple[str, str, str]] = None) -> List[Tuple[Any, Dict[str, Any]]]:
+        clauses = []
+        params: List[Any] = []
+        for name, value in (equals or {}).items():
+            self._check_column(name)
+            if value is None:
+                clauses.append(f"{name} IS NULL")
+            else:
+                clauses.append(f"{name} = ?")
+                params.append(value)
+        if between is not None:
+            name, low, high = between
+            self._check_column(name)
+            clauses.append(f"{name} BETWEEN ? AND ?")
+            params.extend([low, high])
+
+        sql = self._select()
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        rows = self.conn.execute(sql + " ORDER BY id", params).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def fetch(self, key: Any) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(self._select() + " WHERE id = ?", (key,)).fetchone()
+        return self._row_to_record(row)[1] if row is not None else None
+
+    def _check_column(self, name: str) -> None:
+        """列名会拼接进SQL，只允许表结构中的列"""
+        if name not in self.schema.column_names:
+            raise ValueError(f"未知字段: {name}")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class SegmentedStorage(Storage):
+    """
+    分段键值存储
+
+    数据保存在一个目录中，记录按记录键每 ``segment_size`` 条分为一段，
+    每段一个JSON文件（``{记录键: 记录}``）。修改只重写涉及的分段，
+    保存代价与修改量成正比，而不是与总记录数成正比。
+    """
+
+    incremental = True
+    supports_fetch = True
+
+    def __init__(self, directory: Path, segment_size: int = DEFAULT_SEGMENT_SIZE):
+        self.directory = Path(directory)
+        self.manifest_file = self.directory / "manifest.json"
+        self.segment_size = segment_size
+        self.next_key = 0
+
+    def exists(self) -> bool:
+        return self.manifest_file.exists()
+
+    def _segment_file(self, segment: int) -> Path:
+        return self.directory / f"seg-{segment:06d}.json"
+
+    def _read_segment(self, segment: int) -> Dict[int, Dict[str, Any]]:
+        path = self._segment_file(segment)
+        if not path.exists():
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return {int(key): record for key, record in json.load(f).items()}
+
+    def _write_segment(self, segment: int, records: Dict[int, Dict[str, Any]]) -> None:
+        path = self._segment_file(segment)
+        if records:
+            write_json_atomic(path, {str(key): records[key] for key in sorted(records)})
+        elif path.exists():
+            path.unlink()
+
+    def _ensure_directory(self) -> None:
+        if not self.manifest_file.exists():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            write_json_atomic(self.manifest_file, {'format': 1, 'segment_size': self.segment_size})
+
+    def iter_load(self, stats: Optional[LoadStats] = None) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        if not self.manifest_file.exists():
+            return
+        with open(self.manifest_file, 'r', encoding='utf-8') as f:
+            # 分段大小以目录创建时为准
+            self.segment_size = json.load(f).get('segment_size', self.segment_size)
+
+        self.next_key = 0
+        for path in sorted(self.directory.glob("seg-*.json")):
+            segment = int(path.stem.split('-')[1])
+            try:
+                records = self._read_segment(segment)
+            except (ValueError, AttributeError) as e:
+                # 损坏分段的记录键不再分配给新记录
+                preserve_corrupt(path, stats, f"分段文件损坏: {e}")
+                self.next_key = max(self.next_key, (segment + 1) * self.segment_size)
+                continue
+            for key, record in sorted(records.items()):
+                self.next_key = max(self.next_key, key + 1)
+                if isinstance(record, dict):
+                    yield key, record
+                elif stats is not None:
+                    stats.reject(key, f"记录不是对象: {type(record).__name__}", record=record)
+
+    def fetch(self, key: Any) -> Optional[Dict[str, Any]]:
+        return self._read_segment(key // self.segment_size).get(key)
+
+    def _group(self, keys: List[int]) -> Dict[int, List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for key in keys:
+            groups.setdefault(key // self.segment_size, []).append(key)
+        return groups
+
+    def save_all(self, records: List[Dict[str, Any]]) -> List[Any]:
+        self._ensure_directory()
+        for path in self.directory.glob("seg-*.json"):
+            path.unlink()
+        keys = list(range(len(records)))
+        for segment, segment_keys in self._group(keys).items():
+            self._write_segment(segment, {key: records[key] for key in segment_keys})
+        self.next_key = len(records)
+        return keys
+
+    def insert(self, record: Dict[str, Any]) -> Any:
+        self._ensure_directory()
+        key = self.next_key
+        self.next_key += 1
+        self.update_many([(key, record)])
+        return key
+
+    def update(self, key: Any, record: Dict[str, Any]) -> None:
+        self.update_many([(key, record)])
+
+    def update_many(self, items: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        self._ensure_directory()
+        changes = dict(items)
+        for segment, keys in self._group(list(changes)).items():
+            records = self._read_segment(segment)
+            for key in keys:
+                records[key] = changes[key]
+            self._write_segment(segment, records)
+
+    def delete(self, keys: List[Any]) -> None:
+        for segment, segment_keys in self._group(list(keys)).items():
+            records = self._read_segment(segment)
+            for key in segment_keys:
+                records.pop(key, None)
+            self._write_segment(segment, records)
+
+
+def create_storage(data_file: Path, schema: TableSchema, journal: bool = False,
+                   compact_threshold: int = DEFAULT_COMPACT_THRESHOLD) -> Storage:
+    """根据数据文件扩展名和选项创建存储后端"""
+    data_file = Path(data_file)
+    if data_file.suffix.lower() in SQLITE_SUFFIXES:
+        return SqliteStorage(data_file, schema)
+    if data_file.suffix.lower() == SEGMENTED_SUFFIX:
+        return SegmentedStorage(data_file)
+    if data_file.suffix.lower() == SNAPSHOT_SUFFIX:
+        return SnapshotStorage(data_file)
+    if journal:
+        return JournalStorage(data_file, compact_threshold)
+    return JsonStorage(data_file)
+
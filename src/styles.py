@@ -163,6 +163,9 @@ def setup_styles() -> ttk.Style:
     style.configure('Small.TLabel', 
                    font=FONT_CONFIG['SMALL'], 
                    foreground=COLOR_SCHEME['MEDIUM_TEXT'])
+    style.configure('Error.Small.TLabel', 
+                   font=FONT_CONFIG['SMALL'], 
+                   foreground=COLOR_SCHEME['DANGER'])
     style.configure('Mono.TLabel',
                    font=FONT_CONFIG['MONOSPACE'],
                    foreground=COLOR_SCHEME['DARK_TEXT'])
@@ -1,8 +1,13 @@
-from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict, field
+from typing import Optional, Dict, Any, List, NamedTuple, Tuple
+from datetime import date, datetime, timedelta
+from dataclasses import dataclass, field, fields
 from enum import Enum
+from functools import lru_cache
 import calendar
+import sys
+import uuid
+
+from codec import make_decoder, make_encoder
 
 class TaskStatus(Enum):
     PENDING = "待开始"
@@ -17,8 +22,126 @@ class Priority(Enum):
     URGENT = 4
     CRITICAL = 5
 
-@dataclass
-class WeeklyTask:
+def new_uid() -> str:
+    """生成记录的内部ID"""
+    return uuid.uuid4().hex
+
+
+@lru_cache(maxsize=4096)
+def date_ordinal(value: Optional[str]) -> int:
+    """
+    日期字符串 'YYYY-MM-DD' 的日期序数（date.toordinal），无值或无法解析时为0
+
+    日期的取值很少，相同的字符串只解析一次；比较、计算间隔都直接用整数。
+    """
+    if not value or not isinstance(value, str):
+        return 0
+    try:
+        if len(value) == 10 and value[4] == '-' and value[7] == '-':
+            return date.fromisoformat(value).toordinal()
+        # 与 strptime 一样接受不补零的月、日
+        return datetime.strptime(value, "%Y-%m-%d").toordinal()
+    except ValueError:
+        return 0
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+def today_ordinal() -> int:
+    """今天的日期序数"""
+    return date.today().toordinal()
+
+
+def iso_week(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """日期字符串 'YYYY-MM-DD' 所在的ISO周 (年, 周)，无值或无法解析时为None"""
+    ordinal = date_ordinal(value[:10]) if isinstance(value, str) else 0
+    if not ordinal:
+        return None
+    year, week, _ = date.fromordinal(ordinal).isocalendar()
+    return year, week
+
+
+class TrackedRecord:
+    """
+    带修改跟踪的记录基类
+
+    每次给数据字段赋值时递增版本号，并通知所属的变更跟踪器（由管理器挂载），
+    使保存时只需写入真正被修改过的记录。
+
+    子类是 ``slots=True`` 的dataclass，实例没有 ``__dict__``：跟踪状态也存放在下面的
+    槽中。取值很少的字符串字段（状态、项目名称、日期等）赋值时驻留为共享的字符串，
+    大量记录只各自保存一个指针。
+    """
+
+    __slots__ = ('_tracker', '_version', '_storage_key', '_dates')
+
+    # 需要跟踪的字段名，由子类定义后设置
+    _tracked_fields = frozenset()
+    # 赋值时驻留（sys.intern）的字符串字段
+    _interned_fields = frozenset()
+
+    def __new__(cls, *args: Any, **kwargs: Any) -> 'TrackedRecord':
+        record = object.__new__(cls)
+        object.__setattr__(record, '_tracker', None)
+        object.__setattr__(record, '_version', 0)
+        # 记录在存储中的键，尚未写入时为None
+        object.__setattr__(record, '_storage_key', None)
+        object.__setattr__(record, '_dates', None)
+        return record
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name not in self._tracked_fields:
+            object.__setattr__(self, name, value)
+            return
+        if type(value) is str and name in self._interned_fields:
+            value = sys.intern(value)
+        tracker = self._tracker
+        if tracker is None:
+            object.__setattr__(self, name, value)
+            object.__setattr__(self, '_version', self._version + 1)
+            return
+        # 先检查索引的唯一约束；批量修改期间保存修改前的值，以便出错时撤销
+        tracker.before_change(self, name, value)
+        old = getattr(self, name)
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, '_version', self._version + 1)
+        tracker.changed(self, name, old)
+
+    def set_untracked(self, name: str, value: Any) -> None:
+        """直接给字段赋值：不通知变更跟踪器，也不改变版本号（如写入后更新记录版本）"""
+        if name in self._interned_fields:
+            value = _intern(value)
+        object.__setattr__(self, name, value)
+
+    @property
+    def version(self) -> int:
+        """记录的修改版本号"""
+        return self._version
+
+    def ordinal(self, name: str) -> int:
+        """
+        日期字段的日期序数，无值或无法解析时为0
+
+        字段仍以 'YYYY-MM-DD' 字符串保存和序列化；解析结果与字符串一起缓存在记录上，
+        字段被赋值（包括 ``set_untracked``）后下次读取时重新解析。
+        """
+        value = getattr(self, name)
+        dates = self._dates
+        if dates is None:
+            dates = {}
+            object.__setattr__(self, '_dates', dates)
+        cached = dates.get(name)
+        if cached is not None and cached[0] is value:
+            return cached[1]
+        ordinal = date_ordinal(value)
+        dates[name] = (value, ordinal)
+        return ordinal
+
+
+@dataclass(slots=True)
+class WeeklyTask(TrackedRecord):
     """每周待办事项类，专门处理每周重复任务"""
     
     title: str = ""
@@ -29,9 +152,15 @@ class WeeklyTask:
     due_date: Optional[str] = None
     start_date: Optional[str] = None  # 新增：开始日期
     week_number: Optional[int] = None
+    # 内部ID，保存在数据文件中，进程之间据此对应同一条记录
+    uid: Optional[str] = None
+    # 每次写入递增的记录版本，用于发现与其他进程的冲突修改
+    revision: int = 0
     
     def __post_init__(self):
         """初始化后处理"""
+        if not self.uid:
+            self.uid = new_uid()
         if not self.week_number:
             self.week_number = self._get_current_week_number()
         if not self.start_date:
@@ -48,28 +177,29 @@ class WeeklyTask:
     
     def get_weeks_since_start(self) -> int:
         """获取从开始到现在的周数"""
-        if not self.start_date:
-            return 0
-        
-        try:
-            start_date_obj = datetime.strptime(self.start_date, "%Y-%m-%d")
-            current_date = datetime.now()
-            weeks = (current_date - start_date_obj).days // 7
-            return max(weeks, 0)
-        except ValueError:
+        start = self.ordinal('start_date')
+        if not start:
             return 0
+        return max((today_ordinal() - start) // 7, 0)
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
-        return asdict(self)
+        return _encode_weekly_task(self)
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'WeeklyTask':
-        """从字典创建WeeklyTask实例"""
-        return cls(**data)
+        """从字典创建WeeklyTask实例（忽略未知字段，兼容旧字段名）"""
+        return _decode_weekly_task(data)
+
+WeeklyTask._tracked_fields = frozenset(f.name for f in fields(WeeklyTask))
+WeeklyTask._interned_fields = frozenset(('project_name', 'due_date', 'start_date'))
+_encode_weekly_task = make_encoder(WeeklyTask)
+# 早期版本保存的字段名
+_decode_weekly_task = make_decoder(WeeklyTask, aliases={'completed': 'is_completed', 'project': 'project_name'})
 
-@dataclass
-class Task:
+
+@dataclass(slots=True)
+class Task(TrackedRecord):
     """任务类，表示单个项目任务"""
     
     title: str
@@ -82,16 +212,21 @@ class Task:
     due_date: Optional[str] = None
     project_number: Optional[str] = None
     project_name: Optional[str] = None
+    # 内部ID，保存在数据文件中，进程之间据此对应同一条记录
+    uid: Optional[str] = None
+    # 每次写入递增的记录版本，用于发现与其他进程的冲突修改
+    revision: int = 0
     # is_weekly: bool = False
     # weekly_task: Optional[WeeklyTask] = None
     
     def __post_init__(self):
         """初始化后处理"""
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if not self.uid:
+            self.uid = new_uid()
         if not self.start_date:
             self.start_date = datetime.now().strftime("%Y-%m-%d")
         if not self.updated_at:
-            self.updated_at = current_time
+            self.updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # # 如果是每周任务，初始化WeeklyTask
         # if self.is_weekly and self.weekly_task is None:
@@ -125,31 +260,61 @@ class Task:
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
-        data = asdict(self)
-        # 移除weekly_task对象，只保存其数据
-        if 'weekly_task' in data and data['weekly_task']:
-            data['weekly_task'] = asdict(data['weekly_task'])
-        return data
+        return _encode_task(self)
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Task':
-        """从字典创建任务实例"""
-        # 处理weekly_task数据
-        weekly_task_data = data.pop('weekly_task', None)
-        task = cls(**data)
-        
-        if weekly_task_data and task.is_weekly:
-            task.weekly_task = WeeklyTask(**weekly_task_data)
-        
-        return task
+        """从字典创建任务实例（忽略未知字段，如旧数据中的 is_weekly、weekly_task）"""
+        return _decode_task(data)
     
     def is_overdue(self) -> bool:
         """检查任务是否逾期"""
-        if not self.due_date:
-            return False
-        
-        try:
-            due_date = datetime.strptime(self.due_date, "%Y-%m-%d")
-            return datetime.now() > due_date and self.status != TaskStatus.COMPLETED.value
-        except ValueError:
-            return False
\ No newline at end of file
+        due = self.ordinal('due_date')
+        # 截止日当天零点之后即算逾期
+        return bool(due) and today_ordinal() >= due and self.status != TaskStatus.COMPLETED.value
+
+Task._tracked_fields = frozenset(f.name for f in fields(Task))
+Task._interned_fields = frozenset(('status', 'start_date', 'due_date', 'project_number', 'project_name'))
+_encode_task = make_encoder(Task)
+_decode_task = make_decoder(Task)
+
+
+class TaskRow(NamedTuple):
+    """
+    项目的紧凑摘要（延迟加载模式）
+
+    只包含列表显示和筛选用到的字段，不含描述。行是不可变的元组，
+    需要编辑时由管理器按记录键从存储读回完整记录并构建Task。
+    """
+
+    key: Any
+    title: str
+    priority: int
+    status: str
+    progress: int
+    start_date: Optional[str]
+    updated_at: Optional[str]
+    due_date: Optional[str]
+    project_number: Optional[str]
+    project_name: Optional[str]
+    uid: str
+    revision: int
+
+    @classmethod
+    def from_dict(cls, key: Any, data: Dict[str, Any]) -> 'TaskRow':
+        """从记录字典创建摘要，与Task.from_dict一样忽略未知字段、拒绝缺少标题的记录"""
+        return cls(
+            key,
+            data['title'],
+            data.get('priority', Priority.LOW.value),
+            _intern(data.get('status', TaskStatus.PENDING.value)),
+            data.get('progress', 0),
+            # 与Task.__post_init__一致
+            _intern(data.get('start_date') or datetime.now().strftime("%Y-%m-%d")),
+            data.get('updated_at') or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            _intern(data.get('due_date')),
+            _intern(data.get('project_number')),
+            _intern(data.get('project_name')),
+            data.get('uid') or new_uid(),
+            data.get('revision', 0),
+        )
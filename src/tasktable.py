@@ -0,0 +1,299 @@
+from array import array
+from datetime import date
+from operator import and_, attrgetter, or_
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from task import TaskStatus, date_ordinal, today_ordinal
+
+try:
+    import numpy as np
+except ImportError:  # 没有NumPy时用标准库array逐个计算
+    np = None
+
+# 字段 -> 列类型：整数、布尔、日期（存为日期序数，无值为0）、分类（存为编码）
+FIELD_KINDS = {
+    'priority': 'int',
+    'progress': 'int',
+    'is_completed': 'bool',
+    'start_date': 'date',
+    'due_date': 'date',
+    'updated_at': 'date',
+    'status': 'category',
+    'project_name': 'category',
+    'project_number': 'category',
+}
+# 项目与每周待办事项导出的列
+PROJECT_FIELDS = ('priority', 'progress', 'status', 'start_date', 'due_date', 'updated_at', 'project_name')
+WEEKLY_FIELDS = ('priority', 'is_completed', 'start_date', 'due_date', 'project_name')
+
+# 分类列中 TaskStatus 的取值固定占用前几个编码
+_FIXED_LABELS = {'status': [status.value for status in TaskStatus]}
+# 由 start_date 计算出的列：ISO年 * 100 + ISO周，无开始日期为0
+WEEK_COLUMN = 'week'
+
+_AGGREGATES = ('count', 'sum', 'mean')
+
+
+class Mask:
+    """
+    行的布尔掩码
+
+    NumPy可用时包装布尔数组，否则包装 ``bytearray``（每行一个0/1字节）。
+    用 ``&``、``|``、``~`` 组合条件。
+    """
+
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        self.values = values
+
+    def __and__(self, other: 'Mask') -> 'Mask':
+        if np is not None and isinstance(self.values, np.ndarray):
+            return Mask(self.values & other.values)
+        return Mask(bytearray(map(and_, self.values, other.values)))
+
+    def __or__(self, other: 'Mask') -> 'Mask':
+        if np is not None and isinstance(self.values, np.ndarray):
+            return Mask(self.values | other.values)
+        return Mask(bytearray(map(or_, self.values, other.values)))
+
+    def __invert__(self) -> 'Mask':
+        if np is not None and isinstance(self.values, np.ndarray):
+            return Mask(~self.values)
+        return Mask(self.values.translate(_INVERT))
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def count(self) -> int:
+        """选中的行数"""
+        if np is not None and isinstance(self.values, np.ndarray):
+            return int(np.count_nonzero(self.values))
+        return self.values.count(1)
+
+    def rows(self) -> List[int]:
+        """选中的行号"""
+        if np is not None and isinstance(self.values, np.ndarray):
+            return np.flatnonzero(self.values).tolist()
+        return [row for row, selected in enumerate(self.values) if selected]
+
+
+_INVERT = bytes([1, 0] + [0] * 254)
+
+
+class TaskTable:
+    """
+    项目或每周待办事项的列式视图
+
+    按列读取属性（每列在第一次用到时生成），转换为定长的整数列：优先级、进度、完成标志、日期序数，
+    状态和项目名称等分类字段存为编码（``labels[name][编码]`` 是原值）。筛选条件得到
+    :class:`Mask`，分组统计整列计算，不再逐个访问记录对象。NumPy可用时使用其数组，
+    否则使用标准库 ``array`` 并在Python中计算，结果相同。
+
+    表是导出时的快照，记录被修改后需要重新导出。第 i 行对应 ``records[i]``。
+    """
+
+    def __init__(self, records: Iterable[Any], fields: Sequence[str] = PROJECT_FIELDS,
+                 use_numpy: Optional[bool] = None):
+        """
+        Args:
+            records: Task、TaskRow或WeeklyTask
+            fields: 导出的字段，见 ``FIELD_KINDS``；包含 start_date 时另有 ``week`` 列
+            use_numpy: 是否使用NumPy，默认在可用时使用
+        """
+        self.records = list(records)
+        self.numpy = np is not None if use_numpy is None else (use_numpy and np is not None)
+        # 列在第一次用到时才生成
+        self.columns: Dict[str, Any] = {}
+        self.kinds: Dict[str, str] = {}
+        self.labels: Dict[str, List[Any]] = {}
+        for name in fields:
+            kind = FIELD_KINDS.get(name)
+            if kind is None:
+                raise ValueError(f"不支持导出字段: {name}")
+            self.kinds[name] = kind
+        if 'start_date' in self.kinds:
+            self.kinds[WEEK_COLUMN] = 'week'
+
+    def column(self, name: str):
+        """字段的列（NumPy数组或array），第一次访问时从记录生成"""
+        column = self.columns.get(name)
+        if column is not None:
+            return column
+        kind = self.kinds[name]
+        source = 'start_date' if kind == 'week' else name
+        values = list(map(attrgetter(source), self.records))
+        if kind in ('date', 'week'):
+            ordinals = {value: date_ordinal(value[:10]) if isinstance(value, str) else 0
+                        for value in dict.fromkeys(values)}
+            if kind == 'week':
+                ordinals = {value: _week_key(ordinal) for value, ordinal in ordinals.items()}
+            column = self._column('i', map(ordinals.__getitem__, values))
+        elif kind == 'category':
+            labels = list(_FIXED_LABELS.get(name, ()))
+            codes = {label: code for code, label in enumerate(labels)}
+            for value in dict.fromkeys(values):
+                if value not in codes:
+                    codes[value] = len(labels)
+                    labels.append(value)
+            self.labels[name] = labels
+            column = self._column('i', map(codes.__getitem__, values))
+        elif kind == 'bool':
+            column = self._column('b', (1 if value else 0 for value in values))
+        else:
+            # 类型不对的值（手工编辑的数据）记为0，不影响其余行
+            column = self._column('q', (value if isinstance(value, int) else 0 for value in values))
+        self.columns[name] = column
+        return column
+
+    def _column(self, code: str, values: Iterable[int]):
+        column = array(code, values)
+        if self.numpy:
+            # 从array的缓冲区构造，不逐个转换
+            return np.frombuffer(column, dtype={'i': np.int32, 'b': np.int8, 'q': np.int64}[code]).copy()
+        return column
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _encode(self, name: str, value: Any) -> Optional[int]:
+        """把条件中的值转换为列中的取值，列中不可能出现时返回None"""
+        kind = self.kinds[name]
+        if kind == 'category':
+            try:
+                self.column(name)
+                return self.labels[name].index(value)
+            except ValueError:
+                return None
+        if kind == 'date':
+            if isinstance(value, date):
+                return value.toordinal()
+            return date_ordinal(value) or None
+        if kind == 'week':
+            year, week = value
+            return year * 100 + week
+        if kind == 'bool':
+            return 1 if value else 0
+        return value
+
+    def all(self) -> Mask:
+        """选中全部行的掩码"""
+        if self.numpy:
+            return Mask(np.ones(len(self.records), dtype=bool))
+        return Mask(bytearray([1]) * len(self.records))
+
+    def where(self, name: str, value: Any) -> Mask:
+        """字段等于 value 的行（日期为 'YYYY-MM-DD'，week 为 (年, 周)）"""
+        column = self.column(name)
+        target = self._encode(name, value)
+        if target is None:
+            return ~self.all()
+        if self.numpy:
+            return Mask(column == target)
+        return Mask(bytearray(value == target for value in column))
+
+    def isin(self, name: str, values: Iterable[Any]) -> Mask:
+        """字段取值在 values 中的行"""
+        column = self.column(name)
+        targets = {target for target in (self._encode(name, value) for value in values) if target is not None}
+        if self.numpy:
+            return Mask(np.isin(column, list(targets)))
+        return Mask(bytearray(value in targets for value in column))
+
+    def between(self, name: str, low: Any, high: Any) -> Mask:
+        """字段在 [low, high] 内的行；日期字段没有值的行不会选中"""
+        column = self.column(name)
+        start, end = self._encode(name, low), self._encode(name, high)
+        if start is None or end is None:
+            raise ValueError(f"{name} 的范围无效: {low} ~ {high}")
+        if self.numpy:
+            return Mask((column >= start) & (column <= end))
+        return Mask(bytearray(start <= value <= end for value in column))
+
+    def overdue(self, today: Optional[date] = None) -> Mask:
+        """与 ``Task.is_overdue`` 相同：有截止日期、当天或之后、且未完成的行"""
+        day = today.toordinal() if today is not None else today_ordinal()
+        mask = self.between('due_date', date.fromordinal(1), date.fromordinal(day))
+        if 'status' in self.kinds:
+            return mask & ~self.where('status', TaskStatus.COMPLETED.value)
+        if 'is_completed' in self.kinds:
+            return mask & ~self.where('is_completed', True)
+        return mask
+
+    def select(self, mask: Mask) -> List[Any]:
+        """掩码选中的记录"""
+        records = self.records
+        return [records[row] for row in mask.rows()]
+
+    def group_by(self, key: str, value: Optional[str] = None, how: str = 'count',
+                 mask: Optional[Mask] = None) -> Dict[Any, Any]:
+        """
+        按 key 分组统计
+
+        Args:
+            key: 分组字段；分类字段按原值分组，week 按 (年, 周)，日期按 'YYYY-MM-DD'
+            value: 被统计的数值字段（count 不需要）
+            how: count（行数）、sum（合计）或 mean（平均值）
+            mask: 只统计选中的行
+
+        Returns:
+            分组的取值 -> 统计值，按分组取值排序；没有行的分组不出现
+        """
+        if how not in _AGGREGATES:
+            raise ValueError(f"不支持的统计方式: {how}")
+        if how != 'count' and value is None:
+            raise ValueError(f"{how} 需要指定统计字段")
+        keys = self.column(key)
+        values = self.column(value) if value is not None else None
+        if self.numpy:
+            if mask is not None:
+                keys = keys[mask.values]
+                values = values[mask.values] if values is not None else None
+            groups, inverse = np.unique(keys, return_inverse=True)
+            counts = np.bincount(inverse, minlength=len(groups))
+            if how == 'count':
+                results = counts.tolist()
+            else:
+                sums = np.bincount(inverse, weights=values, minlength=len(groups))
+                results = (sums / counts).tolist() if how == 'mean' else sums.tolist()
+                if how == 'sum' and values.dtype.kind in 'iub':
+                    results = [int(result) for result in results]
+            return {self._label(key, group): result for group, result in zip(groups.tolist(), results)}
+
+        rows = mask.rows() if mask is not None else range(len(keys))
+        counts: Dict[int, int] = {}
+        sums: Dict[int, int] = {}
+        for row in rows:
+            group = keys[row]
+            counts[group] = counts.get(group, 0) + 1
+            if values is not None:
+                sums[group] = sums.get(group, 0) + values[row]
+        results = {}
+        for group in sorted(counts):
+            if how == 'count':
+                result = counts[group]
+            elif how == 'sum':
+                result = sums[group]
+            else:
+                result = sums[group] / counts[group]
+            results[self._label(key, group)] = result
+        return results
+
+    def _label(self, name: str, code: int) -> Any:
+        kind = self.kinds[name]
+        if kind == 'category':
+            return self.labels[name][code]
+        if kind == 'week':
+            return divmod(code, 100) if code else None
+        if kind == 'date':
+            return date.fromordinal(code).isoformat() if code else None
+        if kind == 'bool':
+            return bool(code)
+        return code
+
+
+def _week_key(ordinal: int) -> int:
+    if not ordinal:
+        return 0
+    year, week, _ = date.fromordinal(ordinal).isocalendar()
+    return year * 100 + week
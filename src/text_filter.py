@@ -0,0 +1,140 @@
+from operator import attrgetter
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+# 筛选时每检查这么多条记录查看一次是否已被新的筛选取代
+CHECK_INTERVAL = 2048
+
+
+class FilterCancelled(Exception):
+    """筛选被更新的请求取代，中途放弃"""
+
+
+def parse_terms(text: str) -> Tuple[str, ...]:
+    """关键字按空白切分为词（不区分大小写，去掉重复的词）"""
+    return tuple(dict.fromkeys(text.casefold().split()))
+
+
+def narrows(old: Sequence[str], new: Sequence[str]) -> bool:
+    """
+    新关键字的结果是否必然是旧关键字结果的子集
+
+    旧的每个词都是新的某个词的前缀时成立（继续输入或追加词），此时只需在上次的
+    结果中查找。
+    """
+    return all(any(term.startswith(prefix) for term in new) for prefix in old)
+
+
+class TextFilter:
+    """
+    自由文本筛选：每个词都须出现在记录的某个字段中（子串匹配，不区分大小写）
+
+    各记录拼接后的小写文本按uid缓存，记录被修改（版本号变化）或换成另一个对象
+    （如摘要换成完整项目）时重新生成；范围改变时只保留新范围内记录的缓存，
+    已删除或已被替换的记录不会一直被缓存引用。给出 ``search`` 时，全文索引中含有该词的
+    记录同样算匹配，用于覆盖记录对象中没有的字段（如延迟加载时项目摘要不含描述）。
+
+    待筛选的记录及其文本按 ``scope``（筛选条件和数据版本）保存，上一次的结果也是：
+    范围不变时不再取记录和拼接文本，关键字只是变长时在上次的结果中继续筛选，
+    输入越多查找越快。
+    """
+
+    def __init__(self, fields: Sequence[str],
+                 search: Optional[Callable[[str], Set[str]]] = None):
+        self.fields = tuple(fields)
+        self.search = search
+        self._getter = attrgetter(*self.fields)
+        # uid -> (记录对象, 版本号, 小写文本)
+        self._texts: Dict[str, Tuple[Any, int, str]] = {}
+        # (范围, 记录, 文本) 与 (范围, 词, 结果, 结果的文本)，均整体替换，
+        # 多个线程同时筛选时也总是一致的
+        self._base: Optional[Tuple[Hashable, Sequence[Any], List[str]]] = None
+        self._last: Optional[Tuple[Hashable, Tuple[str, ...], List[Any], List[str]]] = None
+
+    def text_of(self, record: Any) -> str:
+        """记录各字段拼接后的小写文本（有缓存；记录没有的字段视为空）"""
+        version = getattr(record, 'version', 0)
+        cached = self._texts.get(record.uid)
+        if cached is not None and cached[0] is record and cached[1] == version:
+            return cached[2]
+        try:
+            values = self._getter(record)
+        except AttributeError:
+            values = tuple(getattr(record, name, None) for name in self.fields)
+        if len(self.fields) == 1:
+            values = (values,)
+        text = "\n".join([str(value) for value in values if value]).casefold()
+        self._texts[record.uid] = (record, version, text)
+        return text
+
+    def apply(self, scope: Hashable, records: Callable[[], Sequence[Any]], text: str,
+              cancelled: Optional[Callable[[], bool]] = None) -> Sequence[Any]:
+        """
+        按关键字筛选记录（保持原有顺序）
+
+        Args:
+            scope: 记录范围的标识；相同范围的 ``records()`` 必须返回同样的记录
+            records: 返回待筛选记录的函数，范围内已有记录时不调用
+            text: 关键字，空白分隔的词须全部匹配；为空时返回全部记录
+            cancelled: 返回True时放弃筛选并抛出 :class:`FilterCancelled`
+
+        Returns:
+            匹配的记录
+        """
+        terms = parse_terms(text)
+        if not terms:
+            return records()
+        last = self._last
+        if last is not None and last[0] == scope and narrows(last[1], terms):
+            if last[1] == terms:
+                return last[2]
+            candidates, texts = last[2], last[3]
+        else:
+            candidates, texts = self._prepare(scope, records, cancelled)
+        positions: Sequence[int] = range(len(candidates))
+        for term in terms:
+            hit = self.search(term) if self.search is not None else None
+            positions = self._match(term, hit, candidates, texts, positions, cancelled)
+        result = [candidates[position] for position in positions]
+        self._last = (scope, terms, result, [texts[position] for position in positions])
+        return result
+
+    def _prepare(self, scope: Hashable, records: Callable[[], Sequence[Any]],
+                 cancelled: Optional[Callable[[], bool]]) -> Tuple[Sequence[Any], List[str]]:
+        """范围内的全部记录及其文本"""
+        base = self._base
+        if base is not None and base[0] == scope:
+            return base[1], base[2]
+        items = records()
+        text_of = self.text_of
+        texts: List[str] = []
+        for start in range(0, len(items), CHECK_INTERVAL):
+            if cancelled is not None and cancelled():
+                raise FilterCancelled()
+            texts.extend([text_of(record) for record in items[start:start + CHECK_INTERVAL]])
+        if len(self._texts) > len(items):
+            live = {record.uid for record in items}
+            self._texts = {uid: cached for uid, cached in self._texts.items() if uid in live}
+        self._base = (scope, items, texts)
+        return items, texts
+
+    @staticmethod
+    def _match(term: str, hit: Optional[Set[str]], candidates: Sequence[Any], texts: List[str],
+               positions: Sequence[int], cancelled: Optional[Callable[[], bool]]) -> List[int]:
+        """positions 中文本含有该词（或在全文索引的结果中）的位置"""
+        matched: List[int] = []
+        for start in range(0, len(positions), CHECK_INTERVAL):
+            if cancelled is not None and cancelled():
+                raise FilterCancelled()
+            chunk = positions[start:start + CHECK_INTERVAL]
+            if hit:
+                matched.extend([position for position in chunk
+                                if term in texts[position] or candidates[position].uid in hit])
+            else:
+                matched.extend([position for position in chunk if term in texts[position]])
+        return matched
+
+    def clear(self) -> None:
+        """丢弃缓存的文本和结果"""
+        self._texts.clear()
+        self._base = None
+        self._last = None
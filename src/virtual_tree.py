@@ -0,0 +1,381 @@
+from bisect import bisect_left
+from operator import attrgetter
+from tkinter import ttk
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 可见行上下各多渲染的行数：滚动几行以内时只移动视图，不重新插入行
+OVERSCAN = 10
+# 尚未显示、无法取得实际高度时使用的行高(像素)
+DEFAULT_ROW_HEIGHT = 20
+
+# 事件state中的Shift和Control位：按住时单击是追加选择，不清除窗口外的已选行
+_EXTEND_SELECTION = 0x0001 | 0x0004
+
+
+class RefreshStats:
+    """一次刷新对Tk中的行做的操作数"""
+
+    def __init__(self, inserted: int = 0, updated: int = 0, deleted: int = 0, moved: int = 0,
+                 unchanged: int = 0):
+        self.inserted = inserted
+        self.updated = updated
+        self.deleted = deleted
+        self.moved = moved
+        # 已渲染且取值和位置都没有变化的行，不需要任何Tk调用
+        self.unchanged = unchanged
+
+    @property
+    def touched(self) -> int:
+        """被插入、修改、删除或移动的行数"""
+        return self.inserted + self.updated + self.deleted + self.moved
+
+    def add(self, other: 'RefreshStats') -> None:
+        """累加另一次刷新的操作数"""
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.deleted += other.deleted
+        self.moved += other.moved
+        self.unchanged += other.unchanged
+
+    def __repr__(self) -> str:
+        return (f"RefreshStats(inserted={self.inserted}, updated={self.updated}, "
+                f"deleted={self.deleted}, moved={self.moved}, unchanged={self.unchanged})")
+
+
+class VirtualTreeview(ttk.Treeview):
+    """
+    只渲染可见行的Treeview
+
+    数据通过 :meth:`set_items` 整体给出（任意序列，如Task列表），控件只把可见的
+    若干行再加上下各 ``overscan`` 行插入Tk，每行的取值在插入时才由 ``values``
+    函数生成。滚动条、滚轮和方向键操作的是整个序列：滚动到已渲染的范围之外时才
+    换一批行，因此刷新和滚动的耗时与数据量无关，Tcl中也只保留这一小批行。
+
+    行ID由 ``iid`` 函数给出（默认取 ``uid`` 属性），选择按行ID记录：滚出窗口、
+    重新 ``set_items`` 后仍存在的行保持选中，``selection()`` 返回全部选中的行ID。
+
+    刷新和滚动时按行ID与已渲染的行比较，只删除离开窗口的行、插入新进入的行、
+    修改取值变了的行、移动顺序变了的行；只改了一行时只有一次Tk调用，滚动位置和
+    选择不受影响。每次的操作数记在 ``last_refresh``，累计在 ``refresh_totals``。
+    列、表头、样式等用法与 ``ttk.Treeview`` 相同，但行只能通过 ``set_items`` 设置。
+    """
+
+    def __init__(self, master=None, overscan: int = OVERSCAN, **kw):
+        # 滚动条对应整个序列，不交给Tk（Tk只知道已渲染的行）
+        self._yscrollcommand: Optional[Callable[..., Any]] = kw.pop('yscrollcommand', None)
+        super().__init__(master, **kw)
+        self.overscan = overscan
+        self._items: Sequence[Any] = ()
+        # 位置 -> update_items 替换进来的对象；序列本身不复制也不修改
+        self._replaced: Dict[int, Any] = {}
+        self._iid: Callable[[Any], str] = attrgetter('uid')
+        self._values: Callable[[Any], Tuple[Any, ...]] = tuple
+        # 行ID -> 在序列中的位置，需要时才生成
+        self._positions: Optional[Dict[str, int]] = None
+        # 第一个可见行，以及已渲染的范围 [start, end)
+        self._top = 0
+        self._start = self._end = 0
+        # 已渲染的行ID -> 插入Tk时的取值（按Tk中的顺序）
+        self._rendered: Dict[str, Tuple[Any, ...]] = {}
+        self.last_refresh = RefreshStats()
+        self.refresh_totals = RefreshStats()
+        self._visible = max(int(kw.get('height', 10)), 1)
+        self._selected: Dict[str, None] = {}
+        self.bind('<Configure>', self._on_configure, add='+')
+        self.bind('<<TreeviewSelect>>', self._on_select, add='+')
+        self.bind('<ButtonPress-1>', self._on_click, add='+')
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.bind(sequence, self._on_wheel)
+        for sequence, step in (('<Up>', -1), ('<Down>', 1), ('<Prior>', 'page-up'),
+                               ('<Next>', 'page-down'), ('<Home>', 'home'), ('<End>', 'end')):
+            self.bind(sequence, lambda event, step=step: self._on_key(step))
+
+    # ---- 数据 ----
+
+    def set_items(self, items: Sequence[Any], iid: Optional[Callable[[Any], str]] = None,
+                  values: Optional[Callable[[Any], Tuple[Any, ...]]] = None) -> None:
+        """
+        设置全部行
+
+        Args:
+            items: 行对应的对象序列（不复制，调用方不应再修改）
+            iid: 对象 -> 行ID，默认取 ``uid`` 属性
+            values: 对象 -> 各列取值，默认为 ``tuple(对象)``
+        """
+        self._items = items
+        self._replaced = {}
+        if iid is not None:
+            self._iid = iid
+        if values is not None:
+            self._values = values
+        self._positions = None
+        if self._selected:
+            positions = self._index()
+            self._selected = {item: None for item in self._selected if item in positions}
+        # 保持滚动位置，行数变少时退到最后一页
+        self._scroll_to(self._top, rerender=True)
+
+    def update_items(self, items: Iterable[Any]) -> int:
+        """
+        用行ID相同的新对象替换序列中的对象（行不增减、位置不变）
+
+        只有落在已渲染范围内的行会重新生成；序列中没有的对象被忽略。替换只记在
+        位置上，不复制序列，耗时与替换的行数有关，与总行数无关。
+
+        Returns:
+            替换的对象数
+        """
+        positions = self._index()
+        replaced = [(positions[row_id], item) for item in items
+                    for row_id in (self._iid(item),) if row_id in positions]
+        if not replaced:
+            return 0
+        self._replaced.update(replaced)
+        if any(self._start <= position < self._end for position, _ in replaced):
+            self._scroll_to(self._top, rerender=True)
+        return len(replaced)
+
+    def items(self) -> Sequence[Any]:
+        """当前的全部行对象（有替换过的对象时生成新的列表）"""
+        if self._replaced:
+            items = list(self._items)
+            for position, item in self._replaced.items():
+                items[position] = item
+            self._items, self._replaced = items, {}
+        return self._items
+
+    def _item(self, position: int) -> Any:
+        replaced = self._replaced.get(position)
+        return replaced if replaced is not None else self._items[position]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get_children(self, item: Optional[str] = None) -> Tuple[str, ...]:
+        """全部行的ID（不只是已渲染的行）"""
+        if item:
+            return ()
+        return tuple(map(self._iid, self._items))
+
+    def _index(self) -> Dict[str, int]:
+        if self._positions is None:
+            self._positions = {self._iid(item): position for position, item in enumerate(self._items)}
+        return self._positions
+
+    def index_of(self, iid: str) -> Optional[int]:
+        """行ID在序列中的位置，不存在时为None"""
+        return self._index().get(iid)
+
+    # ---- 滚动 ----
+
+    def configure(self, cnf=None, **kw):
+        if 'yscrollcommand' in kw:
+            self._yscrollcommand = kw.pop('yscrollcommand')
+            self._notify_scroll()
+        if cnf is None and not kw:
+            return super().configure()
+        return super().configure(cnf, **kw)
+
+    config = configure
+
+    def yview(self, *args):
+        """滚动条接口：moveto 比例、scroll 行数或页数；无参数时返回可见部分的比例"""
+        if not args:
+            return self._fractions()
+        if args[0] == 'moveto':
+            self._scroll_to(round(float(args[1]) * len(self._items)))
+        elif args[0] == 'scroll':
+            count = int(args[1])
+            self._scroll_to(self._top + (count * self._visible if args[2] == 'pages' else count))
+        return None
+
+    def yview_moveto(self, fraction: float) -> None:
+        self.yview('moveto', fraction)
+
+    def yview_scroll(self, number: int, what: str) -> None:
+        self.yview('scroll', number, what)
+
+    def see(self, item: str) -> None:
+        """滚动到行ID可见"""
+        position = self.index_of(item)
+        if position is None:
+            return
+        if position < self._top:
+            self._scroll_to(position)
+        elif position >= self._top + self._visible:
+            self._scroll_to(position - self._visible + 1)
+
+    def _fractions(self) -> Tuple[float, float]:
+        total = len(self._items)
+        if not total:
+            return 0.0, 1.0
+        return self._top / total, min(self._top + self._visible, total) / total
+
+    def _notify_scroll(self) -> None:
+        if self._yscrollcommand is not None:
+            self._yscrollcommand(*self._fractions())
+
+    def _scroll_to(self, top: int, rerender: bool = False) -> None:
+        total = len(self._items)
+        self._top = max(0, min(top, total - self._visible))
+        end = min(self._top + self._visible, total)
+        if rerender or self._top < self._start or end > self._end:
+            self._render(max(0, self._top - self.overscan), min(total, end + self.overscan))
+        if self._end > self._start:
+            super().yview_moveto((self._top - self._start) / (self._end - self._start))
+        self._notify_scroll()
+
+    def _render(self, start: int, end: int) -> None:
+        """让Tk中的行变为 [start, end) 的行，只对有变化的行调用Tk"""
+        stats = RefreshStats()
+        iid, values = self._iid, self._values
+        replaced = self._replaced
+        rows = {iid(item): values(item) for item in (
+            replaced.get(position, item) for position, item in enumerate(self._items[start:end], start))}
+        old = self._rendered
+        gone = [row_id for row_id in old if row_id not in rows]
+        if gone:
+            super().delete(*gone)
+            stats.deleted = len(gone)
+        # 保留下来的行中，在新旧顺序里相对次序一致的最长一组不动，其余的先摘下再放回
+        kept = [row_id for row_id in rows if row_id in old]
+        staying = _longest_increasing(kept, {row_id: position for position, row_id in enumerate(old)})
+        moving = [row_id for row_id in kept if row_id not in staying]
+        if moving:
+            super().detach(*moving)
+            stats.moved = len(moving)
+        moving_set = set(moving)
+        for position, (row_id, row_values) in enumerate(rows.items()):
+            if row_id not in old:
+                super().insert('', position, iid=row_id, values=row_values)
+                stats.inserted += 1
+                continue
+            if row_id in moving_set:
+                super().move(row_id, '', position)
+            if old[row_id] != row_values:
+                super().item(row_id, values=row_values)
+                stats.updated += 1
+            elif row_id not in moving_set:
+                stats.unchanged += 1
+        self._start, self._end, self._rendered = start, end, rows
+        self.last_refresh = stats
+        self.refresh_totals.add(stats)
+        # 摘下再放回的行失去了Tk中的选择状态，按记录的选择恢复
+        if gone or moving or stats.inserted:
+            super().selection_set([row_id for row_id in rows if row_id in self._selected])
+
+    def refresh_rows(self) -> None:
+        """序列中对象的取值变了（行没有增减）时重新生成已渲染的行"""
+        self._scroll_to(self._top, rerender=True)
+
+    # ---- 选择 ----
+
+    def selection(self) -> Tuple[str, ...]:
+        """全部选中的行ID（包括滚出窗口的行）"""
+        return tuple(self._selected)
+
+    def selection_set(self, *items) -> None:
+        items = _flatten(items)
+        self._selected = dict.fromkeys(items)
+        super().selection_set([item for item in items if item in self._rendered])
+
+    def selection_add(self, *items) -> None:
+        items = _flatten(items)
+        self._selected.update(dict.fromkeys(items))
+        super().selection_add([item for item in items if item in self._rendered])
+
+    def selection_remove(self, *items) -> None:
+        items = _flatten(items)
+        for item in items:
+            self._selected.pop(item, None)
+        super().selection_remove([item for item in items if item in self._rendered])
+
+    def _on_select(self, event=None) -> None:
+        # Tk只知道已渲染的行：窗口外的已选行保留，窗口内的以Tk为准
+        current = super().selection()
+        self._selected = {item: None for item in self._selected if item not in self._rendered}
+        self._selected.update(dict.fromkeys(current))
+
+    def _on_click(self, event) -> None:
+        if not event.state & _EXTEND_SELECTION:
+            self._selected = {item: None for item in self._selected if item in self._rendered}
+
+    # ---- 事件 ----
+
+    def _on_configure(self, event=None) -> None:
+        row_height = self._row_height()
+        # 表头约占一行，宁可少算一行，保证最后一行能滚动到可见
+        visible = max(self.winfo_height() // row_height - 1, 1)
+        if visible != self._visible:
+            self._visible = visible
+            self._scroll_to(self._top)
+
+    def _row_height(self) -> int:
+        style = self.cget('style') or 'Treeview'
+        try:
+            return int(ttk.Style(self).lookup(style, 'rowheight')) or DEFAULT_ROW_HEIGHT
+        except (ValueError, TypeError):
+            return DEFAULT_ROW_HEIGHT
+
+    def _on_wheel(self, event) -> str:
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            self._scroll_to(self._top - 3)
+        else:
+            self._scroll_to(self._top + 3)
+        return 'break'
+
+    def _on_key(self, step) -> str:
+        """方向键在整个序列中移动焦点和选择"""
+        total = len(self._items)
+        if not total:
+            return 'break'
+        focus = super().focus()
+        position = self.index_of(focus) if focus else None
+        if position is None:
+            position = self._top
+        if step == 'home':
+            position = 0
+        elif step == 'end':
+            position = total - 1
+        elif step == 'page-up':
+            position -= self._visible
+        elif step == 'page-down':
+            position += self._visible
+        else:
+            position += step
+        position = max(0, min(position, total - 1))
+        row_id = self._iid(self._item(position))
+        self.see(row_id)
+        self.selection_set(row_id)
+        super().focus(row_id)
+        return 'break'
+
+
+def _longest_increasing(row_ids: List[str], order: Dict[str, int]) -> set:
+    """row_ids 中按 order 递增的最长子序列（不需要移动的行）"""
+    tails: List[int] = []
+    tail_ids: List[int] = []
+    previous: List[int] = []
+    for position, row_id in enumerate(row_ids):
+        rank = order[row_id]
+        slot = bisect_left(tails, rank)
+        if slot == len(tails):
+            tails.append(rank)
+            tail_ids.append(position)
+        else:
+            tails[slot] = rank
+            tail_ids[slot] = position
+        previous.append(tail_ids[slot - 1] if slot else -1)
+    result = set()
+    position = tail_ids[-1] if tail_ids else -1
+    while position >= 0:
+        result.add(row_ids[position])
+        position = previous[position]
+    return result
+
+
+def _flatten(items: Iterable[Any]) -> list:
+    # 与ttk.Treeview相同，既接受多个参数也接受一个序列
+    if len(items) == 1 and isinstance(items[0], (list, tuple)):
+        return list(items[0])
+    return list(items)
@@ -1,72 +1,77 @@
-import json
-import os
-from typing import List, Optional, Dict, Any
-from pathlib import Path
-from task import WeeklyTask
+from itertools import islice
+from typing import List, Optional, Dict, Any, Iterator, Sequence
+from task import WeeklyTask, date_ordinal, iso_week
+from journal import DEFAULT_COMPACT_THRESHOLD
+from storage import Storage, WEEKLY_SCHEMA
+from loader import LoadStats
+from concurrency import with_identity
+from aggregates import Aggregates
+from codec import make_encoder
+from tasktable import WEEKLY_FIELDS, TaskTable
+from record_manager import RecordManager
 import logging
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# 统计的分组方式：开始日期所在的ISO周 (年, 周)、所属项目
+STAT_GROUPS = {'week': ('start_date', iso_week), 'project': ('project_name', None)}
 
-class WeeklyTaskManager:
-    """每周待办事项管理器"""
+# 写入数据文件的字段及顺序
+RECORD_FIELDS = ('title', 'description', 'priority', 'due_date', 'start_date', 'is_completed',
+                 'project_name', 'uid', 'revision')
 
-    def __init__(self, data_file: str = "weekly_data.json"):
-        """初始化每周待办事项管理器"""
-        self.data_file = Path(data_file)
-        self.weekly_tasks: List[WeeklyTask] = []
+
+class WeeklyTaskManager(RecordManager):
+    """每周待办事项管理器（存储与同步逻辑见 RecordManager）"""
+
+    record_type = WeeklyTask
+    label = "每周待办事项"
+    saver_name = "weekly-saver"
+
+    def __init__(self, data_file: str = "weekly_data.json", journal: bool = False,
+                 compact_threshold: int = DEFAULT_COMPACT_THRESHOLD,
+                 storage: Optional[Storage] = None, autosave_delay: Optional[float] = None,
+                 shared: bool = True):
+        """
+        初始化每周待办事项管理器
+
+        Args:
+            data_file: 数据文件，扩展名为 .db/.sqlite 时使用SQLite后端，
+                       为 .segments 时使用分段键值存储，为 .pmsb 时使用二进制快照
+            journal: 是否启用变更日志模式
+            compact_threshold: 日志模式下触发合并的日志大小(字节)
+            storage: 自定义存储后端，指定后忽略以上选项
+            autosave_delay: 设置后修改由后台线程合并写入，修改停止该秒数后才保存
+            shared: 数据文件可能被多个程序同时使用：保存时加文件锁，先合并其他程序写入的修改，
+                    冲突的修改记入 conflicts（数据库后端由SQLite自行处理并发，忽略此选项）
+        """
+        # 待办事项另按开始日期所在的ISO周 (年, 周) 分组，修改开始日期时随之更新；
+        # 同时维护每周、每个项目的任务数和完成数
+        super().__init__(data_file, WEEKLY_SCHEMA, journal, compact_threshold, storage,
+                         autosave_delay, shared, Aggregates(STAT_GROUPS, ('is_completed',)),
+                         derived={'week': ('start_date', iso_week)})
         self.load_data()
 
-    def load_data(self) -> None:
-        """从文件加载每周待办事项数据"""
-        if not self.data_file.exists():
-            logger.info("每周待办事项数据文件不存在，创建空列表")
-            self.weekly_tasks = []
-            return
-    
-        try:
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.weekly_tasks = [WeeklyTask.from_dict(item) for item in data]  # 修复：使用WeeklyTask.from_dict
-            logger.info(f"成功加载 {len(self.weekly_tasks)} 个每周待办事项")
-        except (json.JSONDecodeError, KeyError) as e:
-            logger.error(f"加载每周待办事项失败: {e}")
-            self.weekly_tasks = []
-        except Exception as e:
-            logger.error(f"加载数据时发生未知错误: {e}")
-            self.weekly_tasks = []
+    # 只保存用户输入的字段，而不是所有Task字段（week_number 加载时重新计算）
+    _record = staticmethod(make_encoder(WeeklyTask, RECORD_FIELDS))
 
-    def save_data(self) -> bool:
-        """保存每周待办事项数据到文件"""
-        try:
-            self.data_file.parent.mkdir(parents=True, exist_ok=True)
-    
-            # 只保存用户输入的字段，而不是所有Task字段
-            weekly_data = []
-            for weekly_task in self.weekly_tasks:
-                task_data = {
-                    'title': weekly_task.title,
-                    'description': weekly_task.description,
-                    'priority': weekly_task.priority,
-                    'due_date': weekly_task.due_date,
-                    'start_date': weekly_task.start_date,
-                    'is_completed': weekly_task.is_completed,  # 修复字段名
-                    'project_name': weekly_task.project_name,   # 修复字段名
-                }
-                weekly_data.append(task_data)
-    
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(weekly_data, f, ensure_ascii=False, indent=2)
-    
-            logger.info(f"成功保存 {len(self.weekly_tasks)} 个每周待办事项")
-            return True
-        except (IOError, PermissionError) as e:
-            logger.error(f"保存每周待办事项失败: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"保存数据时发生未知错误: {e}")
-            return False
+    @property
+    def weekly_tasks(self) -> List[WeeklyTask]:
+        """
+        待办事项列表（副本）；支持查询的后端在首次访问时才加载全部记录
+
+        每次访问都复制整个列表，供外部调用方持有；管理器内部直接遍历索引。
+        """
+        return list(self._loaded_index())
+
+    @weekly_tasks.setter
+    def weekly_tasks(self, value: List[WeeklyTask]) -> None:
+        self._set_records(value)
+
+    def update_weekly_task(self, task: WeeklyTask) -> bool:
+        """持久化对单个待办事项的修改"""
+        return self._update(task)
 
     def add_weekly_task(self, title: str, description: str = "", priority: int = 1,
                         due_date: Optional[str] = None, start_date: Optional[str] = None,
@@ -82,56 +87,118 @@ class WeeklyTaskManager:
                 project_name=project_name,
                 is_completed=False  # 添加默认完成状态
             )
-            self.weekly_tasks.append(task)
-            if self.save_data():
-                return task
-            return None
+            return self._add(task)
         except Exception as e:
             logger.error(f"添加每周待办事项失败: {e}")
             return None
 
+    def search_weekly_tasks(self, query: str, limit: Optional[int] = None) -> List[WeeklyTask]:
+        """
+        按标题和描述全文查询待办事项
+
+        汉字按相邻两字匹配，字母数字按词匹配，末尾的词按前缀匹配；查询中的每个词都须出现。
+
+        Args:
+            query: 查询文本
+            limit: 最多返回的条数，默认全部
+
+        Returns:
+            匹配的待办事项，按相关程度从高到低排列
+        """
+        return self._search_records(query, limit)
+
     def get_all_weekly_tasks(self) -> List[WeeklyTask]:
         """获取所有每周待办事项"""
-        return self.weekly_tasks.copy()
+        return self.weekly_tasks
+
+    def to_table(self, fields: Sequence[str] = WEEKLY_FIELDS) -> TaskTable:
+        """导出全部待办事项的列式视图，用于批量筛选和分组统计（导出后的修改不会反映到表中）"""
+        with self._lock:
+            return TaskTable(self._loaded_index(), fields)
+
+    def iter_weekly_tasks(self, stats: Optional[LoadStats] = None) -> Iterator[WeeklyTask]:
+        """
+        逐个产出待办事项，不构建待办事项列表
+
+        列表已加载时直接遍历列表；否则（数据库后端）从存储逐页读取，
+        每次只持有一页记录，尚未构建过的记录产出的是只读副本（修改不会被保存）。
+        损坏的记录被跳过并计入 ``stats``。
+        """
+        return self._iter_records(stats)
+
+    def get_weekly_task(self, uid: str) -> Optional[WeeklyTask]:
+        """根据内部ID获取待办事项"""
+        return self._get_by_uid(uid)
+
+    def remove_weekly_task(self, uid: str) -> bool:
+        """根据内部ID删除待办事项"""
+        try:
+            with self._lock:
+                task = self._loaded_index().get(uid)
+                if task is not None:
+                    self._remove(task)
+            if task is not None:
+                return self._persist()
+            logger.warning(f"删除任务失败：未找到ID为 {uid} 的任务")
+            return False
+        except Exception as e:
+            logger.error(f"删除任务时发生错误: {e}")
+            return False
 
     def remove_task(self, index: int) -> bool:
         """删除指定索引的待办事项"""
         try:
-            if 0 <= index < len(self.weekly_tasks):
-                self.weekly_tasks.pop(index)
-                return self.save_data()
-            logger.warning(f"删除任务失败：索引 {index} 超出范围")
-            return False
+            with self._lock:
+                tasks = self._loaded_index()
+                if not 0 <= index < len(tasks):
+                    logger.warning(f"删除任务失败：索引 {index} 超出范围")
+                    return False
+                self._remove(next(islice(tasks, index, None)))
+            return self._persist()
         except Exception as e:
             logger.error(f"删除任务时发生错误: {e}")
             return False
 
-    # def get_tasks_by_week(self, week_number: int, year: Optional[int] = None) -> List[Task]:
-    #     """获取指定周数的任务"""
-    #     if year is None:
-    #         year = datetime.now().year
-
-    #     result = []
-    #     for task in self.weekly_tasks:
-    #         if task.start_date:
-    #             try:
-    #                 task_date = datetime.strptime(task.start_date, "%Y-%m-%d")
-    #                 if task_date.isocalendar()[1] == week_number and task_date.year == year:
-    #                     result.append(task)
-    #             except ValueError:
-    #                 continue
-    #     return result
+    def get_tasks_between(self, start_date: str, end_date: str) -> List[WeeklyTask]:
+        """获取开始日期在 [start_date, end_date] 区间内的待办事项（YYYY-MM-DD）"""
+        if self.storage.supports_queries and self._batch is None:
+            with self._lock:
+                self._save_pending()
+                records = self.storage.query(between=('start_date', start_date, end_date))
+                return [self._materialize(key, item) for key, item in with_identity(records)]
+        low, high = date_ordinal(start_date), date_ordinal(end_date)
+        if not low or not high:
+            raise ValueError(f"日期格式错误: {start_date} ~ {end_date}")
+        with self._lock:
+            return [task for task in self._loaded_index() if low <= task.ordinal('start_date') <= high]
+
+    def get_tasks_by_week(self, year: int, week: int) -> List[WeeklyTask]:
+        """获取开始日期在ISO周 (year, week) 内的待办事项，只访问该周的记录"""
+        if self.storage.supports_queries and not self._loaded and self._batch is None:
+            monday = date.fromisocalendar(year, week, 1)
+            return self.get_tasks_between(monday.isoformat(), (monday + timedelta(days=6)).isoformat())
+        with self._lock:
+            return self._loaded_index().select(week=(year, week))
 
     def get_weekly_stats(self, week_number: int, year: Optional[int] = None) -> Dict[str, Any]:
-        """获取每周统计信息"""
-        tasks = self.get_tasks_by_week(week_number, year)
-        total = len(tasks)
-        completed = sum(1 for t in tasks if t.status == "已完成")
-        progress = sum(t.progress for t in tasks) / total if total > 0 else 0
+        """获取每周统计信息（year 为空时取今年），直接读取维护的计数"""
+        if year is None:
+            year = datetime.now().year
+        if self.storage.supports_queries and not self._loaded and self._batch is None:
+            # 数据库后端尚未加载全部记录时只查询这一周
+            tasks = self.get_tasks_by_week(year, week_number)
+            total, completed = len(tasks), sum(1 for task in tasks if task.is_completed)
+        else:
+            with self._lock:
+                self._loaded_index()
+                totals = self._stats.get('week', (year, week_number))
+            total, completed = totals.count, totals.sums['is_completed']
+        # 待办事项只有完成与未完成两种状态，平均进度即完成率
+        rate = round((completed / total * 100), 2) if total > 0 else 0
 
         return {
             'total_tasks': total,
             'completed_tasks': completed,
-            'completion_rate': round((completed / total * 100), 2) if total > 0 else 0,
-            'average_progress': round(progress, 2)
+            'completion_rate': rate,
+            'average_progress': rate
         }
\ No newline at end of file
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+# 源码是 src/ 下的平铺模块（与 main.py 的导入方式相同）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import pytest
+
+from index import RecordIndex
+from storage import ChangeTracker
+
+
+@pytest.fixture
+def tracked():
+    """用给定选项建立记录索引，并把记录挂载到变更跟踪器上（字段被赋值时索引随之更新）"""
+    def track(records, **options):
+        index = RecordIndex(**options)
+        tracker = ChangeTracker(index)
+        index.rebuild(records)
+        for record in records:
+            tracker.attach(record)
+        return index, tracker
+    return track
@@ -0,0 +1,137 @@
+"""batch()：正常退出时一次提交，抛出异常时撤销全部修改"""
+import os
+
+import pytest
+
+from index import DuplicateKeyError
+from project_manager import ProjectManager
+from saver import SaveStatus
+from weekly_task_manager import WeeklyTaskManager
+
+BACKENDS = [("p.json", {}), ("p.json", {"journal": True}), ("p.db", {}), ("p.segments", {})]
+IDS = ["json", "journal", "sqlite", "segments"]
+
+
+@pytest.fixture(params=BACKENDS, ids=IDS)
+def project_file(request, tmp_path):
+    name, options = request.param
+    return str(tmp_path / name), options
+
+
+def seeded(path, options, **extra):
+    manager = ProjectManager(path, **options, **extra)
+    for i in range(5):
+        manager.add_project(f"t{i}", project_number=f"N{i}")
+    return manager
+
+
+def test_commit_counts_and_persists(project_file):
+    path, options = project_file
+    manager = seeded(path, options)
+    with manager.batch() as result:
+        for i in range(20):
+            manager.add_project(f"b{i}", project_number=f"B{i}")
+        manager.get_project_by_number("N1").title = "changed"
+        manager.delete_project("N2")
+    assert (result.added, result.updated, result.deleted) == (20, 1, 1)
+    assert result.saved
+    manager.close()
+
+    reopened = ProjectManager(path, **options)
+    assert len(reopened.get_all_projects()) == 24
+    assert reopened.get_project_by_number("N1").title == "changed"
+    assert reopened.get_project_by_number("N2") is None
+
+
+def test_rollback_restores_records_and_indexes(project_file):
+    path, options = project_file
+    manager = seeded(path, options)
+    before = [task.to_dict() for task in manager.get_all_projects()]
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            manager.add_project("x", project_number="X")
+            manager.get_project_by_number("N3").title = "zzz"
+            manager.get_project_by_number("N1").update_progress(50)
+            manager.delete_project("N4")
+            raise RuntimeError
+    assert [task.to_dict() for task in manager.get_all_projects()] == before
+    assert manager.query_projects(project_number="X") == []
+    assert [task.title for task in manager.query_projects(status="待开始")] == [f"t{i}" for i in range(5)]
+    assert manager.query_projects(status="进行中") == []
+    assert not manager.verify_stats()
+    assert len(manager._tracker) == 0
+
+    # 撤销之后的修改照常保存
+    task = manager.get_project_by_number("N3")
+    task.title = "after"
+    assert manager.update_project(task)
+    manager.close()
+    reopened = ProjectManager(path, **options)
+    assert len(reopened.get_all_projects()) == 5
+    assert reopened.get_project_by_number("N3").title == "after"
+
+
+def test_duplicate_key_rolls_back_batch(tmp_path):
+    manager = seeded(str(tmp_path / "p.json"), {}, unique_numbers=True)
+    first = manager.get_project_by_number("N0")
+    with pytest.raises(DuplicateKeyError):
+        with manager.batch():
+            first.title = "renamed"
+            manager.get_project_by_number("N1").project_number = "N0"
+    assert first.title == "t0"
+    assert [task.title for task in manager.query_projects(project_number="N0")] == ["t0"]
+    assert [task.title for task in manager.query_projects(project_number="N1")] == ["t1"]
+
+
+def test_nested_batch_joins_outer(tmp_path):
+    manager = seeded(str(tmp_path / "p.json"), {})
+    with pytest.raises(ValueError):
+        with manager.batch():
+            with manager.batch() as inner:
+                manager.add_project("inner")
+            assert not inner.saved
+            raise ValueError
+    assert [task.title for task in manager.get_all_projects()] == [f"t{i}" for i in range(5)]
+
+
+def test_weekly_rollback(tmp_path):
+    manager = WeeklyTaskManager(str(tmp_path / "w.json"))
+    with manager.batch() as result:
+        for i in range(10):
+            manager.add_weekly_task(f"w{i}", start_date="2024-01-02")
+    assert result.added == 10
+    first = manager.get_all_weekly_tasks()[0]
+    with pytest.raises(ValueError):
+        with manager.batch():
+            first.is_completed = True
+            first.start_date = "2024-02-01"
+            manager.remove_task(1)
+            raise ValueError
+    assert not first.is_completed
+    assert len(manager.get_tasks_by_week(2024, 1)) == 10
+    assert manager.get_weekly_stats(1, 2024)["completed_tasks"] == 0
+    assert not manager.verify_stats()
+
+
+def test_batch_with_background_saver_writes_once(tmp_path, monkeypatch):
+    manager = ProjectManager(str(tmp_path / "p.json"), journal=True, autosave_delay=60)
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (synced.append(fd), fsync(fd)))
+
+    # 没有修改的批量操作不登记保存
+    with manager.batch() as result:
+        pass
+    assert result.saved and manager.saver.status == SaveStatus.IDLE
+
+    with manager.batch() as result:
+        for i in range(20):
+            manager.add_project(f"b{i}")
+    # 提交时只登记一次保存请求，写入由后台保存器一次完成
+    assert result.saved and manager.saver.status == SaveStatus.PENDING and synced == []
+    assert manager.saver.flush(5)
+    assert len(synced) == 1
+    manager.close()
+    reopened = ProjectManager(str(tmp_path / "p.json"), journal=True)
+    assert len(reopened.get_all_projects()) == 20
+    reopened.close()
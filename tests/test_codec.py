@@ -0,0 +1,56 @@
+"""记录的编解码：生成的编解码函数"""
+from dataclasses import asdict
+
+import pytest
+
+from codec import make_encoder
+from task import Task, WeeklyTask
+
+
+def test_encoder_matches_asdict():
+    task = Task("任务", "描述", 3, "进行中", 40, "2025-01-01", None, "2025-02-01", "P1", "甲")
+    assert task.to_dict() == asdict(task)
+    weekly = WeeklyTask("周", project_name="甲", is_completed=True)
+    assert weekly.to_dict() == asdict(weekly)
+
+
+@pytest.mark.parametrize("cls", [Task, WeeklyTask])
+def test_decoder_round_trip(cls):
+    record = cls(title="t", description="d", priority=2, due_date="2025-01-02").to_dict()
+    decoded = cls.from_dict(record)
+    assert decoded == cls(**record)
+    assert decoded.to_dict() == record
+    # 解码不经过修改跟踪
+    assert decoded.version == 0
+
+
+def test_decoder_ignores_unknown_fields_and_applies_defaults():
+    task = Task.from_dict({"title": "t", "is_weekly": True, "weekly_task": None})
+    assert task.status == "待开始" and task.uid and task.start_date
+    with pytest.raises(KeyError):
+        Task.from_dict({"description": "没有标题"})
+
+
+def test_weekly_aliases():
+    weekly = WeeklyTask.from_dict({"title": "w", "completed": True, "project": "甲"})
+    assert weekly.is_completed and weekly.project_name == "甲"
+    # 新旧字段名同时存在时以新字段名为准
+    assert not WeeklyTask.from_dict({"title": "w", "completed": True, "is_completed": False}).is_completed
+
+
+def test_encoder_field_subset_and_order():
+    encode = make_encoder(Task, ["uid", "title", "progress"])
+    task = Task("t", progress=30)
+    assert list(encode(task).items()) == [("uid", task.uid), ("title", "t"), ("progress", 30)]
+    # 每次返回新的字典，修改它不影响对象
+    encoded = encode(task)
+    encoded["title"] = "改"
+    assert task.title == "t" and encode(task)["title"] == "t"
+
+
+def test_decoded_record_tracks_later_changes():
+    task = Task.from_dict(Task("t", due_date="2025-01-02").to_dict())
+    # 解码时直接写入槽，之后的赋值照常递增版本号
+    assert task.version == 0
+    task.title = "改"
+    assert task.version == 1 and task.to_dict()["title"] == "改"
@@ -0,0 +1,34 @@
+"""列存储：日期序数列与扫描项目对象的结果一致，文件可被其他实例复用"""
+from datetime import date
+
+from columnstore import REBUILD_AFTER_READS, ColumnStore, encode_columns
+from project_manager import ProjectManager
+from task import Task
+
+
+def test_encode_and_scan_dates():
+    tasks = [Task(title="a", due_date="2024-03-01"), Task(title="b"),
+             Task(title="c", due_date="2024-03-09", start_date="2024-02-01")]
+    store = ColumnStore(encode_columns(enumerate(tasks)))
+    assert list(store.keys()) == [0, 1, 2]
+    assert store.rows_between('due_date', date(2024, 3, 1), date(2024, 3, 31)) == [0, 2]
+    assert store.rows_between('start_date', date(2024, 1, 1), date(2024, 12, 31)) == [2]
+    # 日期不是字符串时不能放入定长列
+    assert encode_columns([(0, Task(title="x", due_date=20240301))]) is None
+
+
+def test_columns_file_is_reused(tmp_path):
+    path = str(tmp_path / "p.json")
+    manager = ProjectManager(path, columnar=True)
+    for day in (1, 15, 28):
+        manager.add_project(f"t{day}", due_date=f"2024-05-{day:02d}")
+    for _ in range(REBUILD_AFTER_READS):
+        expected = manager.get_projects_between('due_date', "2024-05-10", "2024-05-31")
+    assert manager.columns_file.exists()
+    manager.close()
+
+    reopened = ProjectManager(path, columnar=True)
+    assert reopened._columns is not None
+    found = reopened.get_projects_between('due_date', "2024-05-10", "2024-05-31")
+    assert [task.title for task in found] == [task.title for task in expected] == ["t15", "t28"]
+    reopened.close()
@@ -0,0 +1,162 @@
+"""共享数据文件：合并其他程序的修改以及冲突的处理"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from concurrency import FileLock, LockTimeoutError, lock_file_for, with_identity
+from project_manager import ProjectManager
+from weekly_task_manager import WeeklyTaskManager
+
+
+@pytest.fixture(params=[False, True], ids=["json", "journal"])
+def journal(request):
+    return request.param
+
+
+@pytest.fixture
+def shared_file(tmp_path):
+    path = tmp_path / "p.json"
+    path.write_text(json.dumps([{"title": "A", "project_number": "A1"},
+                                {"title": "B", "project_number": "B1"},
+                                {"title": "C", "project_number": "C1"}]), encoding="utf-8")
+    return str(path)
+
+
+def titles(path, journal):
+    return sorted(task.title for task in ProjectManager(path, journal=journal).get_all_projects())
+
+
+def test_legacy_records_get_the_same_uid_in_every_process(shared_file, journal):
+    first = ProjectManager(shared_file, journal=journal)
+    second = ProjectManager(shared_file, journal=journal)
+    assert ([task.uid for task in first.get_all_projects()]
+            == [task.uid for task in second.get_all_projects()])
+
+
+def test_edits_of_different_records_are_merged(shared_file, journal):
+    first = ProjectManager(shared_file, journal=journal)
+    second = ProjectManager(shared_file, journal=journal)
+    task = first.get_project_by_number("A1")
+    task.title = "A-first"
+    assert first.update_project(task)
+    task = second.get_project_by_number("B1")
+    task.title = "B-second"
+    assert second.update_project(task)
+    assert not second.conflicts
+    assert titles(shared_file, journal) == ["A-first", "B-second", "C"]
+    # 合并后内存中也有对方的修改
+    assert second.get_project_by_number("A1").title == "A-first"
+
+
+def test_concurrent_edit_keeps_remote_version(shared_file, journal):
+    first = ProjectManager(shared_file, journal=journal)
+    second = ProjectManager(shared_file, journal=journal)
+    local = second.get_project_by_number("C1")
+    remote = first.get_project_by_number("C1")
+    remote.title = "C-first"
+    assert first.update_project(remote)
+    local.title = "C-second"
+    second.update_project(local)
+
+    assert len(second.conflicts) == 1
+    conflict = second.conflicts[0]
+    assert conflict.local["title"] == "C-second" and conflict.remote["title"] == "C-first"
+    assert second.get_project_by_number("C1").title == "C-first"
+    assert titles(shared_file, journal) == ["A", "B", "C-first"]
+
+
+def test_edit_of_remotely_deleted_record_is_kept_as_new(shared_file, journal):
+    first = ProjectManager(shared_file, journal=journal)
+    second = ProjectManager(shared_file, journal=journal)
+    local = second.get_project_by_number("B1")
+    assert first.delete_project("B1")
+    local.title = "B-edited"
+    second.update_project(local)
+
+    assert len(second.conflicts) == 1 and second.conflicts[0].remote is None
+    assert titles(shared_file, journal) == ["A", "B-edited", "C"]
+
+
+def test_local_delete_of_remotely_edited_record_keeps_remote(shared_file, journal):
+    first = ProjectManager(shared_file, journal=journal)
+    second = ProjectManager(shared_file, journal=journal)
+    remote = first.get_project_by_number("A1")
+    remote.title = "A-first"
+    assert first.update_project(remote)
+    second.delete_project("A1")
+
+    assert len(second.conflicts) == 1 and second.conflicts[0].local is None
+    assert titles(shared_file, journal) == ["A-first", "B", "C"]
+
+
+def test_reload_if_changed(shared_file, journal):
+    first = ProjectManager(shared_file, journal=journal)
+    second = ProjectManager(shared_file, journal=journal)
+    count = first.sync_count
+    assert not first.reload_if_changed()
+    assert first.sync_count == count
+    second.add_project("D", project_number="D1")
+    assert first.reload_if_changed()
+    assert first.get_project_by_number("D1").title == "D"
+
+
+def test_weekly_conflict(tmp_path):
+    path = str(tmp_path / "w.json")
+    first = WeeklyTaskManager(path)
+    second = WeeklyTaskManager(path)
+    first.add_weekly_task("x")
+    second.add_weekly_task("y")
+    assert sorted(task.title for task in WeeklyTaskManager(path).get_all_weekly_tasks()) == ["x", "y"]
+
+    first.reload_if_changed()
+    task = first.get_all_weekly_tasks()[0]
+    task.title = "x-first"
+    first.update_weekly_task(task)
+    task = second.get_all_weekly_tasks()[0]
+    task.title = "x-second"
+    second.update_weekly_task(task)
+    assert len(second.conflicts) == 1
+    assert second.get_all_weekly_tasks()[0].title == "x-first"
+
+
+def test_save_fails_while_another_process_holds_the_lock(tmp_path):
+    path = str(tmp_path / "w.json")
+    manager = WeeklyTaskManager(path)
+    task = manager.add_weekly_task("x")
+    manager._file_lock.timeout = 0.1
+    # 同一进程中另一把锁对象同样互斥（flock 按打开的文件描述）
+    with FileLock(lock_file_for(path)):
+        task.title = "y"
+        assert manager.update_weekly_task(task) is False
+    assert manager.save_data()
+    assert WeeklyTaskManager(path).get_weekly_task(task.uid).title == "y"
+
+
+def test_changes_from_another_process_are_merged(shared_file, journal):
+    manager = ProjectManager(shared_file, journal=journal)
+    task = manager.get_project_by_number("A1")
+    task.title = "本进程"
+    # 另一个进程在本进程保存之前新增并修改项目
+    script = (f"import sys; sys.path.insert(0, {str(Path(__file__).parent.parent / 'src')!r})\n"
+              "from project_manager import ProjectManager\n"
+              f"manager = ProjectManager({shared_file!r}, journal={journal})\n"
+              "manager.add_project('D', project_number='D1')\n"
+              "task = manager.get_project_by_number('B1')\n"
+              "task.title = '另一进程'\n"
+              "assert manager.update_project(task) and manager.close()\n")
+    subprocess.run([sys.executable, "-c", script], check=True, timeout=60)
+
+    assert manager.update_project(task)
+    assert not manager.conflicts
+    assert titles(shared_file, journal) == sorted(["本进程", "另一进程", "C", "D"])
+    manager.close()
+
+
+def test_with_identity_is_deterministic():
+    records = [(0, {"title": "same"}), (1, {"title": "same"}), (2, {"title": "x", "uid": "u"})]
+    first = [item["uid"] for _, item in with_identity(records)]
+    assert first == [item["uid"] for _, item in with_identity(records)]
+    assert len(set(first)) == 3 and first[2] == "u"
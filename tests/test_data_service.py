@@ -0,0 +1,78 @@
+"""数据服务：经服务的修改发布变更通知，修改是原子的"""
+import pytest
+
+from data_service import ChangeEvent, ChangeKind, DataService, Entity
+from index import DuplicateKeyError
+from project_manager import ProjectManager
+from weekly_task_manager import WeeklyTaskManager
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = DataService(ProjectManager(str(tmp_path / "p.json"), unique_numbers=True),
+                          WeeklyTaskManager(str(tmp_path / "w.json")))
+    yield service
+    service.close()
+
+
+def test_changes_are_published(service):
+    events, project_events = [], []
+    service.subscribe(events.append)
+    service.subscribe(project_events.append, Entity.PROJECT)
+    task = service.add_project("甲", project_number="P1")
+    weekly = service.add_weekly_task("周", project_name="甲")
+    assert events == [ChangeEvent(Entity.PROJECT, ChangeKind.ADDED, (task.uid,)),
+                      ChangeEvent(Entity.WEEKLY, ChangeKind.ADDED, (weekly.uid,))]
+    assert project_events == events[:1]
+
+    assert service.update_project(task, title="乙")
+    assert events[-1] == ChangeEvent(Entity.PROJECT, ChangeKind.UPDATED, (task.uid,))
+    assert service.project_names() == ["乙"]
+    assert service.remove_weekly_task(weekly.uid)
+    assert events[-1] == ChangeEvent(Entity.WEEKLY, ChangeKind.REMOVED, (weekly.uid,))
+
+
+def test_failing_subscriber_does_not_block_others(service):
+    events = []
+
+    def broken(event):
+        raise RuntimeError
+
+    service.subscribe(broken)
+    service.subscribe(events.append)
+    service.add_project("甲")
+    assert len(events) == 1
+
+
+def test_update_weekly_task_applies_all_changes(service, tmp_path):
+    task = service.add_weekly_task("旧", start_date="2025-09-15")
+    assert service.update_weekly_task(task, title="新", is_completed=True, priority=2)
+    service.close()
+    saved = WeeklyTaskManager(str(tmp_path / "w.json")).get_weekly_task(task.uid)
+    assert (saved.title, saved.is_completed, saved.priority) == ("新", True, 2)
+
+
+@pytest.mark.parametrize("entity", [Entity.PROJECT, Entity.WEEKLY])
+def test_unknown_field_is_rejected_before_any_change(service, entity):
+    events = []
+    if entity == Entity.PROJECT:
+        task = service.add_project("旧")
+        update = service.update_project
+    else:
+        task = service.add_weekly_task("旧")
+        update = service.update_weekly_task
+    service.subscribe(events.append)
+    version = task.version
+    with pytest.raises(ValueError, match="no_such_field"):
+        update(task, title="新", no_such_field=1)
+    assert task.title == "旧" and task.version == version
+    assert events == []
+
+
+def test_duplicate_number_rolls_back_every_field(service):
+    service.add_project("A", project_number="N1")
+    task = service.add_project("B", project_number="N2")
+    with pytest.raises(DuplicateKeyError):
+        service.update_project(task, title="BB", project_number="N1")
+    assert (task.title, task.project_number) == ("B", "N2")
+    assert service.projects.get_project_by_number("N2") is task
@@ -0,0 +1,28 @@
+"""日期范围查询与按位置删除：直接遍历索引，结果与列表次序一致"""
+import pytest
+
+from columnstore import REBUILD_AFTER_READS
+from project_manager import ProjectManager
+from weekly_task_manager import WeeklyTaskManager
+
+
+@pytest.mark.parametrize("columnar", [False, True], ids=["scan", "columns"])
+def test_projects_between_keeps_list_order(tmp_path, columnar):
+    manager = ProjectManager(str(tmp_path / "p.json"), columnar=columnar)
+    for i, day in enumerate([5, 1, 9, 3, 20]):
+        manager.add_project(f"t{i}", start_date=f"2024-03-{day:02d}")
+    for _ in range(REBUILD_AFTER_READS + 1):
+        found = manager.get_projects_between("start_date", "2024-03-02", "2024-03-10")
+    assert [task.title for task in found] == ["t0", "t2", "t3"]
+    assert (manager._columns is not None) == columnar
+    manager.close()
+
+
+def test_remove_task_by_position(tmp_path):
+    manager = WeeklyTaskManager(str(tmp_path / "w.json"))
+    for i in range(3):
+        manager.add_weekly_task(f"w{i}", start_date="2024-03-04")
+    assert manager.remove_task(1)
+    assert not manager.remove_task(5)
+    assert [task.title for task in manager.get_tasks_between("2024-03-01", "2024-03-31")] == ["w0", "w2"]
+    manager.close()
@@ -0,0 +1,46 @@
+"""日期字段按日期序数比较：字符串只解析一次，字段被赋值后重新解析"""
+from datetime import date, timedelta
+
+from task import Task, TaskStatus, WeeklyTask, date_ordinal
+from weekly_task_manager import WeeklyTaskManager
+
+
+def test_date_ordinal_parsing():
+    assert date_ordinal("2024-03-05") == date(2024, 3, 5).toordinal()
+    # 与 strptime 一样接受不补零的月、日
+    assert date_ordinal("2024-3-5") == date(2024, 3, 5).toordinal()
+    for value in (None, "", "2024-02-30", "明天", 20240305):
+        assert date_ordinal(value) == 0
+
+
+def test_ordinal_follows_assignment():
+    task = Task("t", due_date="2024-03-05")
+    assert task.ordinal("due_date") == date(2024, 3, 5).toordinal()
+    task.due_date = "2024-03-06"
+    assert task.ordinal("due_date") == date(2024, 3, 6).toordinal()
+    task.set_untracked("due_date", None)
+    assert task.ordinal("due_date") == 0
+    # 序列化的仍是原来的字符串
+    weekly = WeeklyTask("w", start_date="2024-3-5")
+    assert weekly.ordinal("start_date") == date(2024, 3, 5).toordinal()
+    assert weekly.to_dict()["start_date"] == "2024-3-5"
+
+
+def test_is_overdue_compares_days():
+    today = date.today()
+    task = Task("t", due_date=today.isoformat())
+    assert task.is_overdue()
+    task.due_date = (today + timedelta(days=1)).isoformat()
+    assert not task.is_overdue()
+    task.due_date = (today - timedelta(days=3)).isoformat()
+    task.status = TaskStatus.COMPLETED.value
+    assert not task.is_overdue()
+
+
+def test_weekly_range_accepts_unpadded_dates(tmp_path):
+    manager = WeeklyTaskManager(str(tmp_path / "w.json"))
+    for title, day in [("补零", "2024-03-09"), ("不补零", "2024-3-10"), ("范围外", "2024-3-20")]:
+        manager.add_weekly_task(title, start_date=day)
+    # 按字符串比较时 "2024-3-10" 大于上限 "2024-03-15"，会被漏掉
+    assert [task.title for task in manager.get_tasks_between("2024-03-01", "2024-03-15")] == ["补零", "不补零"]
+    manager.close()
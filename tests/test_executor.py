@@ -0,0 +1,179 @@
+"""GuiExecutor：按类别取消旧请求、丢弃过时的结果、忙碌指示，以及界面的查询不在主线程中执行"""
+import threading
+import time
+
+import pytest
+
+from data_service import DataService
+from executor import GuiExecutor
+from gui import ProjectTasksGUI, WeeklyTasksGUI
+from project_manager import ProjectManager
+
+
+class FakeRoot:
+    """代替Tk根窗口：记下 after 的回调，由测试在主线程中手动执行"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, ms, callback):
+        self.callbacks.append(callback)
+
+    def pump(self, until, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not until():
+            assert time.monotonic() < deadline, "后台请求未在限定时间内完成"
+            callbacks, self.callbacks = self.callbacks, []
+            for callback in callbacks:
+                callback()
+            time.sleep(0.005)
+
+
+@pytest.fixture
+def root():
+    return FakeRoot()
+
+
+@pytest.fixture
+def busy():
+    return []
+
+
+@pytest.fixture
+def executor(root, busy):
+    executor = GuiExecutor(root, max_workers=2, on_busy=busy.append)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_same_key_cancels_the_running_request(root, busy, executor):
+    started, release = threading.Event(), threading.Event()
+    done = []
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "old"
+
+    executor.submit(slow, key='query', on_done=done.append)
+    assert started.wait(5)
+    executor.submit(lambda: "new", key='query', on_done=done.append)
+    release.set()
+    root.pump(lambda: not executor.busy)
+    # 旧请求已在执行，结果被丢弃，回调不会被调用
+    assert done == ["new"]
+    assert busy == [True, False]
+
+
+def test_finished_but_unpolled_result_is_dropped(root, executor):
+    done = []
+    first = executor.submit(lambda: 1, key='query', on_done=done.append)
+    first.future.result(5)
+    # 结果已在队列中，主线程取出前被新请求取代
+    executor.submit(lambda: 2, key='query', on_done=done.append)
+    root.pump(lambda: not executor.busy)
+    assert done == [2]
+
+
+def test_other_keys_are_not_cancelled(root, executor):
+    done = []
+    executor.submit(lambda: "a", key='a', on_done=done.append)
+    executor.submit(lambda: "b", key='b', on_done=done.append)
+    executor.submit(lambda: "c", on_done=done.append)
+    root.pump(lambda: not executor.busy)
+    assert sorted(done) == ["a", "b", "c"]
+
+
+def test_cancel_and_busy_transitions(root, busy, executor):
+    release = threading.Event()
+    done = []
+    request = executor.submit(release.wait, 5, key='query', on_done=done.append)
+    assert busy == [True]
+    executor.cancel('query')
+    assert busy == [True, False] and not executor.busy
+    release.set()
+    request.future.result(5)
+    root.pump(lambda: not root.callbacks)
+
+    executor.submit(lambda: 1, on_done=done.append)
+    executor.submit(lambda: 2, on_done=done.append)
+    root.pump(lambda: not executor.busy)
+    # 被取消的请求的结果不被处理；两个请求同时未完成时只在开始和全部完成时各通知一次
+    assert busy == [True, False, True, False]
+    assert sorted(done) == [1, 2]
+
+
+def test_errors_go_to_on_error_on_the_main_thread(root, executor):
+    errors, threads = [], []
+
+    def fail():
+        raise ValueError("坏数据")
+
+    def on_error(error):
+        errors.append(error)
+        threads.append(threading.get_ident())
+
+    executor.submit(fail, on_error=on_error)
+    # 未给出 on_error 时只记录日志，不影响之后的请求
+    executor.submit(fail)
+    root.pump(lambda: not executor.busy)
+    assert [str(error) for error in errors] == ["坏数据"]
+    assert threads == [threading.get_ident()]
+
+
+def test_call_soon_from_a_worker(root, executor):
+    called = []
+    executor.submit(lambda: executor.call_soon(called.append, threading.get_ident()))
+    root.pump(lambda: called)
+    assert called[0] != threading.get_ident()
+
+
+def test_filter_candidates_are_queried_off_the_main_thread(tmp_path, root, executor):
+    manager = ProjectManager(str(tmp_path / "p.json"))
+    manager.add_project("甲", project_number="P2")
+    manager.add_project("乙", project_number="P1")
+    service = DataService(manager)
+    threads = []
+
+    def traced(fn):
+        def call():
+            threads.append(threading.get_ident())
+            return fn()
+        return call
+
+    project_view = object.__new__(ProjectTasksGUI)
+    project_view.manager, project_view.executor = manager, executor
+    project_view.project_number_combo = {}
+    manager.get_project_numbers = traced(manager.get_project_numbers)
+    project_view.refresh_project_numbers()
+
+    weekly_view = object.__new__(WeeklyTasksGUI)
+    weekly_view.service, weekly_view.executor = service, executor
+    weekly_view.project_combo = {}
+    service.project_names = traced(service.project_names)
+    weekly_view.on_projects_changed()
+
+    root.pump(lambda: not executor.busy)
+    assert len(threads) == 2 and threading.get_ident() not in threads
+    assert project_view.project_number_combo['values'] == ["所有", "P1", "P2"]
+    assert weekly_view.project_combo['values'] == ["所有", "无", "乙", "甲"]
+    manager.close()
+
+
+def test_project_names_cache_ignores_a_stale_walk(tmp_path):
+    manager = ProjectManager(str(tmp_path / "p.json"))
+    service = DataService(manager)
+    manager.add_project("甲")
+    walk = manager.get_all_projects
+
+    def get_all_projects():
+        projects = walk()
+        # 后台线程遍历期间有项目新增：算出的名称已过时，不应被缓存
+        service.add_project("乙")
+        return projects
+
+    manager.get_all_projects = get_all_projects
+    assert service.project_names() == ["甲"]
+    manager.get_all_projects = walk
+    assert service.project_names() == ["乙", "甲"]
+    manager.close()
@@ -0,0 +1,40 @@
+"""项目筛选：状态、优先级和项目编号的索引求交集，结果按列表顺序"""
+import pytest
+
+from project_manager import ProjectManager
+from task import Task
+
+
+def test_select_intersects_in_list_order(tracked):
+    tasks = [Task(f"t{i}", priority=1 + i % 3, status="进行中" if i % 2 else "待开始",
+                  project_number=f"N{i % 4}") for i in range(40)]
+    index, _ = tracked(tasks, fields=("status", "priority", "project_number"))
+    expected = [task for task in tasks if task.priority == 2 and task.status == "进行中"]
+    assert index.select(priority=2, status="进行中") == expected
+    assert index.select() == tasks
+    assert index.select(project_number="none") == []
+
+    # 字段被赋值后索引随之更新，结果仍按列表顺序
+    tasks[0].priority = 2
+    tasks[0].status = "进行中"
+    assert index.select(priority=2, status="进行中") == [tasks[0]] + expected
+
+
+@pytest.mark.parametrize("name", ["p.json", "p.db"])
+def test_query_projects_matches_scan(tmp_path, name):
+    manager = ProjectManager(str(tmp_path / name))
+    for i in range(30):
+        manager.add_project(f"t{i}", priority=1 + i % 3, project_number=f"N{i % 5}")
+    for task in manager.get_all_projects()[::4]:
+        task.update_progress(50)
+        manager.update_project(task)
+    projects = manager.get_all_projects()
+    for status in ("待开始", "进行中", None):
+        for priority in (1, 3, None):
+            for number in ("N2", None):
+                found = manager.query_projects(status=status, priority=priority, project_number=number)
+                assert [task.uid for task in found] == [
+                    task.uid for task in projects
+                    if status in (None, task.status) and priority in (None, task.priority)
+                    and number in (None, task.project_number)]
+    manager.close()
@@ -0,0 +1,115 @@
+"""两个视图的查询：全文搜索与筛选条件、关键字同时生效，结果按相关程度排列"""
+from datetime import date
+
+import gui
+from data_service import DataService
+from gui import ProjectTasksGUI, WeeklyTasksGUI
+from project_manager import ProjectManager
+from text_filter import TextFilter
+from weekly_task_manager import WeeklyTaskManager
+
+
+def weekly_view(manager):
+    # 只用到查询逻辑，不创建窗口
+    view = object.__new__(WeeklyTasksGUI)
+    view.weekly_task_manager = manager
+    view.text_filter = TextFilter(('title', 'description', 'project_name'))
+    view._data_version = 0
+    return view
+
+
+def project_view(manager):
+    view = object.__new__(ProjectTasksGUI)
+    view.manager = manager
+    view.text_filter = TextFilter(('title', 'description', 'project_number', 'project_name'),
+                                  search=view.search_uids)
+    view._data_version = 0
+    return view
+
+
+NO_CRITERIA = {'is_completed': None, 'priority': None, 'project_name': None}
+
+
+def day(week, weekday):
+    # 周选项都是今年的ISO周
+    return date.fromisocalendar(date.today().year, week, weekday).isoformat()
+
+
+def test_weekly_search_is_ranked_within_week_and_filters(tmp_path):
+    manager = WeeklyTaskManager(str(tmp_path / "w.json"))
+    manager.add_weekly_task("整理", description="周报 周报", start_date=day(38, 1))
+    best = manager.add_weekly_task("周报", description="周报", start_date=day(38, 2))
+    done = manager.add_weekly_task("周报汇总", start_date=day(38, 3))
+    done.is_completed = True
+    other = manager.add_weekly_task("周报", start_date=day(39, 1))
+    manager.add_weekly_task("会议", start_date=day(38, 4))
+    view = weekly_view(manager)
+
+    tasks, _ = view.query_weekly_tasks(38, NO_CRITERIA, "", "周报")
+    week = {task.uid for task in view.get_weekly_tasks(38)}
+    assert [task.uid for task in tasks] == [task.uid for task in manager.search_weekly_tasks("周报")
+                                            if task.uid in week]
+    assert len(tasks) == 3 and tasks[0] is best and other not in tasks
+    tasks, _ = view.query_weekly_tasks(38, dict(NO_CRITERIA, is_completed=False), "", "周报")
+    assert done not in tasks and len(tasks) == 2
+    tasks, _ = view.query_weekly_tasks(38, NO_CRITERIA, "汇总", "周报")
+    assert tasks == [done]
+    manager.close()
+
+
+def test_project_search_alone_and_with_criteria(tmp_path):
+    manager = ProjectManager(str(tmp_path / "p.json"), lazy=True)
+    with manager.batch():
+        low = manager.add_project("接口", description="供应商", priority=1)
+        high = manager.add_project("供应商接口", description="供应商对接", priority=2)
+        manager.add_project("内部", priority=2)
+    manager.close()
+    manager = ProjectManager(str(tmp_path / "p.json"), lazy=True)
+    view = project_view(manager)
+    criteria = {'status': None, 'priority': None, 'project_number': None}
+
+    assert [task.uid for task in view.query_tasks(criteria, "", "供应商")] == [high.uid, low.uid]
+    assert [task.uid for task in view.query_tasks(dict(criteria, priority=1), "", "供应商")] == [low.uid]
+    # 延迟加载时关键字同样匹配摘要中没有的描述
+    assert [task.uid for task in view.query_tasks(criteria, "对接")] == [high.uid]
+    assert [task.uid for task in view.query_tasks(criteria, "接口", "供应商")] == [high.uid, low.uid]
+    manager.close()
+
+
+def test_project_view_summarizes_filtered_rows(tmp_path):
+    manager = ProjectManager(str(tmp_path / "p.json"))
+    manager.add_project("周报", priority=3)
+    manager.add_project("评审", priority=3, due_date="2000-01-01")
+    manager.add_project("其他", priority=1)
+    view = project_view(manager)
+    tasks, summary = view.query_view({'status': None, 'priority': 3, 'project_number': None})
+    assert [task.title for task in tasks] == ["周报", "评审"]
+    assert summary['total'] == 2 and summary['overdue'] == 1
+    assert summary['status_counts'] == {"待开始": 2}
+
+
+def test_failed_save_is_reported(tmp_path, monkeypatch):
+    service = DataService(ProjectManager(str(tmp_path / "p.json")), WeeklyTaskManager(str(tmp_path / "w.json")))
+    task = service.add_project("周报")
+    view = project_view(service.projects)
+    view.service = service
+    view.tree = type("Tree", (), {"selection": lambda self: (task.uid,)})()
+    shown = []
+    monkeypatch.setattr(gui.simpledialog, "askinteger", lambda *args, **kwargs: 50)
+    monkeypatch.setattr(gui.messagebox, "showinfo", lambda *args: shown.append(("info",) + args))
+    monkeypatch.setattr(gui.messagebox, "showerror", lambda *args: shown.append(("error",) + args))
+
+    def fail(records):
+        raise PermissionError("只读")
+    monkeypatch.setattr(service.projects.storage, "save_all", fail)
+    view.update_progress()
+    assert shown == [("error", "错误", gui.SAVE_FAILED_MESSAGE)]
+
+    # 修改仍然保留，写入恢复后保存成功
+    monkeypatch.undo()
+    monkeypatch.setattr(gui.simpledialog, "askinteger", lambda *args, **kwargs: 100)
+    monkeypatch.setattr(gui.messagebox, "showinfo", lambda *args: shown.append(("info",) + args))
+    view.update_progress()
+    assert shown[-1][0] == "info"
+    assert ProjectManager(str(tmp_path / "p.json")).get_project_by_uid(task.uid).progress == 100
+    service.close()
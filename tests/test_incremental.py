@@ -0,0 +1,55 @@
+"""增量保存：只写入新增、修改和删除的记录"""
+import pytest
+
+from project_manager import ProjectManager
+from weekly_task_manager import WeeklyTaskManager
+
+
+def test_only_changed_records_are_written(tmp_path):
+    manager = ProjectManager(str(tmp_path / "data.segments"))
+    with manager.batch():
+        for i in range(600):
+            manager.add_project(f"t{i}", project_number=f"N{i}")
+    written = []
+    update_many = manager.storage.update_many
+    manager.storage.update_many = lambda items: (written.extend(key for key, _ in items), update_many(items))
+    task = manager.get_project_by_number("N5")
+    task.update_progress(30)
+    assert manager.update_project(task)
+    assert written == [task._storage_key]
+    manager.close()
+
+
+def spy(storage):
+    """记下写入的记录键：新增、修改（含批量修改）和删除"""
+    written = {"insert": [], "update": set(), "delete": []}
+    insert, update, update_many, delete = (storage.insert, storage.update, storage.update_many,
+                                           storage.delete)
+    storage.insert = lambda record: (written["insert"].append(record["title"]), insert(record))[1]
+    storage.update = lambda key, record: (written["update"].add(key), update(key, record))
+    storage.update_many = lambda items: (written["update"].update(key for key, _ in items),
+                                         update_many(items))
+    storage.delete = lambda keys: (written["delete"].extend(keys), delete(keys))
+    return written
+
+
+@pytest.mark.parametrize("name", ["w.json", "w.db", "w.segments"])
+def test_weekly_save_writes_only_changes(tmp_path, name):
+    manager = WeeklyTaskManager(str(tmp_path / name), journal=name == "w.json")
+    tasks = [manager.add_weekly_task(f"w{i}", start_date="2024-03-04") for i in range(5)]
+    written = spy(manager.storage)
+    # 没有变更时不写入
+    assert manager.save_data()
+    assert written == {"insert": [], "update": set(), "delete": []}
+
+    tasks[1].is_completed = True
+    assert manager.update_weekly_task(tasks[1])
+    deleted = tasks[2]._storage_key
+    assert manager.remove_weekly_task(tasks[2].uid)
+    assert written == {"insert": [], "update": {tasks[1]._storage_key}, "delete": [deleted]}
+    manager.close()
+
+    reopened = WeeklyTaskManager(str(tmp_path / name), journal=name == "w.json")
+    assert [(task.title, task.is_completed) for task in reopened.get_all_weekly_tasks()] == \
+        [("w0", False), ("w1", True), ("w3", False), ("w4", False)]
+    reopened.close()
@@ -0,0 +1,71 @@
+"""uid哈希索引与唯一约束：按uid查找不扫描记录，重复的取值被拒绝"""
+import sqlite3
+
+import pytest
+
+from index import DuplicateKeyError
+from project_manager import ProjectManager
+from task import Task
+from weekly_task_manager import WeeklyTaskManager
+
+
+def test_unique_field_rejects_duplicates(tracked):
+    tasks = [Task("a", project_number="N1"), Task("b", project_number="N2"), Task("c")]
+    index, _ = tracked(tasks, unique=("project_number",), sorted_fields=("project_number",))
+    with pytest.raises(DuplicateKeyError):
+        tasks[1].project_number = "N1"
+    assert tasks[1].project_number == "N2"
+    with pytest.raises(DuplicateKeyError):
+        index.add(Task("d", project_number="N2"))
+    # 无值不参与唯一约束
+    index.add(Task("e"))
+    tasks[1].project_number = "N0"
+    assert index.distinct("project_number") == ["N0", "N1"]
+
+
+@pytest.mark.parametrize("name", ["p.json", "p.db"])
+def test_uids_are_stable_and_numbers_unique(tmp_path, name):
+    path = str(tmp_path / name)
+    manager = ProjectManager(path, unique_numbers=True)
+    first = manager.add_project("甲", project_number="N1")
+    assert manager.add_project("乙", project_number="N1") is None
+    second = manager.add_project("乙", project_number="N2")
+    with pytest.raises(DuplicateKeyError):
+        second.project_number = "N1"
+    assert manager.get_project_by_uid(first.uid) is first
+    manager.close()
+
+    # uid保存在数据文件中，重新打开后仍能按uid找到同一项目
+    reopened = ProjectManager(path, unique_numbers=True)
+    assert [task.title for task in reopened.get_all_projects()] == ["甲", "乙"]
+    assert reopened.get_project_by_uid(first.uid).project_number == "N1"
+    assert reopened.get_project_by_uid(second.uid).project_number == "N2"
+    reopened.close()
+
+
+@pytest.mark.parametrize("manager_class, table", [(ProjectManager, "projects"),
+                                                  (WeeklyTaskManager, "weekly_tasks")])
+def test_sqlite_uid_lookup_uses_unique_index(tmp_path, manager_class, table):
+    manager = manager_class(str(tmp_path / "data.db"))
+    conn = manager.storage.conn
+    plan = " ".join(str(row) for row in conn.execute(
+        f"EXPLAIN QUERY PLAN SELECT id FROM {table} WHERE uid = ?", ("x",)))
+    assert f"uidx_{table}_uid" in plan
+    # 旧数据没有uid，唯一索引允许多个空值
+    conn.executemany(f"INSERT INTO {table} (title) VALUES (?)", [("a",), ("b",)])
+    conn.commit()
+    manager.close()
+
+
+def test_sqlite_duplicate_uids_fall_back_to_plain_index(tmp_path):
+    path = tmp_path / "data.db"
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE projects (id INTEGER PRIMARY KEY, title TEXT, uid TEXT)")
+    conn.executemany("INSERT INTO projects (title, uid) VALUES (?, ?)", [("a", "u1"), ("b", "u1")])
+    conn.commit()
+    conn.close()
+    manager = ProjectManager(str(path))
+    names = {row[1] for row in manager.storage.conn.execute("PRAGMA index_list(projects)")}
+    assert "idx_projects_uid" in names and "uidx_projects_uid" not in names
+    assert len(manager.get_all_projects()) == 2
+    manager.close()
@@ -0,0 +1,167 @@
+"""变更日志模式：快照 + 日志重放与整体重写的结果一致"""
+import json
+import os
+import random
+import threading
+
+import journal
+from project_manager import ProjectManager
+
+
+def state(manager):
+    return [task.to_dict() for task in manager.get_all_projects()]
+
+
+def random_edits(manager, rng, steps):
+    """随机新增、修改、删除项目，每一步都单独保存"""
+    for step in range(steps):
+        projects = manager.get_all_projects()
+        op = rng.randrange(4) if projects else 0
+        if op == 0:
+            manager.add_project(f"t{step}", "描述" * rng.randrange(20), rng.randint(1, 5),
+                                project_number=f"N{step % 13}")
+        elif op == 1:
+            task = rng.choice(projects)
+            task.update_progress(rng.randrange(101))
+            manager.update_project(task)
+        elif op == 2:
+            task = rng.choice(projects)
+            task.title = f"改{step}"
+            manager.update_project(task)
+        else:
+            manager.delete_project_by_uid(rng.choice(projects).uid)
+
+
+def test_replay_matches_in_memory_state(tmp_path):
+    path = tmp_path / "p.json"
+    manager = ProjectManager(str(path), journal=True, compact_threshold=4000)
+    random_edits(manager, random.Random(1), 300)
+    expected = state(manager)
+    manager.close()
+
+    replayed = ProjectManager(str(path), journal=True)
+    assert state(replayed) == expected
+    # 合并为快照后，快照本身就是同样的数据，与不用日志时读到的一致
+    assert replayed.compact(wait=True)
+    replayed.close()
+    assert json.loads(path.read_text(encoding="utf-8")) == expected
+    assert state(ProjectManager(str(path))) == expected
+
+
+def test_replay_after_every_compaction_threshold(tmp_path):
+    path = tmp_path / "p.json"
+    rng = random.Random(2)
+    manager = ProjectManager(str(path), journal=True, compact_threshold=500)
+    for _ in range(5):
+        random_edits(manager, rng, 40)
+        expected = state(manager)
+        manager.close()
+        manager = ProjectManager(str(path), journal=True, compact_threshold=500)
+        assert state(manager) == expected
+    manager.close()
+
+
+def test_recovers_when_compaction_did_not_finish(tmp_path):
+    path = tmp_path / "p.json"
+    manager = ProjectManager(str(path), journal=True, compact_threshold=2000)
+    random_edits(manager, random.Random(3), 30)
+
+    def fail(payload):
+        raise OSError("磁盘已满")
+
+    # 日志已轮换，新快照却没有写成：旧快照 + 旧日志 + 新日志
+    manager.storage.journal._write_file = fail
+    for i in range(40):
+        manager.add_project(f"x{i}", "y" * 100, project_number=f"X{i}")
+    expected = state(manager)
+    manager.close()
+    assert manager.storage.journal.compacting_file.exists()
+
+    recovered = ProjectManager(str(path), journal=True)
+    assert state(recovered) == expected
+    assert not recovered.storage.journal.compacting_file.exists()
+    recovered.close()
+
+
+def test_compaction_encodes_off_the_caller(tmp_path, monkeypatch):
+    path = tmp_path / "p.json"
+    manager = ProjectManager(str(path), journal=True, compact_threshold=10 ** 9)
+    for i in range(30):
+        manager.add_project(f"t{i}", f"描述{i}", project_number=f"N{i}")
+    manager.close()
+
+    # 共享的数据文件须在持有文件锁期间写完快照，只有独占时才在后台压缩
+    manager = ProjectManager(str(path), journal=True, compact_threshold=2000, lazy=True, shared=False)
+    uids = [row.uid for row in manager.get_all_projects()]
+    task = manager.get_project_by_number("N3")
+    release, encoding = threading.Event(), threading.Event()
+    encode = journal.encode_json_array
+
+    def blocked_encode(records):
+        encoding.set()
+        assert release.wait(5)
+        return encode(records)
+
+    monkeypatch.setattr(journal, "encode_json_array", blocked_encode)
+    replaced = []
+    monkeypatch.setattr(manager._index.aggregates, "replace", lambda *args: replaced.append(args))
+    while not encoding.is_set():
+        task.description += "长" * 50
+        # 压缩线程编码时写入照常返回，调用方不等待编码和写入
+        assert manager.update_project(task)
+    # 重新编号只换摘要的存储键，不重新计算统计
+    assert replaced == [] and manager._index.get(uids[5]).key == 5
+    # 新快照写完之前，摘要的完整记录从内存中读回
+    assert manager.get_project_by_uid(uids[5]).description == "描述5"
+    release.set()
+    manager.close()
+
+    reopened = ProjectManager(str(path), journal=True)
+    assert [project.description for project in reopened.get_all_projects()] == \
+        [task.description if i == 3 else f"描述{i}" for i in range(30)]
+    assert not reopened.storage.journal.compacting_file.exists()
+    reopened.close()
+
+
+def test_new_journal_matches_snapshot_written_in_background(tmp_path):
+    path = tmp_path / "p.json"
+    manager = ProjectManager(str(path), journal=True, compact_threshold=2000, shared=False)
+    journal_ = manager.storage.journal
+    # 新快照写成后旧日志没来得及删除：新日志的基准摘要（在操作之后追加）与新快照对应
+    journal_._remove = lambda path: None
+    random_edits(manager, random.Random(4), 60)
+    expected = state(manager)
+    manager.close()
+    assert journal_.compacting_file.exists()
+
+    reopened = ProjectManager(str(path), journal=True)
+    assert state(reopened) == expected
+    assert not journal_.journal_file.with_name(journal_.journal_file.name + ".rejected").exists()
+    reopened.close()
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / "p.json"
+    manager = ProjectManager(str(path), journal=True)
+    manager.add_project("保留", project_number="A")
+    expected = state(manager)
+    manager.close()
+    with open(manager.storage.journal.journal_file, "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "key": 9, "da')
+
+    assert state(ProjectManager(str(path), journal=True)) == expected
+
+
+def test_each_save_is_fsynced_once(tmp_path, monkeypatch):
+    manager = ProjectManager(str(tmp_path / "p.json"), journal=True)
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (synced.append(fd), fsync(fd)))
+
+    manager.add_project("a")
+    assert len(synced) == 1
+    with manager.batch():
+        for i in range(20):
+            manager.add_project(f"b{i}")
+    assert len(synced) == 2
+    manager.close()
@@ -0,0 +1,64 @@
+"""延迟加载：加载时只保留摘要，需要完整记录时按记录键从存储读回"""
+import pytest
+
+from project_manager import ProjectManager
+from task import Task, TaskRow
+
+# (数据文件名, 管理器选项)
+BACKENDS = [
+    ("data.json", {}),
+    ("data.json", {"journal": True}),
+    ("data.db", {}),
+    ("data.segments", {}),
+    ("data.pmsb", {}),
+]
+IDS = ["json", "journal", "sqlite", "segments", "snapshot"]
+
+
+@pytest.mark.parametrize("name,options", BACKENDS, ids=IDS)
+def test_lazy_load_matches_full_load(tmp_path, name, options):
+    path = str(tmp_path / name)
+    manager = ProjectManager(path, **options)
+    with manager.batch():
+        for i in range(50):
+            manager.add_project(f"t{i}", description=f"描述{i}", priority=1 + i % 3, project_number=f"N{i}")
+    manager.close()
+
+    full = ProjectManager(path, **options)
+    lazy = ProjectManager(path, lazy=True, **options)
+    assert [task.uid for task in lazy.get_all_projects()] == [task.uid for task in full.get_all_projects()]
+    assert ([task.uid for task in lazy.query_projects(priority=2)]
+            == [task.uid for task in full.query_projects(priority=2)])
+    task = lazy.get_project_by_number("N7")
+    assert task.description == "描述7"
+    task.title = "改"
+    assert lazy.update_project(task)
+    lazy.close()
+    full.close()
+    assert ProjectManager(path, **options).get_project_by_number("N7").title == "改"
+
+
+def test_task_row_matches_task():
+    record = Task("t", priority=2, progress=30, project_number="P").to_dict()
+    row = TaskRow.from_dict(7, record)
+    task = Task.from_dict(record)
+    for name in TaskRow._fields:
+        if name != "key":
+            assert getattr(row, name) == getattr(task, name), name
+
+
+def test_only_requested_records_are_materialized(tmp_path):
+    path = str(tmp_path / "data.json")
+    manager = ProjectManager(path)
+    for i in range(10):
+        manager.add_project(f"t{i}", description=f"描述{i}", project_number=f"N{i}")
+    manager.close()
+
+    lazy = ProjectManager(path, lazy=True)
+    assert all(isinstance(task, TaskRow) for task in lazy.get_all_projects())
+    task = lazy.get_project_by_number("N4")
+    assert isinstance(task, Task) and task.description == "描述4"
+    # 读回的完整记录替换列表中的摘要，其余记录仍是摘要
+    assert [type(task).__name__ for task in lazy.get_all_projects()].count("Task") == 1
+    assert lazy.get_project_by_number("N4") is task
+    lazy.close()
@@ -0,0 +1,80 @@
+"""逐条加载：损坏的记录被跳过并原样写入隔离文件，其余记录照常加载"""
+import json
+
+import pytest
+
+from loader import (LoadStats, iter_json_array, iter_json_array_spans, quarantine_file_for,
+                    read_json_span)
+from project_manager import ProjectManager
+
+GOOD = [{"title": "甲", "project_number": "A1"}, {"title": "乙", "description": "第二条"},
+        {"title": "丙", "uid": "u3", "revision": 2}]
+BROKEN = '{\n    "title": "坏",\n    "priority": \n  }'
+
+
+def write_corrupt(path):
+    # 合法记录之间夹着非对象元素、语法错误和缺少标题（无法构建）的旧记录
+    parts = [json.dumps(GOOD[0], ensure_ascii=False, indent=2), "42", BROKEN,
+             json.dumps(GOOD[1], ensure_ascii=False, indent=2), '{"description": "无标题"}',
+             json.dumps(GOOD[2], ensure_ascii=False, indent=2)]
+    path.write_text("[\n  " + ",\n  ".join(part.replace("\n", "\n  ") for part in parts) + "\n]",
+                    encoding="utf-8")
+    return path
+
+
+def quarantined(path):
+    with open(quarantine_file_for(path), encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64 * 1024])
+def test_iter_json_array_skips_corrupt_elements(tmp_path, chunk_size):
+    path = write_corrupt(tmp_path / "p.json")
+    stats = LoadStats(quarantine_file_for(path))
+    records = iter_json_array(path, stats, chunk_size=chunk_size)
+    # 逐条产出，被跳过的元素同样占用位置
+    assert next(records) == (0, GOOD[0])
+    assert [(index, record) for index, record in records] == [
+        (3, GOOD[1]), (4, {"description": "无标题"}), (5, GOOD[2])]
+    assert stats.skipped == 2 and stats.bytes_read == path.stat().st_size
+
+    number, broken = quarantined(path)
+    assert number['position'] == 1 and number['record'] == 42
+    assert broken['position'] == 2 and broken['raw'].strip().rstrip(',').strip() == \
+        BROKEN.replace("\n", "\n  ")
+
+
+def test_spans_read_back_single_records(tmp_path):
+    path = write_corrupt(tmp_path / "p.json")
+    spans = list(iter_json_array_spans(path, LoadStats(), chunk_size=11))
+    with open(path, 'rb') as fp:
+        for _, record, offset, length in spans:
+            assert read_json_span(fp, offset, length) == record
+
+
+def test_manager_quarantines_raw_records(tmp_path):
+    path = write_corrupt(tmp_path / "p.json")
+    manager = ProjectManager(str(path))
+    stats = manager.load_stats
+    assert (stats.loaded, stats.skipped) == (3, 3)
+    assert [task.title for task in manager.get_all_projects()] == ["甲", "乙", "丙"]
+
+    entries = quarantined(path)
+    assert [entry['position'] for entry in entries] == [1, 2, 4]
+    # 隔离的是文件中的原始记录，不含加载时补上的uid和版本号
+    assert entries[2]['record'] == {"description": "无标题"}
+    assert 'KeyError' not in entries[2]['error'] and 'title' in entries[2]['error']
+
+    # 保存不会丢掉隔离文件中的内容
+    manager.add_project("丁")
+    manager.close()
+    assert len(quarantined(path)) == 3
+
+
+def test_non_array_file_is_preserved(tmp_path):
+    path = tmp_path / "p.json"
+    path.write_text('{"title": "不是数组"}', encoding="utf-8")
+    stats = LoadStats(quarantine_file_for(path))
+    assert list(iter_json_array(path, stats)) == []
+    assert stats.corrupt_copy.read_text(encoding="utf-8") == path.read_text(encoding="utf-8")
+    assert stats.skipped == 1
@@ -0,0 +1,32 @@
+"""紧凑的记录对象：__slots__ 与取值较少的字符串驻留"""
+import sys
+
+import pytest
+
+from task import Task, WeeklyTask
+
+
+def test_low_cardinality_strings_are_interned():
+    status = "".join(["进行", "中"])
+    task = Task.from_dict({"title": "t", "status": status})
+    assert task.status is sys.intern("进行中")
+    task.project_name = "".join(["甲", "乙"])
+    assert task.project_name is sys.intern("甲乙")
+
+
+@pytest.mark.parametrize("cls", [Task, WeeklyTask])
+def test_records_have_no_instance_dict(cls):
+    record = cls("t")
+    assert not hasattr(record, "__dict__")
+    with pytest.raises(AttributeError):
+        record.unknown_field = 1
+
+
+def test_interned_values_are_shared_across_records():
+    records = [Task.from_dict({"title": f"t{i}", "project_name": "".join(["项目", "甲"]),
+                               "due_date": "-".join(["2025", "01", "02"])}) for i in range(3)]
+    assert len({id(task.project_name) for task in records}) == 1
+    assert len({id(task.due_date) for task in records}) == 1
+    # 标题和描述各不相同，不驻留
+    weekly = WeeklyTask.from_dict({"title": "".join(["周", "报"]), "project_name": "".join(["甲", "乙"])})
+    assert weekly.project_name is sys.intern("甲乙") and weekly.title is not sys.intern("周报")
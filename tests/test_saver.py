@@ -0,0 +1,112 @@
+"""后台保存：连续的修改合并为一次写入，flush立即写入，失败后重试以及两个管理器合并的保存状态"""
+import threading
+import time
+
+import pytest
+
+from data_service import DataService
+from saver import BackgroundSaver, SaveStatus
+
+
+class StubManager:
+    """代替记录管理器：前 ``failures`` 次保存失败，之后成功"""
+
+    def __init__(self, failures=0, delay=0.02, retry_delay=0.02):
+        self.failures = failures
+        self.calls = 0
+        self.saved = threading.Event()
+        self.saver = BackgroundSaver(self.save_data, delay, retry_delay)
+
+    def save_data(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            return False
+        self.saved.set()
+        return True
+
+    def close(self):
+        return self.saver.close(5)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "后台保存未在限定时间内完成"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def managers():
+    created = []
+
+    def make(*args, **kwargs):
+        manager = StubManager(*args, **kwargs)
+        created.append(manager)
+        return manager
+    yield make
+    for manager in created:
+        manager.close()
+
+
+def test_schedules_are_coalesced(managers):
+    manager = managers(delay=0.1)
+    for _ in range(20):
+        manager.saver.schedule()
+    assert manager.saver.status == SaveStatus.PENDING
+    assert manager.saved.wait(5)
+    wait_for(lambda: manager.saver.status == SaveStatus.IDLE)
+    assert manager.calls == 1
+
+
+def test_flush_writes_without_waiting_for_the_delay(managers):
+    manager = managers(delay=60)
+    manager.saver.schedule()
+    assert manager.saver.flush(5)
+    assert manager.calls == 1 and manager.saver.status == SaveStatus.IDLE
+    # 没有等待中的修改时不再写入
+    assert manager.saver.flush(5)
+    assert manager.calls == 1
+
+
+def test_failed_save_is_retried(managers):
+    manager = managers(failures=1)
+    manager.saver.schedule()
+    assert manager.saved.wait(5)
+    wait_for(lambda: manager.saver.status == SaveStatus.IDLE)
+    assert manager.calls == 2 and manager.saver.last_error is None
+
+
+def test_flush_retries_immediately_after_a_failure(managers):
+    manager = managers(failures=1, delay=60, retry_delay=60)
+    manager.saver.schedule()
+    assert not manager.saver.flush(5)
+    assert manager.saver.status == SaveStatus.FAILED
+    assert manager.saver.last_error == "保存失败"
+    # 不等重试间隔，flush立即再试
+    assert manager.saver.flush(5)
+    assert manager.calls == 2 and manager.saver.status == SaveStatus.IDLE
+
+
+def test_exception_counts_as_failure(managers):
+    manager = managers(delay=60, retry_delay=60)
+    manager.saver.save_fn = lambda: 1 / 0
+    manager.saver.schedule()
+    assert not manager.saver.flush(5)
+    assert manager.saver.status == SaveStatus.FAILED
+    assert "division" in manager.saver.last_error
+
+
+def test_service_combines_both_statuses(managers):
+    projects = managers(failures=1, delay=60, retry_delay=60)
+    weekly = managers(delay=60)
+    service = DataService(projects, weekly)
+    assert service.save_statuses() == {SaveStatus.IDLE}
+
+    projects.saver.schedule()
+    weekly.saver.schedule()
+    assert service.save_statuses() == {SaveStatus.PENDING}
+    assert not service.flush()
+    assert service.save_statuses() == {SaveStatus.FAILED, SaveStatus.IDLE}
+    assert service.flush()
+    assert service.save_statuses() == {SaveStatus.IDLE}
+    assert (projects.calls, weekly.calls) == (2, 1)
@@ -0,0 +1,100 @@
+"""全文查询：延迟加载模式下同样按描述查询，索引文件在关闭时写入并在下次启动时载入"""
+import pytest
+
+from project_manager import ProjectManager
+from search import SearchIndex, search_file_for
+
+# (数据文件名, 管理器选项, 是否保存全文索引文件)；SQLite后端没有可比对的文件标识
+BACKENDS = [("data.json", {}, True), ("data.json", {"journal": True}, True), ("data.db", {}, False)]
+IDS = ["json", "journal", "sqlite"]
+
+
+def make_projects(path, options, count=20):
+    manager = ProjectManager(path, **options)
+    with manager.batch():
+        for i in range(count):
+            description = "需要对接供应商接口" if i % 2 else "内部整理"
+            manager.add_project(f"项目{i}", description=description, project_number=f"N{i}")
+    manager.close()
+
+
+def titles(tasks):
+    return sorted(task.title for task in tasks)
+
+
+@pytest.mark.parametrize("name,options,persisted", BACKENDS, ids=IDS)
+def test_lazy_search_covers_descriptions(tmp_path, name, options, persisted):
+    path = str(tmp_path / name)
+    make_projects(path, options)
+    full = ProjectManager(path, **options)
+    expected = titles(full.search_projects("供应商"))
+    full.close()
+    assert len(expected) == 10
+
+    lazy = ProjectManager(path, lazy=True, **options)
+    assert titles(lazy.search_projects("供应商")) == expected
+    assert lazy.search_covers_descriptions()
+    lazy.close()
+    assert search_file_for(path).exists() == persisted
+
+    reopened = ProjectManager(path, lazy=True, **options)
+    reopened.get_all_projects()
+    assert (reopened._search.stamp is not None) == persisted
+    assert titles(reopened.search_projects("供应商")) == expected
+    reopened.close()
+
+
+def test_lazy_descriptions_survive_materialize_and_rollback(tmp_path):
+    path = str(tmp_path / "data.json")
+    make_projects(path, {})
+    manager = ProjectManager(path, lazy=True)
+    task = manager.get_project_by_number("N1")
+    assert titles(manager.search_projects("供应商")) == titles(
+        [t for t in manager.get_all_projects() if t.project_number in {f"N{i}" for i in range(1, 20, 2)}])
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            task.description = "已改为内部"
+            manager.get_project_by_number("N3").title = "改"
+            raise RuntimeError
+    assert len(manager.search_projects("供应商")) == 10
+    assert manager.search_covers_descriptions()
+
+    task.description = "改为外包"
+    assert manager.update_project(task)
+    assert [t.uid for t in manager.search_projects("外包")] == [task.uid]
+    assert len(manager.search_projects("供应商")) == 9
+    manager.close()
+
+
+def test_lazy_search_sees_external_changes(tmp_path):
+    path = str(tmp_path / "data.json")
+    make_projects(path, {}, count=4)
+    lazy = ProjectManager(path, lazy=True)
+    assert lazy.search_projects("物流") == []
+    other = ProjectManager(path)
+    added = other.add_project("新项目", description="物流系统改造")
+    other.close()
+    assert lazy.reload_if_changed()
+    assert [task.uid for task in lazy.search_projects("物流")] == [added.uid]
+    assert len(lazy.search_projects("供应商")) == 2
+    assert lazy.search_covers_descriptions()
+    lazy.close()
+
+
+def test_provided_text_is_dropped_after_indexing():
+    class Row:
+        def __init__(self, uid, title):
+            self.uid, self.title = uid, title
+
+    index = SearchIndex(use_numpy=False)
+    rows = [Row(str(i), f"标题{i}") for i in range(3)]
+    for row in rows:
+        index.provide(row.uid, {"title": "忽略", "description": f"描述文字{row.uid}"})
+    index.rebuild(rows)
+    index.build()
+    assert index.complete and index._texts == {}
+    assert [uid for uid, _ in index.search("描述文字")] == ["0", "1", "2"]
+    # 标题未变的摘要重建后保留文档，标题改变的摘要没有重新提供描述
+    index.rebuild(rows[:2] + [Row("2", "新标题")])
+    assert [uid for uid, _ in index.search("描述文字")] == ["0", "1"]
+    assert not index.complete
@@ -0,0 +1,41 @@
+"""二进制快照：按列编码的记录往返，损坏的快照被保留而不是覆盖"""
+import pytest
+
+from project_manager import ProjectManager
+from snapshot import SnapshotError, decode_snapshot, encode_snapshot
+from task import Task, WeeklyTask
+
+
+def test_snapshot_round_trip():
+    tasks = [Task("任务一", priority=3, progress=40, project_name="甲", due_date="2025-01-02"),
+             Task("b", description="x\x00y", project_number="P1")]
+    records = [task.to_dict() for task in tasks]
+    assert decode_snapshot(encode_snapshot(records)) == records
+    weekly = [WeeklyTask("w", is_completed=True).to_dict(), WeeklyTask("v").to_dict()]
+    assert decode_snapshot(encode_snapshot(weekly)) == weekly
+    # 不符合列类型的值原样保留
+    odd = [{"title": None, "priority": "3", "progress": 10 ** 30, "is_completed": 1, "extra": {"a": [1]}},
+           {"status": 5}, {}]
+    assert decode_snapshot(encode_snapshot(odd)) == odd
+    assert decode_snapshot(encode_snapshot([])) == []
+
+
+def test_snapshot_rejects_corrupt_payload():
+    payload = encode_snapshot([Task("t").to_dict()])
+    with pytest.raises(SnapshotError):
+        decode_snapshot(payload[:len(payload) // 2])
+
+
+def test_corrupt_snapshot_file_is_preserved(tmp_path):
+    path = tmp_path / "p.pmsb"
+    manager = ProjectManager(str(path))
+    for i in range(5):
+        manager.add_project(f"t{i}", project_number=f"N{i}")
+    manager.close()
+    payload = path.read_bytes()
+    path.write_bytes(payload[:len(payload) // 2])
+
+    damaged = ProjectManager(str(path))
+    assert damaged.get_all_projects() == []
+    assert damaged.load_stats.corrupt_copy.read_bytes() == payload[:len(payload) // 2]
+    damaged.close()
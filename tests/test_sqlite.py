@@ -0,0 +1,35 @@
+"""SQLite后端：筛选和日期范围查询直接在SQL中完成，不加载全部记录"""
+from project_manager import ProjectManager
+from weekly_task_manager import WeeklyTaskManager
+
+
+def test_sqlite_queries_without_loading(tmp_path):
+    path = str(tmp_path / "data.db")
+    manager = ProjectManager(path)
+    for i in range(10):
+        manager.add_project(f"t{i}", priority=1 + i % 2, project_number=f"N{i}")
+    manager.close()
+
+    reopened = ProjectManager(path)
+    assert [task.title for task in reopened.query_projects(priority=2)] == ["t1", "t3", "t5", "t7", "t9"]
+    assert not reopened._loaded
+    reopened.close()
+
+
+def test_sqlite_date_range_without_loading(tmp_path):
+    path = str(tmp_path / "w.db")
+    manager = WeeklyTaskManager(path)
+    for day in (3, 10, 17, 24):
+        manager.add_weekly_task(f"w{day}", start_date=f"2024-03-{day:02d}")
+    manager.close()
+
+    reopened = WeeklyTaskManager(path)
+    assert [task.title for task in reopened.get_tasks_between("2024-03-05", "2024-03-20")] == ["w10", "w17"]
+    assert not reopened._loaded
+    # 修改后的记录按新的开始日期出现在查询结果中
+    task = reopened.get_tasks_between("2024-03-20", "2024-03-31")[0]
+    task.start_date = "2024-03-06"
+    assert reopened.update_weekly_task(task)
+    assert [task.title for task in reopened.get_tasks_between("2024-03-05", "2024-03-20")] == \
+        ["w10", "w17", "w24"]
+    reopened.close()
@@ -0,0 +1,80 @@
+"""增量维护的分组统计与全量计算的结果一致"""
+import random
+
+import pytest
+
+from aggregates import Aggregates
+from project_manager import ProjectManager
+from task import Task
+from weekly_task_manager import WeeklyTaskManager
+
+
+def test_aggregates_follow_changes(tracked):
+    stats = Aggregates({"status": ("status", None)}, ("progress",))
+    tasks = [Task(f"t{i}") for i in range(5)]
+    index, _ = tracked(tasks, aggregates=stats)
+    tasks[0].update_progress(100)
+    tasks[1].update_progress(50)
+    index.discard(tasks[2].uid)
+    groups = stats.groups("status")
+    assert {key: totals.count for key, totals in groups.items()} == {"已完成": 1, "进行中": 1, "待开始": 2}
+    assert stats.totals().sums["progress"] == 150
+    assert stats.verify(index) == []
+
+
+@pytest.mark.parametrize("name", ["p.json", "p.db"])
+@pytest.mark.parametrize("lazy", [False, True], ids=["full", "lazy"])
+def test_project_stats_after_random_edits(tmp_path, name, lazy):
+    rng = random.Random(1)
+    path = str(tmp_path / name)
+    manager = ProjectManager(path, lazy=lazy)
+    for i in range(40):
+        manager.add_project(f"t{i}", project_number=f"N{i}",
+                            start_date=f"2025-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}")
+    for step in range(150):
+        task = manager.materialize(rng.choice(manager.get_all_projects()))
+        op = rng.randrange(5)
+        if op == 0:
+            task.update_progress(rng.randrange(101))
+        elif op == 1:
+            task.project_name = rng.choice(["x", "y", None])
+        elif op == 2:
+            task.start_date = f"2025-1{rng.randint(0, 2)}-0{rng.randint(1, 9)}"
+        elif op == 3:
+            manager.delete_project_by_uid(task.uid)
+            continue
+        else:
+            manager.add_project(f"new{step}")
+            continue
+        manager.update_project(task)
+    assert manager.verify_stats() == []
+    projects = manager.get_all_projects()
+    totals = manager.get_totals()
+    assert totals.count == len(projects)
+    assert totals.sums["progress"] == sum(task.progress for task in projects)
+    assert {key: value.count for key, value in manager.get_stats("status").items()} == manager.get_status_counts()
+    for status in ("待开始", "进行中", "已完成"):
+        assert manager.query_projects(status=status) == [task for task in projects if task.status == status]
+    manager.close()
+
+    reopened = ProjectManager(path, lazy=lazy)
+    assert reopened.verify_stats() == []
+    assert reopened.get_totals() == totals
+
+
+def test_weekly_stats_by_week(tmp_path):
+    manager = WeeklyTaskManager(str(tmp_path / "w.json"))
+    task = manager.add_weekly_task("a", start_date="2025-09-15")
+    manager.add_weekly_task("b", start_date="2025-09-16")
+    assert manager.get_weekly_stats(38, 2025) == {"total_tasks": 2, "completed_tasks": 0,
+                                                  "completion_rate": 0, "average_progress": 0}
+    task.is_completed = True
+    manager.update_weekly_task(task)
+    assert manager.get_weekly_stats(38, 2025)["completion_rate"] == 50.0
+    task.start_date = "2025-09-23"
+    manager.update_weekly_task(task)
+    assert manager.get_weekly_stats(39, 2025)["completed_tasks"] == 1
+    assert manager.get_weekly_stats(38, 2025)["total_tasks"] == 1
+    assert manager.remove_weekly_task(task.uid)
+    assert manager.get_weekly_stats(39, 2025)["total_tasks"] == 0
+    assert manager.verify_stats() == []
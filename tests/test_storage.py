@@ -0,0 +1,67 @@
+"""各存储后端经由管理器的读写往返"""
+import pytest
+
+from project_manager import ProjectManager
+from weekly_task_manager import WeeklyTaskManager
+
+# (数据文件名, 管理器选项)
+BACKENDS = [
+    ("data.json", {}),
+    ("data.json", {"journal": True}),
+    ("data.db", {}),
+    ("data.segments", {}),
+    ("data.pmsb", {}),
+]
+IDS = ["json", "journal", "sqlite", "segments", "snapshot"]
+
+
+def project_state(manager):
+    return sorted((task.to_dict() for task in manager.get_all_projects()), key=lambda r: r["uid"])
+
+
+def weekly_state(manager):
+    return sorted((task.to_dict() for task in manager.get_all_weekly_tasks()), key=lambda r: r["uid"])
+
+
+@pytest.mark.parametrize("name,options", BACKENDS, ids=IDS)
+def test_project_round_trip(tmp_path, name, options):
+    path = str(tmp_path / name)
+    manager = ProjectManager(path, **options)
+    first = manager.add_project("甲", "描述一", 2, "2025-03-01", "2025-01-01", "P1")
+    second = manager.add_project("乙", project_number="P2")
+    manager.add_project("丙", project_number="P3")
+    first.update_progress(40)
+    assert manager.update_project(first)
+    assert manager.delete_project("P3")
+    expected = project_state(manager)
+    assert manager.close()
+
+    reopened = ProjectManager(path, **options)
+    assert project_state(reopened) == expected
+    task = reopened.get_project_by_uid(first.uid)
+    assert (task.progress, task.status, task.description) == (40, "进行中", "描述一")
+    # 每次写入递增版本号：新增一次、修改一次
+    assert task.revision == 2
+    assert reopened.get_project_by_number("P3") is None
+    assert reopened.get_project_by_uid(second.uid).title == "乙"
+    reopened.close()
+
+
+@pytest.mark.parametrize("name,options", BACKENDS, ids=IDS)
+def test_weekly_round_trip(tmp_path, name, options):
+    path = str(tmp_path / name)
+    manager = WeeklyTaskManager(path, **options)
+    done = manager.add_weekly_task("周报", "本周", 2, start_date="2025-09-15", project_name="甲")
+    removed = manager.add_weekly_task("删除", start_date="2025-09-16")
+    done.is_completed = True
+    assert manager.update_weekly_task(done)
+    assert manager.remove_weekly_task(removed.uid)
+    expected = weekly_state(manager)
+    assert manager.close()
+
+    reopened = WeeklyTaskManager(path, **options)
+    assert weekly_state(reopened) == expected
+    assert reopened.get_weekly_task(done.uid).is_completed
+    assert reopened.get_weekly_task(removed.uid) is None
+    assert [task.title for task in reopened.get_tasks_by_week(2025, 38)] == ["周报"]
+    reopened.close()
@@ -0,0 +1,73 @@
+"""TaskTable：整列筛选和分组统计与逐个访问对象的结果一致"""
+import random
+from datetime import date
+
+import pytest
+
+from project_manager import ProjectManager
+from task import Task, TaskStatus, date_ordinal, today_ordinal
+from tasktable import PROJECT_FIELDS, TaskTable, np
+
+USE_NUMPY = [False] + ([True] if np is not None else [])
+
+
+def random_tasks(count, seed=7):
+    rng = random.Random(seed)
+    statuses = [status.value for status in TaskStatus]
+    tasks = []
+    for i in range(count):
+        due = date(2025, 1, 1).toordinal() + rng.randint(-30, 30)
+        tasks.append(Task(title=f"t{i}", priority=rng.randint(1, 5), status=rng.choice(statuses),
+                          progress=rng.randint(0, 100), project_name=rng.choice(["甲", "乙", None]),
+                          due_date=date.fromordinal(due).isoformat() if rng.random() < 0.8 else None))
+    return tasks
+
+
+@pytest.mark.parametrize("use_numpy", USE_NUMPY)
+def test_group_by_matches_loops(use_numpy):
+    tasks = random_tasks(300)
+    table = TaskTable(tasks, PROJECT_FIELDS, use_numpy=use_numpy)
+    today = date(2025, 1, 1)
+
+    progress = {}
+    for task in tasks:
+        progress.setdefault(task.status, []).append(task.progress)
+    means = table.group_by('status', 'progress', 'mean')
+    assert means == pytest.approx({status: sum(v) / len(v) for status, v in progress.items()})
+
+    overdue = [task for task in tasks if task.due_date and task.ordinal('due_date') <= today.toordinal()
+               and task.status != TaskStatus.COMPLETED.value]
+    assert table.select(table.overdue(today)) == overdue
+    by_priority = table.group_by('priority', mask=table.overdue(today))
+    assert sum(by_priority.values()) == len(overdue)
+
+    mask = table.where('project_name', "甲") & ~table.isin('priority', [1, 2])
+    assert table.select(mask) == [task for task in tasks if task.project_name == "甲" and task.priority > 2]
+
+
+@pytest.mark.parametrize("lazy", [False, True], ids=["objects", "lazy"])
+def test_summarize_matches_objects(tmp_path, lazy):
+    manager = ProjectManager(str(tmp_path / "p.json"), journal=True)
+    for task in random_tasks(60):
+        added = manager.add_project(task.title, due_date=task.due_date)
+        added.status, added.progress = task.status, task.progress
+        manager.update_project(added)
+    manager.close()
+
+    manager = ProjectManager(str(tmp_path / "p.json"), journal=True, lazy=lazy)
+    tasks = manager.get_all_projects()
+    summary = manager.summarize()
+    assert summary['total'] == len(tasks)
+    assert summary['overdue'] == sum(1 for task in tasks if task.due_date and task.status != TaskStatus.COMPLETED.value
+                                     and date_ordinal(task.due_date) <= today_ordinal())
+    assert summary['average_progress'] == round(sum(task.progress for task in tasks) / len(tasks), 2)
+    for status in TaskStatus:
+        expected = sum(1 for task in tasks if task.status == status.value)
+        assert summary['status_counts'].get(status.value, 0) == expected
+
+    # 筛选结果只统计给出的项目
+    pending = manager.query_projects(status=TaskStatus.PENDING.value)
+    assert manager.summarize(pending)['status_counts'] == ({TaskStatus.PENDING.value: len(pending)}
+                                                           if pending else {})
+    assert manager.summarize([])['total'] == 0
+    manager.close()
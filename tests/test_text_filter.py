@@ -0,0 +1,62 @@
+"""关键字筛选：子串匹配、在上次结果中继续筛选，缓存只保留当前范围内的记录"""
+import pytest
+
+from task import Task
+from text_filter import FilterCancelled, TextFilter, narrows, parse_terms
+
+
+def make_tasks(count):
+    return [Task(title=f"项目{i}", description="需求评审" if i % 2 else "", project_number=f"P{i}")
+            for i in range(count)]
+
+
+def test_terms_must_all_match():
+    tasks = make_tasks(10)
+    text_filter = TextFilter(('title', 'description', 'project_number'))
+    assert text_filter.apply(1, lambda: tasks, "评审 项目3") == [tasks[3]]
+    assert text_filter.apply(1, lambda: tasks, "  ") == tasks
+    assert parse_terms("A a b") == ("a", "b")
+    assert narrows(("项",), ("项目",)) and not narrows(("项目",), ("项",))
+
+
+def test_narrowing_reuses_last_result():
+    tasks = make_tasks(20)
+    text_filter = TextFilter(('title', 'description'))
+    calls = []
+
+    def records():
+        calls.append(1)
+        return tasks
+
+    first = text_filter.apply("all", records, "项目1")
+    assert text_filter.apply("all", records, "项目1 评审") == [task for task in first if task.description]
+    assert len(calls) == 1
+
+
+def test_modified_record_is_rematched():
+    tasks = make_tasks(3)
+    text_filter = TextFilter(('title',))
+    assert text_filter.apply(1, lambda: tasks, "新") == []
+    tasks[0].title = "新名称"
+    assert text_filter.apply(2, lambda: tasks, "新") == [tasks[0]]
+
+
+def test_cache_is_pruned_to_current_scope():
+    tasks = make_tasks(10)
+    text_filter = TextFilter(('title',))
+    text_filter.apply(1, lambda: tasks, "项目")
+    assert len(text_filter._texts) == 10
+
+    # 删除记录、把记录换成新对象后，旧对象不再被缓存引用
+    replaced = Task(title="项目0", uid=tasks[0].uid)
+    remaining = [replaced] + tasks[1:5]
+    assert text_filter.apply(2, lambda: remaining, "项目0") == [replaced]
+    assert set(text_filter._texts) == {task.uid for task in remaining}
+    assert all(cached[0] is not tasks[0] for cached in text_filter._texts.values())
+
+
+def test_cancelled_filter_raises():
+    tasks = make_tasks(5000)
+    text_filter = TextFilter(('title',))
+    with pytest.raises(FilterCancelled):
+        text_filter.apply(1, lambda: tasks, "项目", cancelled=lambda: True)
@@ -0,0 +1,50 @@
+"""VirtualTreeview刷新：按行ID与已渲染的行比较，只改动变化的行"""
+from test_virtual_tree import Row, expected, rendered, root, tree, values  # noqa: F401
+from virtual_tree import _longest_increasing
+
+
+def test_longest_increasing():
+    order = {"a": 0, "b": 1, "c": 2, "d": 3}
+    assert _longest_increasing(["b", "c", "d", "a"], order) == {"b", "c", "d"}
+    assert _longest_increasing(["a", "b", "c", "d"], order) == {"a", "b", "c", "d"}
+    assert len(_longest_increasing(["d", "c", "b", "a"], order)) == 1
+    assert _longest_increasing([], {}) == set()
+
+
+def test_single_change_touches_one_row(tree):
+    rows = [Row(f"u{i}") for i in range(100)]
+    tree.set_items(rows, values=values)
+    changed = list(rows)
+    changed[3] = Row("u3", 7)
+    tree.set_items(changed)
+    assert tree.last_refresh.touched == 1 and tree.last_refresh.updated == 1
+    assert rendered(tree) == expected(tree)
+
+
+def test_insert_delete_and_reorder(tree):
+    rows = [Row(f"u{i}") for i in range(100)]
+    tree.set_items(rows, values=values)
+    reordered = [rows[5]] + rows[:5] + rows[6:]
+    tree.set_items(reordered)
+    assert tree.last_refresh.moved == 1 and tree.last_refresh.inserted == 0
+    assert rendered(tree) == expected(tree)
+
+    shorter = reordered[:2] + reordered[3:]
+    tree.set_items(shorter)
+    assert tree.last_refresh.deleted == 1 and tree.last_refresh.inserted == 1
+    assert rendered(tree) == expected(tree)
+
+    tree.update_items([Row("u0", 9)])
+    assert rendered(tree) == expected(tree) and tree.items()[1].value == 9
+
+
+def test_update_items_keeps_the_sequence(tree):
+    rows = [Row(f"u{i}") for i in range(1000)]
+    tree.set_items(rows, values=values)
+    assert tree.update_items([Row("u3", 5), Row("u900", 6), Row("missing")]) == 2
+    # 只重画窗口内被替换的一行，调用方的列表不被复制或修改
+    assert tree.last_refresh.updated == 1 and tree.last_refresh.touched == 1
+    assert tree._items is rows and rows[3].value == 0
+    tree.yview("moveto", 0.9)
+    assert dict(rendered(tree))["u900"] == ("u900", "6")
+    assert tree.items()[3].value == 5 and rendered(tree) == expected(tree)
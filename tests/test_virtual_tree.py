@@ -0,0 +1,90 @@
+"""VirtualTreeview：只渲染窗口内的行，滚动和刷新后选择保持不变"""
+import tkinter as tk
+from tkinter import ttk
+
+import pytest
+
+from virtual_tree import VirtualTreeview
+
+
+class Row:
+    def __init__(self, uid, value=0):
+        self.uid = uid
+        self.value = value
+
+
+def values(row):
+    return (row.uid, row.value)
+
+
+@pytest.fixture(scope="module")
+def root():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("没有可用的显示")
+    root.withdraw()
+    yield root
+    root.destroy()
+
+
+@pytest.fixture
+def tree(root):
+    tree = VirtualTreeview(root, columns=("uid", "value"), height=10, overscan=5)
+    yield tree
+    tree.destroy()
+
+
+def rendered(tree):
+    """Tk中实际存在的行 (行ID, 取值)，按Tk中的顺序"""
+    return [(row_id, tuple(str(value) for value in ttk.Treeview.item(tree, row_id)["values"]))
+            for row_id in ttk.Treeview.get_children(tree)]
+
+
+def expected(tree):
+    return [(row.uid, (row.uid, str(row.value))) for row in tree.items()[tree._start:tree._end]]
+
+
+def test_renders_only_the_window(tree):
+    rows = [Row(f"u{i}") for i in range(1000)]
+    tree.set_items(rows, values=values)
+    assert len(tree) == 1000 and len(tree.get_children()) == 1000
+    assert rendered(tree) == expected(tree)
+    assert len(rendered(tree)) == 10 + 5
+
+    tree.yview("moveto", 0.5)
+    assert tree._start <= 500 < tree._end
+    assert rendered(tree) == expected(tree)
+
+
+def test_selection_survives_scrolling_and_refresh(tree):
+    rows = [Row(f"u{i}") for i in range(500)]
+    tree.set_items(rows, values=values)
+    tree.selection_set("u2")
+    tree.yview("moveto", 0.9)
+    assert "u2" not in dict(rendered(tree))
+    assert tree.selection() == ("u2",)
+    tree.set_items(rows[:1] + rows[2:])
+    tree.yview("moveto", 0)
+    assert tree.selection() == ("u2",)
+    assert ttk.Treeview.selection(tree) == ("u2",)
+    # 被删除的行不再选中
+    tree.set_items([row for row in rows if row.uid != "u2"])
+    assert tree.selection() == ()
+
+
+def test_see_and_scrollbar_fractions(tree):
+    rows = [Row(f"u{i}") for i in range(200)]
+    fractions = []
+    tree.configure(yscrollcommand=lambda first, last: fractions.append((first, last)))
+    tree.set_items(rows, values=values)
+    assert tree.yview() == (0.0, 10 / 200)
+
+    tree.see("u150")
+    # 滚动到该行恰好位于可见部分的最后一行，只渲染窗口附近的行
+    assert tree.yview() == (141 / 200, 151 / 200) and fractions[-1] == tree.yview()
+    assert "u150" in dict(rendered(tree)) and len(rendered(tree)) <= 10 + 2 * 5
+    assert rendered(tree) == expected(tree)
+    tree.see("u3")
+    assert tree.yview()[0] == 3 / 200 and rendered(tree) == expected(tree)
+    assert tree.index_of("u150") == 150 and tree.index_of("missing") is None
@@ -0,0 +1,33 @@
+"""每周待办事项按ISO (年, 周) 分组索引"""
+import pytest
+
+from task import Task, iso_week
+from weekly_task_manager import WeeklyTaskManager
+
+
+def test_derived_keys_follow_field_changes(tracked):
+    tasks = [Task("a", start_date="2025-09-15"), Task("b", start_date="2025-09-21"),
+             Task("c", start_date="2025-09-22")]
+    index, _ = tracked(tasks, derived={"week": ("start_date", iso_week)})
+    assert index.select(week=(2025, 38)) == tasks[:2]
+    tasks[0].start_date = "2025-09-23"
+    assert index.select(week=(2025, 38)) == [tasks[1]]
+    assert index.select(week=(2025, 39)) == [tasks[0], tasks[2]]
+
+
+@pytest.mark.parametrize("name", ["w.json", "w.db"])
+def test_weeks_follow_iso_years(tmp_path, name):
+    manager = WeeklyTaskManager(str(tmp_path / name))
+    # 2025-12-29 属于2026年第1周，2027-01-01 属于2026年第53周
+    for title, day in [("年末", "2025-12-29"), ("元旦", "2026-01-01"), ("上周", "2025-12-28"),
+                       ("次年", "2027-01-01"), ("无日期", None)]:
+        manager.add_weekly_task(title, start_date=day)
+    assert [task.title for task in manager.get_tasks_by_week(2026, 1)] == ["年末", "元旦"]
+    assert [task.title for task in manager.get_tasks_by_week(2025, 52)] == ["上周"]
+    assert [task.title for task in manager.get_tasks_by_week(2026, 53)] == ["次年"]
+    task = manager.get_tasks_by_week(2026, 1)[0]
+    task.start_date = "2026-01-05"
+    assert manager.update_weekly_task(task)
+    assert [task.title for task in manager.get_tasks_by_week(2026, 2)] == ["年末"]
+    assert [task.title for task in manager.get_tasks_by_week(2026, 1)] == ["元旦"]
+    manager.close()
@@ -0,0 +1,39 @@
+"""编辑待办事项：对话框结果对应的字段都是WeeklyTask的字段，能够保存"""
+import pytest
+
+from gui import WeeklyTasksGUI
+from weekly_task_manager import WeeklyTaskManager
+
+
+def dialog_changes(*result):
+    # 只用到字段换算，不创建窗口
+    return object.__new__(WeeklyTasksGUI).task_changes(*result)
+
+
+def test_dialog_changes_are_weekly_task_fields(tmp_path):
+    path = str(tmp_path / "w.json")
+    manager = WeeklyTaskManager(path)
+    task = manager.add_weekly_task("旧标题", start_date="2025-09-15")
+    changes = dialog_changes("新标题", "新描述", "甲", "重要", "已完成", "2025-10-01")
+
+    with manager.batch() as result:
+        for name, value in changes.items():
+            setattr(task, name, value)
+    assert result.saved and result.updated == 1
+    manager.close()
+
+    saved = WeeklyTaskManager(path).get_weekly_task(task.uid)
+    assert (saved.title, saved.description, saved.project_name, saved.priority,
+            saved.is_completed, saved.due_date) == ("新标题", "新描述", "甲", 2, True, "2025-10-01")
+
+
+def test_weekly_task_has_no_undeclared_attributes(tmp_path):
+    task = WeeklyTaskManager(str(tmp_path / "w.json")).add_weekly_task("x")
+    # 带槽的记录不能临时附加字段，写错字段名会立即报错而不是静默丢失
+    with pytest.raises(AttributeError):
+        task.updated_at = "2025-01-01 00:00:00"
+
+
+def test_no_project_clears_project_name():
+    changes = dialog_changes("t", "", "无", "一般", "未完成", None)
+    assert changes["project_name"] is None and changes["is_completed"] is False